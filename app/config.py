@@ -7,5 +7,119 @@ UPLOAD_DIR = Path(os.getenv("UPLOAD_DIR", "/tmp/uploads"))
 AUDIO_OUTPUT_DIR = Path(os.getenv("AUDIO_OUTPUT_DIR", "/tmp/audio_output"))
 
 MAX_FILE_SIZE = 500  # MB
+MAX_TEXT_CHARS = 100000
 
 SUPPORTED_LANGUAGES = ["ru", "en", "kk"]
+
+# Очередь задач
+QUEUE_WORKERS = int(os.getenv("QUEUE_WORKERS", "2"))
+QUEUE_MAX_DEPTH = int(os.getenv("QUEUE_MAX_DEPTH", "100"))
+QUEUE_DB_PATH = Path(os.getenv("QUEUE_DB_PATH", str(UPLOAD_DIR / "queue.sqlite3")))
+# Задача, прерванная падением процесса столько раз, после рестарта помечается failed; 0 — без ограничения
+QUEUE_MAX_ATTEMPTS = int(os.getenv("QUEUE_MAX_ATTEMPTS", "3"))
+
+# Модели
+WHISPER_MODEL = os.getenv("WHISPER_MODEL", "base")
+NLLB_MODEL = os.getenv("NLLB_MODEL", "facebook/nllb-200-distilled-600M")
+
+NLLB_LANG_CODES = {
+    "ru": "rus_Cyrl",
+    "en": "eng_Latn",
+    "kk": "kaz_Cyrl",
+}
+
+# Пул процессов для инференса: каждый воркер держит свои модели и INFERENCE_THREADS потоков
+INFERENCE_THREADS = int(os.getenv("INFERENCE_THREADS", "4"))
+# Не меньше двух: распознавание и перевод одной задачи идут параллельно в разных воркерах
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", str(max(2, (os.cpu_count() or 1) // INFERENCE_THREADS))))
+
+# Кэш результатов этапов (транскрипт, перевод)
+RESULT_CACHE_DIR = Path(os.getenv("RESULT_CACHE_DIR", str(AUDIO_OUTPUT_DIR / "cache")))
+RESULT_CACHE_MAX_MB = int(os.getenv("RESULT_CACHE_MAX_MB", "2048"))
+RESULT_CACHE_MEMORY_ITEMS = int(os.getenv("RESULT_CACHE_MEMORY_ITEMS", "256"))
+
+# Память переводов (повторно используемые предложения)
+TM_DB_PATH = Path(os.getenv("TM_DB_PATH", str(UPLOAD_DIR / "translation_memory.sqlite3")))
+# Лимиты таблицы: записей всего и дней без использования (0 — без лимита)
+TM_MAX_ROWS = int(os.getenv("TM_MAX_ROWS", "1000000"))
+TM_MAX_AGE_DAYS = float(os.getenv("TM_MAX_AGE_DAYS", "90"))
+
+# Пакетный перевод NLLB
+NLLB_BATCH_SIZE = int(os.getenv("NLLB_BATCH_SIZE", "16"))
+NLLB_MAX_INPUT_TOKENS = int(os.getenv("NLLB_MAX_INPUT_TOKENS", "400"))
+NLLB_MAX_BATCH_TOKENS = int(os.getenv("NLLB_MAX_BATCH_TOKENS", "6000"))
+
+# OpenAI (перевод через API); OPENAI_BASE_URL позволяет направить клиент на локальную заглушку
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "")
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+OPENAI_CONCURRENCY = int(os.getenv("OPENAI_CONCURRENCY", "4"))
+OPENAI_RPM = float(os.getenv("OPENAI_RPM", "500"))
+OPENAI_TPM = float(os.getenv("OPENAI_TPM", "200000"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "5"))
+OPENAI_CHUNK_TOKENS = int(os.getenv("OPENAI_CHUNK_TOKENS", "1500"))
+
+# Потоковый конвейер ASR → перевод
+ASR_VAD_FILTER = os.getenv("ASR_VAD_FILTER", "true").lower() == "true"
+STREAM_WINDOW_MIN_SECONDS = float(os.getenv("STREAM_WINDOW_MIN_SECONDS", "5"))
+STREAM_WINDOW_MAX_SECONDS = float(os.getenv("STREAM_WINDOW_MAX_SECONDS", "30"))
+STREAM_QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", "8"))
+
+# Реестр моделей в воркерах пула: выгрузка простаивающих моделей и бюджет памяти на процесс
+MODEL_IDLE_TTL_SECONDS = float(os.getenv("MODEL_IDLE_TTL_SECONDS", "1800"))  # 0 — не выгружать
+MODEL_MEMORY_BUDGET_MB = float(os.getenv("MODEL_MEMORY_BUDGET_MB", "0"))  # 0 — без ограничения
+# Пауза перед повторной загрузкой модели после ошибки; удваивается с каждой неудачей, до часа
+MODEL_LOAD_RETRY_SECONDS = float(os.getenv("MODEL_LOAD_RETRY_SECONDS", "30"))
+# Модели, загружаемые в фоне сразу после старта воркеров: whisper,nllb,ocr,tts
+MODEL_WARMUP = [name.strip() for name in os.getenv("MODEL_WARMUP", "").split(",") if name.strip()]
+
+# Шардированное распознавание длинных записей: файл режется по паузам на части
+# не короче TRANSCRIBE_SHARD_MIN_SECONDS, части распознаются параллельно в воркерах пула
+TRANSCRIBE_SHARD_MIN_SECONDS = float(os.getenv("TRANSCRIBE_SHARD_MIN_SECONDS", "300"))
+TRANSCRIBE_SHARD_OVERLAP_SECONDS = float(os.getenv("TRANSCRIBE_SHARD_OVERLAP_SECONDS", "2"))
+
+# Хранилище задач в памяти: записи завершённых задач удаляются по TTL и по количеству.
+# Файлы результатов не трогаем — их срок задаёт OUTPUT_RETENTION_SECONDS
+JOB_TTL_SECONDS = float(os.getenv("JOB_TTL_SECONDS", "3600"))
+JOB_MAX_FINISHED = int(os.getenv("JOB_MAX_FINISHED", "1000"))
+
+# Server-sent events: интервал keep-alive комментариев для прокси и балансировщиков
+SSE_HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+
+# Уборка диска: квоты (МБ) и срок хранения (с) для загрузок и результатов; 0 — без ограничения
+UPLOAD_QUOTA_MB = float(os.getenv("UPLOAD_QUOTA_MB", "5120"))
+UPLOAD_RETENTION_SECONDS = float(os.getenv("UPLOAD_RETENTION_SECONDS", "86400"))
+OUTPUT_QUOTA_MB = float(os.getenv("OUTPUT_QUOTA_MB", "2048"))
+OUTPUT_RETENTION_SECONDS = float(os.getenv("OUTPUT_RETENTION_SECONDS", "604800"))
+JANITOR_INTERVAL_SECONDS = float(os.getenv("JANITOR_INTERVAL_SECONDS", "300"))
+
+# Пакетный OCR (zip с картинками, многостраничный TIFF/PDF): страниц на вызов воркера и предел на задачу
+OCR_BATCH_SIZE = int(os.getenv("OCR_BATCH_SIZE", "8"))
+OCR_MAX_PAGES = int(os.getenv("OCR_MAX_PAGES", "200"))
+# Строк текста на один прогон распознавателя PaddleOCR (у PaddleOCR по умолчанию 6)
+OCR_REC_BATCH_SIZE = int(os.getenv("OCR_REC_BATCH_SIZE", "16"))
+
+# Предобработка перед OCR: уменьшение до рабочей высоты строки и нарезка больших изображений на тайлы
+OCR_TARGET_TEXT_HEIGHT = float(os.getenv("OCR_TARGET_TEXT_HEIGHT", "32"))
+OCR_TILE_SIZE = int(os.getenv("OCR_TILE_SIZE", "1600"))
+OCR_TILE_OVERLAP = int(os.getenv("OCR_TILE_OVERLAP", "64"))
+
+# Синтез речи: текст режется на чанки из целых предложений, чанки синтезируются параллельно в воркерах пула
+TTS_ENABLED = os.getenv("TTS_ENABLED", "false").lower() == "true"
+TTS_CHUNK_CHARS = int(os.getenv("TTS_CHUNK_CHARS", "300"))
+TTS_FORMAT = os.getenv("TTS_FORMAT", "mp3")  # mp3 (нужен ffmpeg) или wav
+
+# Перевод OCR: boxes — по блокам текста с переводом каждой рамки, text — весь текст одной строкой
+OCR_TRANSLATION_MODE = os.getenv("OCR_TRANSLATION_MODE", "boxes")
+# Глоссарий: JSON {"ru": {"Exit": "Выход"}}; такие строки не отправляются в модель
+GLOSSARY_PATH = Path(os.getenv("GLOSSARY_PATH", str(BASE_DIR / "glossary.json")))
+
+# Отрисовка перевода поверх изображений и страниц документов (нужен OCR_TRANSLATION_MODE=boxes)
+RENDER_IMAGES = os.getenv("RENDER_IMAGES", "true").lower() == "true"
+# TTF-шрифт с кириллицей, включая казахские буквы
+RENDER_FONT_PATH = os.getenv("RENDER_FONT_PATH", "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf")
+
+# Субтитры SRT/WebVTT для аудио и видео: длина строки и скорость чтения (символов в секунду)
+SUBTITLES_ENABLED = os.getenv("SUBTITLES_ENABLED", "true").lower() == "true"
+SUBTITLE_MAX_LINE_CHARS = int(os.getenv("SUBTITLE_MAX_LINE_CHARS", "42"))
+SUBTITLE_MAX_CPS = float(os.getenv("SUBTITLE_MAX_CPS", "17"))
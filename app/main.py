@@ -1,9 +1,15 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from pathlib import Path
-from app.config import AUDIO_OUTPUT_DIR
-from app.routes import upload
+import asyncio
+import sys
+from ai_translate_shared.metrics import metrics
+from app.config import AUDIO_OUTPUT_DIR, MAX_FILE_SIZE, MODEL_WARMUP
+from app.routes import upload, results
+from app.services.inference_pool import inference_pool
+from app.services.storage_janitor import storage_janitor
 import uvicorn
 
 app = FastAPI(title="AI-Translate API")
@@ -15,16 +21,91 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+@app.middleware("http")
+async def reject_oversized_uploads(request: Request, call_next):
+    """Отклоняем слишком большие загрузки по Content-Length ещё до чтения тела"""
+    # Запас на заголовки multipart и поле target_lang
+    limit = MAX_FILE_SIZE * 1024 * 1024 + 64 * 1024
+    if request.method == "POST" and request.url.path.startswith("/api/upload"):
+        content_length = request.headers.get("content-length")
+        if content_length and content_length.isdigit() and int(content_length) > limit:
+            return JSONResponse(status_code=413, content={"detail": "File too large"})
+    return await call_next(request)
+
 app.include_router(upload.router, prefix="/api", tags=["upload"])
+app.include_router(results.router, prefix="/api", tags=["results"])
+
+metrics.gauge("job_queue_depth", "Jobs waiting for a queue worker", lambda: upload.job_queue.depth)
+metrics.gauge("job_queue_running", "Jobs being processed", lambda: upload.job_queue.running)
+metrics.gauge("job_store_jobs", "Job records held in memory", lambda: len(upload.job_manager.jobs))
+metrics.gauge("job_store_finished", "Finished job records awaiting eviction", lambda: upload.job_manager.stats()["finished"])
 
 AUDIO_OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 app.mount("/media", StaticFiles(directory=AUDIO_OUTPUT_DIR), name="media")
 
 
+@app.on_event("startup")
+async def start_job_queue():
+    restored = await upload.job_queue.start()
+    # Загрузки восстановленных задач не должны уйти под квоту при первом обходе
+    for queued in restored:
+        storage_janitor.pin(queued.file_path)
+    await storage_janitor.start()
+    upload.job_manager.start()
+    if MODEL_WARMUP:
+        inference_pool.start()
+
+
+@app.on_event("shutdown")
+async def stop_job_queue():
+    await upload.job_queue.stop()
+    await storage_janitor.stop()
+    await upload.job_manager.stop()
+    inference_pool.shutdown()
+    # Клиент OpenAI импортируется только при первом использовании — не тянем его ради закрытия
+    if openai_client := sys.modules.get("app.services.openai_client"):
+        await openai_client.close_client()
+
 
 @app.get("/api/health")
 async def health():
-    return {"status": "healthy"}
+    """Liveness: the HTTP layer answers; models are not touched"""
+    return {
+        "status": "healthy",
+        "queue": {"waiting": upload.job_queue.depth, "running": upload.job_queue.running},
+        "jobs": upload.job_manager.stats(),
+        "storage": storage_janitor.stats()
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Stage, queue-wait and inference histograms in the Prometheus text format"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/api/ready")
+async def ready():
+    """
+    Readiness: which models the inference workers have loaded
+
+    Models load on first use, so the service is ready as soon as the queue
+    runs; with MODEL_WARMUP it waits until every listed model is loaded in
+    at least one worker.
+    """
+    models = await asyncio.to_thread(inference_pool.model_status)
+    pending = [name for name in MODEL_WARMUP if not models.get(name, {}).get("loaded_workers")]
+    is_ready = upload.job_queue.started and not pending
+    return JSONResponse(
+        status_code=200 if is_ready else 503,
+        content={
+            "ready": is_ready,
+            "workers": inference_pool.workers if inference_pool.started else 0,
+            "models": models,
+            "warming_up": pending,
+        }
+    )
 
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
@@ -27,6 +27,8 @@ class FileType(str, Enum):
     VIDEO = "video"
     IMAGE = "image"
     TEXT = "text"
+    # Zip с картинками, многостраничный TIFF или PDF — OCR по страницам
+    DOCUMENT = "document"
 
     @classmethod
     def _missing_(cls, value):
@@ -40,12 +42,66 @@ class FileType(str, Enum):
 
 
 @dataclass
+class BoundingBox:
+    x: float
+    y: float
+    width: float
+    height: float
+    text: str
+    confidence: float
+
+    def to_dict(self) -> dict:
+        return {
+            "x": self.x,
+            "y": self.y,
+            "width": self.width,
+            "height": self.height,
+            "text": self.text,
+            "confidence": self.confidence,
+        }
+
+
+@dataclass(slots=True)
 class Job:
     job_id: str = field(default_factory=lambda: str(uuid.uuid4()))
     status: JobStatus = JobStatus.QUEUED
     file_type: Optional[FileType] = None
     file_path: str = ""
+    file_hash: str = ""
     translated_text: str = ""
     audio_output_path: str = ""
+    # Изображение с нарисованным переводом (для документа — zip из PNG по страницам)
+    image_output_path: str = ""
+    # Субтитры .srt (рядом .vtt); дописываются по ходу перевода аудио и видео
+    subtitles_output_path: str = ""
+    # Озвученный перевод (.mp3/.wav), если включён TTS_ENABLED
+    speech_output_path: str = ""
     target_lang: str = ""
     error: str = ""
+    translation_stats: dict = field(default_factory=dict)
+    partial_results: list = field(default_factory=list)
+    # Для документов (и изображений при OCR_TRANSLATION_MODE=boxes): [{"source", "page", "text", "bboxes"}]
+    # по страницам; после перевода у страниц и рамок есть translated_text
+    ocr_pages: list = field(default_factory=list)
+    progress: dict = field(default_factory=dict)
+    # Этап -> {"wall", "cpu", "size", "unit"}; заполняется ai_translate_shared.metrics.stage()
+    timings: dict = field(default_factory=dict)
+    finished_at: float = 0.0  # time.monotonic() при завершении, для TTL-вытеснения
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.job_id,
+            "status": self.status.value,
+            "file_type": self.file_type.value if self.file_type else None,
+            "target_lang": self.target_lang,
+            "translated_text": self.translated_text,
+            "error": self.error,
+            "progress": self.progress,
+            "translation_stats": self.translation_stats,
+            "partial_results": self.partial_results,
+            "ocr_pages": self.ocr_pages,
+            "timings": self.timings,
+            "has_speech": bool(self.speech_output_path),
+            "has_image": bool(self.image_output_path),
+            "has_subtitles": bool(self.subtitles_output_path),
+        }
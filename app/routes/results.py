@@ -1,16 +1,33 @@
 """
 Results route for retrieving translation results
 """
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from pathlib import Path
+import asyncio
+import json
 import logging
+from typing import AsyncIterator, Callable, Optional, Tuple
+from app.config import SSE_HEARTBEAT_SECONDS, TTS_ENABLED, TTS_FORMAT
+from app.models.job import Job, JobStatus
 from app.routes.upload import job_manager
+from app.services.storage_janitor import storage_janitor
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+AUDIO_MEDIA_TYPES = {".mp3": "audio/mpeg", ".wav": "audio/wav"}
+SUBTITLE_MEDIA_TYPES = {"srt": "application/x-subrip; charset=utf-8", "vtt": "text/vtt; charset=utf-8"}
+IMAGE_MEDIA_TYPES = {
+    ".png": "image/png", ".jpg": "image/jpeg", ".jpeg": "image/jpeg", ".webp": "image/webp", ".zip": "application/zip",
+}
+# Как часто перечитывать файл озвучки, который ещё дописывается
+AUDIO_TAIL_INTERVAL = 0.25
+AUDIO_READ_SIZE = 64 * 1024
+# Заголовок WAV от модуля wave: RIFF + fmt + data, 44 байта
+WAV_HEADER_SIZE = 44
+
 @router.get("/result/{job_id}")
 async def get_result(job_id: str):
     """
@@ -29,27 +46,268 @@ async def get_result(job_id: str):
     
     return job.to_dict()
 
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def _job_event_stream(job_id: str, request: Request) -> AsyncIterator[str]:
+    finished = (JobStatus.COMPLETED.value, JobStatus.FAILED.value)
+    with job_manager.events.subscribe(job_id) as events:
+        # Снимок после подписки: события, пришедшие позже, не потеряются
+        job = job_manager.get_job(job_id)
+        if job is None:
+            # Задача успела завершиться и вытесниться из хранилища
+            return
+        snapshot = job.to_dict()
+        yield _sse("snapshot", snapshot)
+        if snapshot["status"] in finished:
+            return
+
+        while not await request.is_disconnected():
+            try:
+                event, data = await asyncio.wait_for(events.get(), SSE_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            yield _sse(event, data)
+            if event == "status" and data["status"] in finished:
+                return
+
+
+@router.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str, request: Request):
+    """
+    Server-sent events for a job: snapshot, status, progress and partial
+
+    Replaces polling /result: the stream closes once the job is finished.
+    """
+    if not job_manager.get_job(job_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    return StreamingResponse(
+        _job_event_stream(job_id, request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def _parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """First range of a "bytes=" Range header as inclusive (start, end); None if malformed"""
+    unit, _, spec = header.partition("=")
+    first, sep, last = spec.split(",")[0].strip().partition("-")
+    if unit.strip().lower() != "bytes" or not sep:
+        return None
+    try:
+        if first:
+            return int(first), min(int(last), size - 1) if last else size - 1
+        # bytes=-N — последние N байт
+        return max(0, size - int(last)), size - 1
+    except ValueError:
+        return None
+
+
+async def _read_range(path: Path, start: int, end: int) -> AsyncIterator[bytes]:
+    with open(path, "rb") as handle:
+        handle.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            data = await asyncio.to_thread(handle.read, min(AUDIO_READ_SIZE, remaining))
+            if not data:
+                return
+            remaining -= len(data)
+            yield data
+
+
+def _file_response(request: Request, path: Path, media_type: str, filename: str):
+    """FileResponse with HTTP Range support, so players can seek without downloading everything"""
+    size = path.stat().st_size
+    byte_range = _parse_range(request.headers["range"], size) if "range" in request.headers else None
+    if byte_range is None:
+        return FileResponse(path, media_type=media_type, filename=filename, headers={"Accept-Ranges": "bytes"})
+
+    start, end = byte_range
+    if start >= size or start > end:
+        raise HTTPException(status_code=416, detail="Range not satisfiable", headers={"Content-Range": f"bytes */{size}"})
+    return StreamingResponse(
+        _read_range(path, start, end),
+        status_code=206,
+        media_type=media_type,
+        headers={
+            "Accept-Ranges": "bytes",
+            "Content-Range": f"bytes {start}-{end}/{size}",
+            "Content-Length": str(end - start + 1),
+            "Content-Disposition": f'attachment; filename="{filename}"',
+        }
+    )
+
+
 @router.get("/audio/{job_id}")
-async def download_audio(job_id: str):
+async def download_audio(job_id: str, request: Request):
     """
     Download generated audio file
     
+    Supports Range requests. While speech is still being synthesized this
+    answers 409 (use /audio/{job_id}/stream instead); a failed job gives 404
+    with its error.
+
     Args:
         job_id: Job ID
         
     Returns:
-        Audio file
+        Audio file (or the text result when the job has no speech)
     """
     job = job_manager.get_job(job_id)
     
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
-    
-    if not job.audio_output_path or not Path(job.audio_output_path).exists():
+
+    if job.status == JobStatus.FAILED:
+        # Недописанный WAV упавшей задачи не отдаём
+        raise HTTPException(status_code=404, detail=f"Job failed: {job.error}" if job.error else "Job failed")
+
+    if job.speech_output_path and job.status in (JobStatus.QUEUED, JobStatus.PROCESSING):
+        raise HTTPException(status_code=409, detail="Speech is still being generated, use /audio/{job_id}/stream")
+
+    # Озвученный перевод, если он есть; иначе — текстовый файл результата
+    path = Path(job.speech_output_path or job.audio_output_path)
+    if not path.name or not path.exists():
         raise HTTPException(status_code=404, detail="Audio file not found")
-    
-    return FileResponse(
-        job.audio_output_path,
-        media_type="audio/mpeg",
-        filename=f"{job_id}.mp3"
+
+    storage_janitor.touch(path)
+    media_type = AUDIO_MEDIA_TYPES.get(path.suffix, "text/plain; charset=utf-8")
+    return _file_response(request, path, media_type, f"{job_id}{path.suffix}")
+
+
+@router.get("/image/{job_id}")
+async def download_image(job_id: str, request: Request):
+    """
+    Download the image with the translation drawn over the original text
+
+    Documents give a zip with one PNG per page.
+    """
+    job = job_manager.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    path = Path(job.image_output_path)
+    if not job.image_output_path or not path.exists():
+        raise HTTPException(status_code=404, detail="Rendered image not found")
+
+    storage_janitor.touch(path)
+    return _file_response(request, path, IMAGE_MEDIA_TYPES.get(path.suffix, "application/octet-stream"), f"{job_id}{path.suffix}")
+
+
+def _open_ended_wav_header(header: bytes) -> bytes:
+    """The on-disk header with RIFF and data sizes set to "unknown" for streaming"""
+    header = bytearray(header)
+    header[4:8] = header[40:44] = b"\xff\xff\xff\xff"
+    return bytes(header)
+
+
+async def _tail_file(
+    job_id: str, path_of: Callable[[Job], str], wav: bool, request: Request
+) -> AsyncIterator[bytes]:
+    """Bytes of a job's output file as the pipeline appends them, until the job is finished"""
+    finished = (JobStatus.COMPLETED, JobStatus.FAILED)
+    handle = None
+    header_sent = not wav
+    try:
+        while not await request.is_disconnected():
+            job = job_manager.get_job(job_id)
+            # Статус читаем до чтения файла: задача завершается только после закрытия файла
+            done = job is None or job.status in finished
+            path = path_of(job) if job else ""
+            if handle is None and path and Path(path).exists():
+                handle = open(path, "rb")
+
+            if handle is not None and not header_sent:
+                header = await asyncio.to_thread(handle.read, WAV_HEADER_SIZE)
+                if len(header) == WAV_HEADER_SIZE:
+                    header_sent = True
+                    yield _open_ended_wav_header(header)
+                else:
+                    # Первый чанк ещё не записан
+                    handle.seek(0)
+
+            if handle is not None and header_sent:
+                data = await asyncio.to_thread(handle.read, AUDIO_READ_SIZE)
+                if data:
+                    yield data
+                    continue
+
+            if done:
+                return
+            await asyncio.sleep(AUDIO_TAIL_INTERVAL)
+    finally:
+        if handle is not None:
+            handle.close()
+
+
+@router.get("/audio/{job_id}/stream")
+async def stream_audio(job_id: str, request: Request):
+    """
+    Speech for a job, streamed while it is still being synthesized
+
+    Audio starts as soon as the first TTS chunk is written and the response
+    ends with the job. Finished speech is served like /audio/{job_id}.
+    """
+    job = job_manager.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    if job.status in (JobStatus.COMPLETED, JobStatus.FAILED):
+        if job.status == JobStatus.FAILED or not job.speech_output_path:
+            raise HTTPException(status_code=404, detail="No speech for this job")
+        return await download_audio(job_id, request)
+
+    if not TTS_ENABLED and not job.speech_output_path:
+        raise HTTPException(status_code=404, detail="Speech synthesis is disabled")
+
+    suffix = Path(job.speech_output_path).suffix if job.speech_output_path else f".{TTS_FORMAT}"
+    return StreamingResponse(
+        _tail_file(job_id, lambda job: job.speech_output_path, suffix == ".wav", request),
+        media_type=AUDIO_MEDIA_TYPES.get(suffix, "application/octet-stream"),
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
+
+
+@router.get("/subtitles/{job_id}")
+async def get_subtitles(job_id: str, request: Request, format: str = "srt", follow: bool = False):
+    """
+    Translated subtitles of an audio or video job (format=srt or vtt)
+
+    Available while the job runs: the cues translated so far are returned
+    (X-Subtitles-Complete: false), or with follow=true the response streams
+    new cues until the job ends. Finished files support Range requests.
+    """
+    if format not in SUBTITLE_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail="format must be srt or vtt")
+
+    job = job_manager.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    def path_of(current: Job) -> str:
+        base = current.subtitles_output_path
+        return str(Path(base).with_suffix(f".{format}")) if base else ""
+
+    path = Path(path_of(job))
+    if not job.subtitles_output_path or not path.exists():
+        raise HTTPException(status_code=404, detail="Subtitles not found")
+
+    media_type = SUBTITLE_MEDIA_TYPES[format]
+    if job.status == JobStatus.COMPLETED:
+        storage_janitor.touch(path)
+        return _file_response(request, path, media_type, f"{job_id}.{format}")
+    if follow:
+        return StreamingResponse(
+            _tail_file(job_id, path_of, False, request),
+            media_type=media_type,
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+    return Response(
+        await asyncio.to_thread(path.read_bytes),
+        media_type=media_type,
+        headers={"Cache-Control": "no-cache", "X-Subtitles-Complete": "false"}
+    )
+
@@ -1,55 +1,184 @@
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException, BackgroundTasks
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException
 from pathlib import Path
+from typing import List
 import logging
+import time
+import uuid
+from ai_translate_shared.metrics import QUEUE_WAIT_SECONDS, stage
+from ai_translate_shared.image_pages import DOCUMENT_EXTENSIONS, IMAGE_EXTENSIONS
 from app.models.job import FileType
 from app.services.job_manager import JobManager
-from app.utils.file_utils import get_file_type, validate_file_size, save_uploaded_file
-from app.config import UPLOAD_DIR, MAX_FILE_SIZE
+from app.services.job_queue import JobQueue, QueuedJob, QueueFullError
+from app.services.storage_janitor import storage_janitor
+from app.utils.file_utils import (
+    get_file_type, save_upload_stream, save_upload_batch, read_text_file, FileTooLargeError, DOCUMENT_MIME_TYPES
+)
+from app.config import (
+    UPLOAD_DIR, MAX_FILE_SIZE, MAX_TEXT_CHARS, QUEUE_WORKERS, QUEUE_MAX_DEPTH, QUEUE_DB_PATH, QUEUE_MAX_ATTEMPTS,
+    OCR_MAX_PAGES
+)
 from app.routes.worker import process_media
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 job_manager = JobManager()
 
+
+async def run_queued_job(queued: QueuedJob):
+    """Queue handler: runs one journaled job through the pipeline"""
+    if not job_manager.get_job(queued.job_id):
+        # Задача восстановлена из журнала после перезапуска
+        job = job_manager.create_job(queued.target_lang, job_id=queued.job_id)
+        job.file_type = queued.file_type
+        job.file_path = queued.file_path
+    # enqueued_at — time.time() из журнала, поэтому ожидание переживает перезапуск
+    wait = max(0.0, time.time() - queued.enqueued_at)
+    QUEUE_WAIT_SECONDS.observe(wait)
+    job_manager.record_timing(queued.job_id, "queue_wait", {"wall": round(wait, 4)})
+    try:
+        await process_media(queued.job_id, queued.file_path, queued.file_type, queued.target_lang, job_manager)
+    finally:
+        # Загрузка закреплена с момента постановки в очередь
+        storage_janitor.unpin(queued.file_path)
+
+
+def fail_abandoned_job(queued: QueuedJob):
+    """Journaled job that was interrupted QUEUE_MAX_ATTEMPTS times: report it as failed, don't run it again"""
+    job = job_manager.create_job(queued.target_lang, job_id=queued.job_id)
+    job.file_type = queued.file_type
+    job.file_path = queued.file_path
+    job_manager.set_failed(queued.job_id, f"Processing was interrupted {queued.attempts} times, giving up")
+
+
+job_queue = JobQueue(
+    QUEUE_DB_PATH, run_queued_job, workers=QUEUE_WORKERS, max_depth=QUEUE_MAX_DEPTH,
+    max_attempts=QUEUE_MAX_ATTEMPTS, on_give_up=fail_abandoned_job
+)
+
+def _check_accepting(target_lang: str):
+    if target_lang not in ["ru", "en", "kk"]:
+        raise HTTPException(status_code=400, detail="Invalid target language")
+
+    if job_queue.depth >= job_queue.max_depth:
+        raise HTTPException(status_code=503, detail="Queue is full, try again later", headers={"Retry-After": "30"})
+
+
+def _enqueue(temp_path: Path, original_name: str, file_type: FileType, file_hash: str,
+             upload_timing: dict, target_lang: str) -> dict:
+    """Create the job for a saved upload, move the file into place and queue it"""
+    job = job_manager.create_job(target_lang)
+    job.file_type = file_type
+    job.file_hash = file_hash
+    job_manager.record_timing(job.job_id, "upload", upload_timing)
+
+    file_path = temp_path.rename(UPLOAD_DIR / f"{job.job_id}_{original_name}")
+    job.file_path = str(file_path)
+    storage_janitor.track(file_path)
+    storage_janitor.pin(file_path)
+
+    try:
+        job_queue.submit(job.job_id, str(file_path), file_type, target_lang)
+    except QueueFullError:
+        job_manager.set_failed(job.job_id, "Queue is full")
+        storage_janitor.unpin(file_path)
+        storage_janitor.discard(file_path)
+        raise HTTPException(status_code=503, detail="Queue is full, try again later", headers={"Retry-After": "30"})
+
+    return {
+        "job_id": job.job_id,
+        "status": "queued",
+        "queue_position": job_queue.depth,
+        "message": "File uploaded successfully"
+    }
+
+
 @router.post("/upload")
 async def upload_file(
     file: UploadFile = File(...),
-    target_lang: str = Form(...),
-    background_tasks: BackgroundTasks = None
+    target_lang: str = Form(...)
 ):
+    temp_path = None
     try:
-        if target_lang not in ["ru", "en", "kk"]:
-            raise HTTPException(status_code=400, detail="Invalid target language")
-        
-        content = await file.read()
-        if not validate_file_size(len(content), MAX_FILE_SIZE):
-            raise HTTPException(status_code=413, detail="File too large")
-        
+        _check_accepting(target_lang)
+
         mime_type = file.content_type or "application/octet-stream"
-        file_type = get_file_type(mime_type)
+        original_name = Path(file.filename or "upload").name
+        file_type = get_file_type(mime_type, original_name)
+        if file_type == FileType.DOCUMENT and Path(original_name).suffix.lower() not in DOCUMENT_EXTENSIONS:
+            # Тип контейнера воркер определяет по расширению
+            original_name += DOCUMENT_MIME_TYPES[mime_type]
+
+        # Пишем файл на диск блоками, не держа его целиком в памяти
+        UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+        temp_path = UPLOAD_DIR / f".{uuid.uuid4().hex}.part"
+        try:
+            with stage("upload", unit="bytes") as upload_timing:
+                _, file_hash, upload_timing["size"] = await save_upload_stream(file, temp_path, MAX_FILE_SIZE)
+        except FileTooLargeError:
+            raise HTTPException(status_code=413, detail="File too large")
 
         if file_type == FileType.TEXT:
-            text_content = content.decode("utf-8")
-            if len(text_content) > 100000:
+            try:
+                read_text_file(temp_path, MAX_TEXT_CHARS)
+            # UnicodeDecodeError — подкласс ValueError, ловим его первым
+            except UnicodeDecodeError:
+                raise HTTPException(status_code=415, detail="Text file must be UTF-8 encoded")
+            except ValueError:
                 raise HTTPException(status_code=413, detail="Text file too large")
-        
-        job = job_manager.create_job(target_lang)
-        job.file_type = file_type
 
-        UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
-        filename = f"{job.job_id}_{file.filename}"
-        file_path = save_uploaded_file(UPLOAD_DIR, content, filename)
-        job.file_path = file_path
+        response = _enqueue(temp_path, original_name, file_type, file_hash, upload_timing, target_lang)
+        temp_path = None
+        return response
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Upload error: {e}")
+        raise HTTPException(status_code=500, detail=f"Upload failed: {e}")
+    finally:
+        if temp_path is not None:
+            temp_path.unlink(missing_ok=True)
+
 
-        if background_tasks:
-            background_tasks.add_task(process_media, job.job_id, file_path, file_type, target_lang, job_manager)
-        else:
-            process_media(job.job_id, file_path, file_type, target_lang, job_manager)
+@router.post("/upload/batch")
+async def upload_batch(
+    files: List[UploadFile] = File(...),
+    target_lang: str = Form(...)
+):
+    """
+    Several images (or PDF/TIFF files) as one OCR job
+
+    The files are packed into a zip in upload order; the job result lists
+    text and bounding boxes per page under ocr_pages.
+    """
+    temp_path = None
+    try:
+        _check_accepting(target_lang)
 
-        return {"job_id": job.job_id, "status": "processing", "message": "File uploaded successfully"}
+        if len(files) > OCR_MAX_PAGES:
+            raise HTTPException(status_code=413, detail=f"At most {OCR_MAX_PAGES} files per batch")
+        for file in files:
+            suffix = Path(file.filename or "").suffix.lower()
+            if suffix not in IMAGE_EXTENSIONS + (".pdf",):
+                raise HTTPException(status_code=400, detail=f"Not an image or PDF: {file.filename}")
+
+        UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+        temp_path = UPLOAD_DIR / f".{uuid.uuid4().hex}.part"
+        try:
+            with stage("upload", unit="bytes") as upload_timing:
+                _, file_hash, upload_timing["size"] = await save_upload_batch(files, temp_path, MAX_FILE_SIZE)
+        except FileTooLargeError:
+            raise HTTPException(status_code=413, detail="Files too large")
+
+        response = _enqueue(temp_path, "batch.zip", FileType.DOCUMENT, file_hash, upload_timing, target_lang)
+        temp_path = None
+        return response
 
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Upload error: {e}")
+        logger.error(f"Batch upload error: {e}")
         raise HTTPException(status_code=500, detail=f"Upload failed: {e}")
+    finally:
+        if temp_path is not None:
+            temp_path.unlink(missing_ok=True)
@@ -1,55 +1,415 @@
 import asyncio
+import json
 import logging
+from functools import partial
 from pathlib import Path
+from typing import List, Optional, Tuple
+from ai_translate_shared.metrics import stage
 from app.models.job import FileType, JobStatus
-from app.services.openai_client import translate_text
-from app.services.speech_to_text import SpeechToTextService
-from app.services.translation import TranslationService
-from app.config import AUDIO_OUTPUT_DIR
+from app.services.inference_pool import inference_pool
+from app.services.ocr_translation import translate_pages
+from app.services.result_cache import result_cache
+from app.services.storage_janitor import storage_janitor
+from app.services.translation_memory import translation_memory, TMStats
+from app.utils.file_utils import hash_file, image_pixels
+from app.utils.subtitles import SubtitleWriter, translate_timed
+from app.config import (
+    AUDIO_OUTPUT_DIR, WHISPER_MODEL, NLLB_MODEL, ASR_VAD_FILTER,
+    STREAM_WINDOW_MIN_SECONDS, STREAM_WINDOW_MAX_SECONDS, STREAM_QUEUE_SIZE, TTS_ENABLED, TTS_FORMAT,
+    OCR_TRANSLATION_MODE, RENDER_IMAGES, SUBTITLES_ENABLED, SUBTITLE_MAX_LINE_CHARS, SUBTITLE_MAX_CPS
+)
 
 logger = logging.getLogger(__name__)
 
-# Глобальные экземпляры сервисов
-speech_service = SpeechToTextService()
-translation_service = TranslationService()
+# Параметры, влияющие на результат этапов — входят в ключ кэша
+ASR_PARAMS = {"beam_size": 5, "vad_filter": ASR_VAD_FILTER}
+OCR_MODEL = "paddleocr-en"
+SENTENCE_END = (".", "!", "?", "…")
+# Форматы, в которых отрисованное изображение сохраняется как есть; остальные — в PNG
+RENDER_SUFFIXES = (".png", ".jpg", ".jpeg", ".webp")
+# Сколько окон субтитров переводится одним пакетом, когда запись уже распознана целиком
+SUBTITLE_BATCH_WINDOWS = 16
+
+
+def transcript_cache_key(file_type: FileType, file_hash: str) -> str:
+    if file_type in [FileType.AUDIO, FileType.VIDEO]:
+        return result_cache.transcript_key(file_hash, WHISPER_MODEL, **ASR_PARAMS)
+    elif file_type == FileType.IMAGE:
+        return result_cache.transcript_key(file_hash, OCR_MODEL)
+    elif file_type == FileType.DOCUMENT:
+        return result_cache.transcript_key(file_hash, OCR_MODEL, pages=True)
+    raise ValueError(f"Unsupported file type: {file_type}")
+
+
+async def extract_transcript(file_path: str, file_type: FileType, file_hash: str) -> str:
+    """Этап 1: извлечение текста, с кэшем по хэшу файла"""
+    if file_type == FileType.TEXT:
+        with open(file_path, "r", encoding="utf-8") as f:
+            return f.read()
+
+    key = transcript_cache_key(file_type, file_hash)
+    if cached := result_cache.get(key):
+        logger.info(f"Transcript cache hit for {file_hash[:12]}")
+        return cached["text"]
+
+    # Тяжёлый инференс выполняется в пуле процессов, event loop остаётся свободным
+    if file_type == FileType.IMAGE:
+        transcript, _ = await extract_image(file_path, file_hash)
+    else:
+        transcript, _ = await extract_audio(file_path, file_type, file_hash)
+    return transcript
+
+
+async def extract_audio(file_path: str, file_type: FileType, file_hash: str) -> Tuple[str, List[dict]]:
+    """Этап 1 для аудио и видео: текст и сегменты с таймкодами, с кэшем по хэшу файла"""
+    key = transcript_cache_key(file_type, file_hash)
+    if cached := result_cache.get(key):
+        logger.info(f"Transcript cache hit for {file_hash[:12]}")
+        return cached["text"], cached["segments"]
+
+    transcript, segments = await inference_pool.transcribe(file_path, **ASR_PARAMS)
+    result_cache.set(key, {"text": transcript, "segments": segments})
+    return transcript, segments
+
+
+async def extract_image(file_path: str, file_hash: str) -> Tuple[str, List[dict]]:
+    """Этап 1 для изображений: текст и рамки OCR, с кэшем по хэшу файла"""
+    key = transcript_cache_key(FileType.IMAGE, file_hash)
+    if cached := result_cache.get(key):
+        logger.info(f"Transcript cache hit for {file_hash[:12]}")
+        return cached["text"], cached["bboxes"]
+
+    transcript, bboxes = await inference_pool.ocr(file_path)
+    bboxes = [b.to_dict() for b in bboxes]
+    result_cache.set(key, {"text": transcript, "bboxes": bboxes})
+    return transcript, bboxes
+
+
+async def extract_document(job_id: str, file_path: str, file_hash: str, job_manager) -> Tuple[str, List[dict]]:
+    """Этап 1 для документов: OCR всех страниц пакетами в пуле, с кэшем по хэшу файла"""
+    key = transcript_cache_key(FileType.DOCUMENT, file_hash)
+    if cached := result_cache.get(key):
+        logger.info(f"Document OCR cache hit for {file_hash[:12]}")
+        return cached["text"], cached["pages"]
+
+    pages = await inference_pool.ocr_document(
+        file_path, on_progress=lambda done, total: job_manager.set_progress(job_id, "extraction", 100.0 * done / total)
+    )
+    # Пустая строка между страницами — граница предложения для памяти переводов
+    transcript = "\n\n".join(page["text"] for page in pages if page["text"])
+    result_cache.set(key, {"text": transcript, "pages": pages})
+    return transcript, pages
+
+
+async def translate_transcript(transcript: str, target_lang: str) -> Tuple[str, dict]:
+    """
+    Этап 2: перевод
+
+    Сначала кэш целого текста, затем память переводов по предложениям —
+    в модель уходят только предложения, которых ещё нет в памяти.
+    """
+    key = result_cache.translation_key(transcript, target_lang, NLLB_MODEL)
+    if cached := result_cache.get(key):
+        logger.info(f"Translation cache hit ({target_lang})")
+        return cached["text"], {"cached": True}
+
+    translated_text, stats = await translation_memory.translate(
+        transcript, target_lang, inference_pool.translate_batch, NLLB_MODEL
+    )
+    if not stats.mock:
+        result_cache.set(key, {"text": translated_text})
+    return translated_text, stats.to_dict()
+
+
+async def translate_ocr(pages: List[dict], target_lang: str) -> Tuple[str, List[dict], dict]:
+    """
+    Этап 2 для изображений и документов: перевод по блокам текста
+
+    Каждая рамка получает свой translated_text — по нему перевод можно
+    нарисовать поверх изображения.
+    """
+    # Ключ — по рамкам, а не по тексту: одинаковый текст с другой вёрсткой переводится заново
+    source = json.dumps([page.get("bboxes") for page in pages], ensure_ascii=False, sort_keys=True)
+    key = result_cache.translation_key(source, target_lang, f"{NLLB_MODEL}:boxes")
+    if cached := result_cache.get(key):
+        logger.info(f"OCR translation cache hit ({target_lang})")
+        return cached["text"], cached["pages"], {"cached": True}
+
+    translated_text, pages, stats = await translate_pages(
+        pages, target_lang, inference_pool.translate_batch, NLLB_MODEL
+    )
+    if not stats.mock:
+        result_cache.set(key, {"text": translated_text, "pages": pages})
+    return translated_text, pages, stats.to_dict()
+
+
+def _window_complete(window: List[dict]) -> bool:
+    """Окно закрывается на конце предложения, но не раньше минимальной длительности"""
+    duration = window[-1]["end"] - window[0]["start"]
+    if duration >= STREAM_WINDOW_MAX_SECONDS:
+        return True
+    return duration >= STREAM_WINDOW_MIN_SECONDS and window[-1]["text"].rstrip().endswith(SENTENCE_END)
+
+
+def _windows(segments: List[dict]) -> List[List[dict]]:
+    windows: List[List[dict]] = [[]]
+    for segment in segments:
+        if windows[-1] and _window_complete(windows[-1]):
+            windows.append([])
+        windows[-1].append(segment)
+    return [window for window in windows if window]
+
+
+async def write_subtitles(job_id: str, segments: List[dict], target_lang: str, subtitles: SubtitleWriter, job_manager):
+    """
+    Субтитры для уже распознанной записи
+
+    Сегменты собираются в окна по предложениям, как при потоковом переводе;
+    окна переводятся пакетами (предложения обычно уже в памяти переводов после
+    этапа 2), перевод окна раскладывается по его сегментам с сохранением таймкодов.
+    """
+    windows = _windows(segments)
+    for i in range(0, len(windows), SUBTITLE_BATCH_WINDOWS):
+        batch = windows[i:i + SUBTITLE_BATCH_WINDOWS]
+        sources = [" ".join(seg["text"].strip() for seg in window) for window in batch]
+        translations, _ = await translation_memory.translate_many(
+            sources, target_lang, inference_pool.translate_batch, NLLB_MODEL
+        )
+        for window, translated in zip(batch, translations):
+            subtitles.add(translate_timed(window, translated))
+        job_manager.set_progress(job_id, "subtitles", 100.0 * min(len(windows), i + len(batch)) / len(windows))
+
+
+async def stream_transcribe_translate(
+    job_id: str, file_path: str, target_lang: str, job_manager, subtitles: Optional[SubtitleWriter] = None
+) -> Tuple[str, List[dict], str, dict]:
+    """
+    Этапы 1+2 для аудио и видео одновременно
+
+    Сегменты faster-whisper (с VAD) собираются в окна по предложениям и через
+    ограниченную очередь сразу уходят на перевод, пока распознавание продолжается.
+    Каждое переведённое окно записывается в задачу как частичный результат
+    и, если переданы subtitles, сразу дописывается в файлы субтитров;
+    прогресс этапов считается по позиции в аудио.
+
+    Returns:
+        Tuple of (transcript, segments, translated_text, translation stats)
+    """
+    windows: asyncio.Queue = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE)
+    segments: List[dict] = []
+    translations: List[str] = []
+    stats = TMStats()
+
+    duration = 0.0
+
+    def on_duration(seconds: float):
+        nonlocal duration
+        duration = seconds
+
+    def percent(position: float) -> float:
+        return 100.0 * position / duration if duration > 0 else 0.0
+
+    async def produce():
+        window: List[dict] = []
+        async for segment in inference_pool.transcribe_stream(file_path, **ASR_PARAMS, on_duration=on_duration):
+            segments.append(segment)
+            job_manager.set_progress(job_id, "transcription", percent(segment["end"]))
+            window.append(segment)
+            if _window_complete(window):
+                await windows.put(window)
+                window = []
+        if window:
+            await windows.put(window)
+        await windows.put(None)
+
+    async def consume():
+        while (window := await windows.get()) is not None:
+            source = " ".join(seg["text"].strip() for seg in window)
+            translated, window_stats = await translation_memory.translate(
+                source, target_lang, inference_pool.translate_batch, NLLB_MODEL
+            )
+            stats.merge(window_stats)
+            translations.append(translated)
+            if subtitles is not None:
+                subtitles.add(translate_timed(window, translated))
+            job_manager.append_partial(job_id, {
+                "start": window[0]["start"],
+                "end": window[-1]["end"],
+                "source_text": source,
+                "translated_text": translated,
+            })
+            job_manager.set_progress(job_id, "translation", percent(window[-1]["end"]))
+
+    producer = asyncio.create_task(produce())
+    consumer = asyncio.create_task(consume())
+    try:
+        await asyncio.gather(producer, consumer)
+    except BaseException:
+        # Падение одной стороны не должно оставить вторую висеть на очереди
+        producer.cancel()
+        consumer.cancel()
+        raise
+
+    transcript = " ".join(seg["text"] for seg in segments)
+    return transcript, segments, " ".join(translations), stats.to_dict()
+
+
+def _audio_seconds(segments: List[dict]) -> float:
+    return round(segments[-1]["end"], 3) if segments else 0.0
+
 
 async def process_media(job_id: str, file_path: str, file_type: FileType, target_lang: str, job_manager):
+    def timed(name: str, size=None, unit=None):
+        # Время этапа попадает и в гистограммы /metrics, и в job.timings
+        return stage(name, size, unit, on_done=partial(job_manager.record_timing, job_id, name))
+
+    subtitles = None
     try:
         job_manager.set_processing(job_id)
         job = job_manager.get_job(job_id)
-        
-        # 1. Извлечение текста
-        if file_type in [FileType.AUDIO, FileType.VIDEO]:
-            transcript, _ = await speech_service.extract_text(file_path)
-        elif file_type == FileType.IMAGE:
-            transcript, _ = await speech_service.extract_text(file_path)  # Используем тот же сервис с OCR
-        elif file_type == FileType.TEXT:
-            with open(file_path, "r", encoding="utf-8") as f:
-                transcript = f.read()
+
+        if job and job.file_hash:
+            file_hash = job.file_hash
         else:
-            raise ValueError(f"Unsupported file type: {file_type}")
+            with timed("hash", Path(file_path).stat().st_size, "bytes"):
+                file_hash = await asyncio.to_thread(hash_file, Path(file_path))
+
+        streamed = False
+        pages = None
+        segments = None
+        if SUBTITLES_ENABLED and file_type in [FileType.AUDIO, FileType.VIDEO]:
+            # Файлы субтитров растут по ходу перевода — /subtitles/{job_id} отдаёт их до конца задачи
+            AUDIO_OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+            subtitles = SubtitleWriter(AUDIO_OUTPUT_DIR / job_id, SUBTITLE_MAX_LINE_CHARS, SUBTITLE_MAX_CPS)
+            job_manager.update_job(job_id, subtitles_output_path=str(subtitles.srt_path))
+
+        if file_type in [FileType.AUDIO, FileType.VIDEO]:
+            key = transcript_cache_key(file_type, file_hash)
+            shards = await inference_pool.plan_shards(file_path) if result_cache.get(key) is None else []
+            if len(shards) > 1:
+                # 1. Длинная запись: части распознаются параллельно во всех воркерах,
+                # перевод — следующим этапом целиком через память переводов
+                with timed("transcription", unit="audio_seconds") as timing:
+                    transcript, segments = await inference_pool.transcribe_shards(
+                        file_path, shards, **ASR_PARAMS,
+                        on_progress=lambda done, total: job_manager.set_progress(job_id, "transcription", 100.0 * done / total)
+                    )
+                    timing["size"] = _audio_seconds(segments)
+                result_cache.set(key, {"text": transcript, "segments": segments})
+                logger.info(f"Job {job_id}: transcribed {len(shards)} shards in parallel")
+            elif shards:
+                # 1+2. Распознавание и перевод идут параллельно — время у них общее
+                with timed("transcription_translation", unit="audio_seconds") as timing:
+                    transcript, segments, translated_text, translation_stats = await stream_transcribe_translate(
+                        job_id, file_path, target_lang, job_manager, subtitles
+                    )
+                    timing["size"] = _audio_seconds(segments)
+                result_cache.set(key, {"text": transcript, "segments": segments})
+                if not translation_stats["mock"]:
+                    result_cache.set(
+                        result_cache.translation_key(transcript, target_lang, NLLB_MODEL),
+                        {"text": translated_text}
+                    )
+                streamed = True
+
+        if not streamed:
+            # 1. Извлечение текста
+            job_manager.set_progress(job_id, "extraction", 0)
+            with timed("extraction") as timing:
+                if file_type == FileType.DOCUMENT:
+                    transcript, pages = await extract_document(job_id, file_path, file_hash, job_manager)
+                    job_manager.update_job(job_id, ocr_pages=pages)
+                    timing.update(size=len(pages), unit="pages")
+                elif file_type == FileType.IMAGE:
+                    transcript, bboxes = await extract_image(file_path, file_hash)
+                    pages = [{"source": None, "page": 1, "text": transcript, "bboxes": bboxes}]
+                elif file_type in [FileType.AUDIO, FileType.VIDEO]:
+                    transcript, segments = await extract_audio(file_path, file_type, file_hash)
+                else:
+                    transcript = await extract_transcript(file_path, file_type, file_hash)
+                if file_type == FileType.IMAGE:
+                    timing.update(size=await asyncio.to_thread(image_pixels, Path(file_path)), unit="pixels")
+                elif file_type == FileType.TEXT:
+                    timing.update(size=len(transcript), unit="chars")
+
+            # 2. Перевод
+            job_manager.set_progress(job_id, "translation", 0)
+            with timed("translation", len(transcript), "chars"):
+                if pages is not None and OCR_TRANSLATION_MODE == "boxes":
+                    translated_text, pages, translation_stats = await translate_ocr(pages, target_lang)
+                    job_manager.update_job(job_id, ocr_pages=pages)
+                else:
+                    translated_text, translation_stats = await translate_transcript(transcript, target_lang)
+
+            if subtitles is not None and segments:
+                # 2a. Субтитры: перевод по окнам с сохранением таймкодов сегментов
+                job_manager.set_progress(job_id, "subtitles", 0)
+                with timed("subtitles", _audio_seconds(segments), "audio_seconds"):
+                    await write_subtitles(job_id, segments, target_lang, subtitles, job_manager)
+
+        job_manager.update_job(job_id, translation_stats=translation_stats)
 
-        # 2. Перевод
-        translated_text = await translation_service.translate(transcript, target_lang)
-        
         # 3. Сохранение результата
         AUDIO_OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
         output_path = AUDIO_OUTPUT_DIR / f"{job_id}.txt"
-        output_path.write_text(translated_text, encoding="utf-8")
-        
-        # 4. Обновление задания
+        with timed("write", unit="bytes") as timing:
+            timing["size"] = output_path.write_bytes(translated_text.encode("utf-8"))
+        storage_janitor.track(output_path)
+
+        # 4. Перевод поверх изображения: для документа — zip из PNG по страницам
+        if RENDER_IMAGES and pages and OCR_TRANSLATION_MODE == "boxes":
+            job_manager.set_progress(job_id, "render", 0)
+            with timed("render", len(pages), "pages"):
+                if file_type == FileType.IMAGE:
+                    suffix = Path(file_path).suffix.lower()
+                    image_path = AUDIO_OUTPUT_DIR / f"{job_id}{suffix if suffix in RENDER_SUFFIXES else '.png'}"
+                    await inference_pool.render_image(file_path, pages[0]["bboxes"], str(image_path))
+                else:
+                    image_path = AUDIO_OUTPUT_DIR / f"{job_id}.zip"
+                    await inference_pool.render_document(
+                        file_path, pages, str(image_path),
+                        on_progress=lambda done, total: job_manager.set_progress(job_id, "render", 100.0 * done / total)
+                    )
+            storage_janitor.track(image_path)
+            job_manager.update_job(job_id, image_output_path=str(image_path))
+
+        # 5. Озвучка перевода: чанки синтезируются во всех воркерах и дописываются в файл по порядку
+        if TTS_ENABLED and translated_text.strip():
+            job_manager.set_progress(job_id, "tts", 0)
+            speech_path = AUDIO_OUTPUT_DIR / f"{job_id}.{TTS_FORMAT}"
+            # Путь известен заранее — /audio/{job_id}/stream отдаёт файл, пока он дописывается
+            job_manager.update_job(job_id, speech_output_path=str(speech_path))
+            with timed("tts", unit="audio_seconds") as timing:
+                timing["size"] = await inference_pool.synthesize_speech(
+                    translated_text, str(speech_path), target_lang,
+                    on_progress=lambda done, total: job_manager.set_progress(job_id, "tts", 100.0 * done / total)
+                )
+            storage_janitor.track(speech_path)
+
+        if subtitles is not None:
+            subtitles.close()
+            storage_janitor.track(subtitles.srt_path)
+            storage_janitor.track(subtitles.vtt_path)
+
+        # 6. Обновление задания
         job_manager.update_job(
             job_id,
             translated_text=translated_text[:500] + "..." if len(translated_text) > 500 else translated_text,
             audio_output_path=str(output_path)
         )
+        job_manager.set_progress(job_id, "done", 100)
         job_manager.set_completed(job_id)
-        
+
+        # Исходник больше не нужен: результаты этапов уже в кэше по хэшу файла
+        storage_janitor.discard(file_path)
+
         logger.info(f"Job {job_id} completed successfully")
         return translated_text
-        
+
     except Exception as e:
         error_msg = f"Processing failed: {str(e)}"
         logger.error(error_msg, exc_info=True)
+        if subtitles is not None:
+            subtitles.close()
         job_manager.set_failed(job_id, error_msg)
-        raise
\ No newline at end of file
+        raise
@@ -0,0 +1,50 @@
+"""
+Fixed translations for short terms: product names, UI labels, signage
+"""
+import json
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+from app.config import GLOSSARY_PATH
+from app.utils.text_utils import normalize_segment
+
+logger = logging.getLogger(__name__)
+
+
+class Glossary:
+    """
+    Exact-match term translations per target language
+
+    The file is JSON {"ru": {"Exit": "Выход", ...}, "kk": {...}} and is read
+    on first use; matching ignores case, punctuation and extra spaces.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._terms: Optional[Dict[str, Dict[str, str]]] = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> Dict[str, Dict[str, str]]:
+        with self._lock:
+            if self._terms is None:
+                terms: Dict[str, Dict[str, str]] = {}
+                if self.path.exists():
+                    try:
+                        data = json.loads(self.path.read_text(encoding="utf-8"))
+                        for lang, entries in data.items():
+                            terms[lang] = {normalize_segment(source): target for source, target in entries.items()}
+                        logger.info(f"Glossary loaded: {sum(map(len, terms.values()))} terms from {self.path}")
+                    except (OSError, ValueError, AttributeError) as e:
+                        logger.warning(f"Glossary {self.path} ignored: {e}")
+                self._terms = terms
+            return self._terms
+
+    def lookup(self, text: str, target_lang: str) -> Optional[str]:
+        normalized = normalize_segment(text)
+        if not normalized:
+            return None
+        return self._load().get(target_lang, {}).get(normalized)
+
+
+glossary = Glossary(GLOSSARY_PATH)
@@ -5,28 +5,46 @@ import logging
 from pathlib import Path
 from typing import List, Tuple
 from app.models.job import BoundingBox
-import cv2
-import numpy as np
+from app.config import (
+    INFERENCE_THREADS, OCR_REC_BATCH_SIZE, OCR_TARGET_TEXT_HEIGHT, OCR_TILE_SIZE, OCR_TILE_OVERLAP
+)
+from app.services.model_registry import model_registry
+from app.utils import image_preprocess
+from app.utils.image_preprocess import ImagePlan, Tile
 
 logger = logging.getLogger(__name__)
 
+
+def load_paddleocr():
+    from paddleocr import PaddleOCR
+    return PaddleOCR(use_angle_cls=True, lang='en', cpu_threads=INFERENCE_THREADS, rec_batch_num=OCR_REC_BATCH_SIZE)
+
+
+model_registry.register("ocr", load_paddleocr)
+
+
 class ImageToTextService:
     """Service for extracting text from images"""
     
     def __init__(self):
-        self.initialized = False
-        self._initialize_model()
+        self.loaded = False
     
-    def _initialize_model(self):
-        """Initialize PaddleOCR model"""
-        try:
-            from paddleocr import PaddleOCR
-            self.ocr = PaddleOCR(use_angle_cls=True, lang='en')
-            self.initialized = True
-            logger.info("PaddleOCR model initialized")
-        except Exception as e:
-            logger.warning(f"PaddleOCR not available: {e}. Using fallback.")
-            self.ocr = None
+    def _initialize_model(self) -> bool:
+        """
+        Load PaddleOCR through the model registry (called lazily inside the inference worker)
+
+        Returns False while it is unavailable; the registry retries a failed
+        load with backoff, and until then the fallback output is used.
+        """
+        if not self.loaded:
+            self.loaded = model_registry.try_load("ocr")
+            if self.loaded:
+                logger.info("PaddleOCR model initialized")
+        return self.loaded
+
+    @property
+    def ocr(self):
+        return model_registry.get("ocr")
     
     def extract_text(self, file_path: str) -> Tuple[str, List[BoundingBox]]:
         """
@@ -38,42 +56,13 @@ class ImageToTextService:
         Returns:
             Tuple of (full_text, bounding_boxes)
         """
-        if not self.initialized or self.ocr is None:
+        if not self._initialize_model():
             return self._mock_extract(file_path)
         
         try:
             logger.info(f"Starting OCR for: {file_path}")
             
-            result = self.ocr.ocr(file_path, cls=True)
-            
-            bboxes = []
-            texts = []
-            
-            if result and len(result) > 0:
-                for line in result:
-                    for word_info in line:
-                        points = word_info[0]
-                        text = word_info[1][0]
-                        confidence = word_info[1][1]
-                        
-                        # Calculate bounding box from points
-                        x_coords = [p[0] for p in points]
-                        y_coords = [p[1] for p in points]
-                        
-                        x = min(x_coords)
-                        y = min(y_coords)
-                        width = max(x_coords) - x
-                        height = max(y_coords) - y
-                        
-                        bbox = BoundingBox(
-                            x=float(x), y=float(y),
-                            width=float(width), height=float(height),
-                            text=text, confidence=float(confidence)
-                        )
-                        bboxes.append(bbox)
-                        texts.append(text)
-            
-            full_text = " ".join(texts)
+            full_text, bboxes = self.extract_image(image_preprocess.read_image(file_path))
             logger.info(f"Extracted {len(bboxes)} text regions")
             
             return full_text, bboxes
@@ -81,6 +70,104 @@ class ImageToTextService:
         except Exception as e:
             logger.error(f"Error in OCR: {e}")
             raise
+
+    def extract_image(self, image) -> Tuple[str, List[BoundingBox]]:
+        """
+        OCR a decoded BGR image through the preprocessing stage
+
+        The image is downscaled to OCR_TARGET_TEXT_HEIGHT text and, if still
+        larger than OCR_TILE_SIZE, processed tile by tile; boxes come back in
+        the coordinates of the image passed in.
+        """
+        work, plan = image_preprocess.prepare(image, OCR_TARGET_TEXT_HEIGHT, OCR_TILE_SIZE, OCR_TILE_OVERLAP)
+        if plan.work_width != plan.width:
+            logger.info(
+                f"OCR at {plan.work_width}x{plan.work_height} instead of {plan.width}x{plan.height} "
+                f"(text ~{plan.text_height:.0f}px), {len(plan.tiles)} tiles"
+            )
+        bboxes = []
+        for tile in plan.tiles:
+            bboxes.extend(self._ocr_tile(work, plan, tile))
+        bboxes = image_preprocess.reading_order(bboxes)
+        return " ".join(box.text for box in bboxes), bboxes
+
+    def plan(self, file_path: str) -> ImagePlan:
+        """Working resolution and tiles for an image file (for OCR spread over several workers)"""
+        image = image_preprocess.read_image(file_path)
+        _, plan = image_preprocess.prepare(image, OCR_TARGET_TEXT_HEIGHT, OCR_TILE_SIZE, OCR_TILE_OVERLAP)
+        return plan
+
+    def extract_tiles(self, file_path: str, plan: ImagePlan, indices: List[int]) -> List[BoundingBox]:
+        """
+        OCR some tiles of a planned image; boxes are in original image coordinates
+
+        The image is decoded once per call, so a worker pays for one decode
+        however many of the tiles it gets.
+        """
+        if not self._initialize_model():
+            return self._mock_extract(file_path)[1] if 0 in indices else []
+
+        work = image_preprocess.working_image(image_preprocess.read_image(file_path, plan.scale), plan)
+        return [box for index in indices for box in self._ocr_tile(work, plan, plan.tiles[index])]
+
+    def _ocr_tile(self, work, plan: ImagePlan, tile: Tile) -> List[BoundingBox]:
+        with model_registry.lease("ocr") as ocr:
+            result = ocr.ocr(image_preprocess.crop(work, tile), cls=True)
+        _, bboxes = self._parse(result)
+        return image_preprocess.map_boxes(bboxes, tile, plan)
+
+    def extract_batch(self, images: List) -> List[Tuple[str, List[BoundingBox]]]:
+        """
+        OCR a batch of decoded pages
+
+        Args:
+            images: RGB NumPy arrays (see ai_translate_shared.image_pages.load_pages)
+
+        Returns:
+            (text, bounding_boxes) per image, in input order
+        """
+        if not self._initialize_model():
+            return [self._mock_extract("") for _ in images]
+
+        results = []
+        for image in images:
+            # PaddleOCR ждёт BGR, как после cv2.imread; распознавание строк внутри страницы идёт пакетами
+            results.append(self.extract_image(image[:, :, ::-1]))
+        logger.info(f"OCR batch: {len(images)} pages, {sum(len(boxes) for _, boxes in results)} text regions")
+        return results
+
+    @staticmethod
+    def _parse(result) -> Tuple[str, List[BoundingBox]]:
+        """PaddleOCR output -> (full_text, bounding_boxes)"""
+        bboxes = []
+        texts = []
+
+        if result and len(result) > 0:
+            for line in result:
+                # Страница без текста приходит как None
+                for word_info in line or []:
+                    points = word_info[0]
+                    text = word_info[1][0]
+                    confidence = word_info[1][1]
+
+                    # Calculate bounding box from points
+                    x_coords = [p[0] for p in points]
+                    y_coords = [p[1] for p in points]
+
+                    x = min(x_coords)
+                    y = min(y_coords)
+                    width = max(x_coords) - x
+                    height = max(y_coords) - y
+
+                    bbox = BoundingBox(
+                        x=float(x), y=float(y),
+                        width=float(width), height=float(height),
+                        text=text, confidence=float(confidence)
+                    )
+                    bboxes.append(bbox)
+                    texts.append(text)
+
+        return " ".join(texts), bboxes
     
     def _mock_extract(self, file_path: str) -> Tuple[str, List[BoundingBox]]:
         """Mock implementation"""
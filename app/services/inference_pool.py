@@ -0,0 +1,503 @@
+"""
+Process pool for CPU-bound inference (Whisper, OCR, NLLB)
+
+Each worker process loads its models on first use through the model
+registry. Calls lease the model for as long as they run; a model nobody
+holds is unloaded after MODEL_IDLE_TTL_SECONDS (or sooner, above
+MODEL_MEMORY_BUDGET_MB) and loaded again by the next call that needs it.
+Intra-op thread counts are pinned per worker so that INFERENCE_WORKERS x
+INFERENCE_THREADS matches the number of cores instead of every model
+grabbing all of them.
+"""
+import asyncio
+import contextlib
+import importlib
+import logging
+import multiprocessing
+import os
+import queue
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+from ai_translate_shared.metrics import observe_inference
+from app.config import (
+    INFERENCE_WORKERS, INFERENCE_THREADS, MODEL_WARMUP, OCR_BATCH_SIZE, OCR_MAX_PAGES, OCR_TILE_SIZE,
+    TRANSCRIBE_SHARD_MIN_SECONDS, TRANSCRIBE_SHARD_OVERLAP_SECONDS, TTS_CHUNK_CHARS, RENDER_FONT_PATH
+)
+from app.utils.audio_utils import AudioWriter, merge_shard_segments, probe_duration
+from app.utils.file_utils import image_size
+from app.utils.image_preprocess import reading_order
+from app.utils.text_utils import chunk_sentences
+
+logger = logging.getLogger(__name__)
+
+# Экземпляры сервисов внутри процесса-воркера
+_services: Dict[str, Any] = {}
+
+
+# Модуль, который регистрирует модель в реестре при импорте
+_MODEL_MODULES = {
+    "whisper": "app.services.speech_to_text",
+    "nllb": "app.services.translation",
+    "ocr": "app.services.image_to_text",
+    "tts": "app.services.text_to_speech",
+}
+
+
+def _init_worker(threads: int, warmup: List[str] = (), model_status=None):
+    """
+    Pin thread pools before any model library is imported in the worker
+
+    model_status is a manager dict shared with the parent: every worker
+    publishes its registry stats there under its pid for /api/ready.
+    """
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+        torch.set_num_interop_threads(1)
+    except ImportError:
+        pass
+
+    from app.services.model_registry import model_registry
+    if model_status is not None:
+        pid = os.getpid()
+        model_registry.listener = lambda stats: model_status.__setitem__(pid, stats)
+        model_status[pid] = []
+    model_registry.start_reaper()
+    names = [name for name in warmup if name in _MODEL_MODULES]
+    for name in names:
+        importlib.import_module(_MODEL_MODULES[name])
+    if names:
+        model_registry.warm_up(names)
+
+
+def _get_service(name: str):
+    if name not in _services:
+        if name == "speech":
+            from app.services.speech_to_text import SpeechToTextService
+            _services[name] = SpeechToTextService()
+        elif name == "translation":
+            from app.services.translation import TranslationService
+            _services[name] = TranslationService()
+        elif name == "ocr":
+            from app.services.image_to_text import ImageToTextService
+            _services[name] = ImageToTextService()
+        elif name == "tts":
+            from app.services.text_to_speech import TextToSpeechService
+            _services[name] = TextToSpeechService()
+        else:
+            raise ValueError(f"Unknown service: {name}")
+    return _services[name]
+
+
+def _measured(fn: Callable, *args, **kwargs) -> Tuple[Any, float]:
+    """Run fn in the worker and return its result with the CPU time it took there"""
+    started = time.process_time()
+    result = fn(*args, **kwargs)
+    return result, time.process_time() - started
+
+
+def _transcribe(file_path: str, beam_size: int, vad_filter: bool = True) -> Tuple[str, List[dict]]:
+    return _get_service("speech").transcribe(file_path, beam_size=beam_size, vad_filter=vad_filter)
+
+
+def _transcribe_stream(file_path: str, beam_size: int, vad_filter: bool, out_queue) -> int:
+    """
+    Push segments to out_queue as they are decoded; None marks the end
+
+    The first item is {"duration": seconds} so the parent can report progress.
+    """
+    count = 0
+    try:
+        segments = _get_service("speech").stream_segments(
+            file_path, beam_size=beam_size, vad_filter=vad_filter,
+            on_duration=lambda duration: out_queue.put({"duration": duration})
+        )
+        for segment in segments:
+            out_queue.put(segment)
+            count += 1
+    finally:
+        out_queue.put(None)
+    return count
+
+
+def _plan_shards(file_path: str, max_shards: int, min_seconds: float):
+    from app.utils.audio_utils import plan_shards
+    return plan_shards(file_path, max_shards, min_seconds)
+
+
+def _transcribe_shard(file_path: str, start: float, end: Optional[float], overlap: float,
+                      beam_size: int, vad_filter: bool) -> List[dict]:
+    return _get_service("speech").transcribe_shard(
+        file_path, start, end, overlap=overlap, beam_size=beam_size, vad_filter=vad_filter
+    )
+
+
+def _translate(text: str, target_lang: str) -> str:
+    return _get_service("translation").translate(text, target_lang)
+
+
+def _translate_batch(texts: List[str], target_lang: str) -> List[str]:
+    return _get_service("translation").translate_batch(texts, target_lang)
+
+
+def _ocr(file_path: str):
+    return _get_service("ocr").extract_text(file_path)
+
+
+def _plan_image(file_path: str):
+    return _get_service("ocr").plan(file_path)
+
+
+def _ocr_tiles(file_path: str, plan, indices: List[int]):
+    return _get_service("ocr").extract_tiles(file_path, plan, indices)
+
+
+def _render_image(file_path: str, boxes: List[dict], output_path: str):
+    from app.utils.image_render import render_file
+    render_file(file_path, boxes, output_path, RENDER_FONT_PATH)
+
+
+def _render_pages(file_path: str, pages: List[dict]) -> List[bytes]:
+    from app.utils.image_render import render_pages
+    return render_pages(file_path, pages, RENDER_FONT_PATH)
+
+
+def _synthesize(text: str, lang: str) -> Tuple[bytes, int]:
+    return _get_service("tts").synthesize(text, lang)
+
+
+def _list_pages(file_path: str, max_pages: int):
+    from ai_translate_shared.image_pages import list_pages
+    return list_pages(file_path, max_pages)
+
+
+def _ocr_pages(file_path: str, pages: list):
+    """Decode a slice of a document's pages in this worker and OCR them as one batch"""
+    from ai_translate_shared.image_pages import load_pages
+    return _get_service("ocr").extract_batch(load_pages(file_path, pages))
+
+
+class InferencePool:
+    """Async facade over a ProcessPoolExecutor of model workers"""
+
+    def __init__(self, workers: int = INFERENCE_WORKERS, threads: int = INFERENCE_THREADS, warmup: List[str] = MODEL_WARMUP):
+        self.workers = max(1, workers)
+        self.threads = max(1, threads)
+        self.warmup = list(warmup)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._manager = None
+        self._model_status = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: воркеры не наследуют состояние родителя (потоки, открытые сокеты uvicorn)
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.threads, self.warmup, self._get_model_status()),
+            )
+            logger.info(f"Inference pool started: {self.workers} workers x {self.threads} threads")
+        return self._executor
+
+    def _get_model_status(self):
+        if self._model_status is None:
+            self._model_status = self._get_manager().dict()
+        return self._model_status
+
+    @property
+    def started(self) -> bool:
+        return self._executor is not None
+
+    def model_status(self) -> Dict[str, dict]:
+        """
+        Models loaded across the workers, aggregated by name
+
+        Reads what the workers reported; never starts the pool or a model.
+        """
+        if self._model_status is None:
+            return {}
+        models: Dict[str, dict] = {}
+        try:
+            reports = list(self._model_status.values())
+        except (OSError, EOFError):
+            return {}
+        for stats in reports:
+            for entry in stats:
+                model = models.setdefault(entry["name"], {"loaded_workers": 0, "memory_mb": 0.0})
+                if entry["loaded"]:
+                    model["loaded_workers"] += 1
+                    model["memory_mb"] = round(model["memory_mb"] + entry["memory_mb"], 1)
+        return models
+
+    def start(self):
+        """
+        Spawn the workers now instead of on the first job
+
+        Workers start their model warm-up in the background right away.
+        Without MODEL_WARMUP this only pays the process start-up cost early.
+        """
+        executor = self._get_executor()
+        for _ in range(self.workers):
+            executor.submit(os.getpid)
+
+    async def run(self, fn: Callable, *args, **kwargs):
+        """Run a module-level function in a worker process"""
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        result, cpu = await loop.run_in_executor(self._get_executor(), partial(_measured, fn, *args, **kwargs))
+        observe_inference(fn.__name__.lstrip("_"), time.perf_counter() - started, cpu)
+        return result
+
+    async def transcribe(self, file_path: str, beam_size: int = 5, vad_filter: bool = True) -> Tuple[str, List[dict]]:
+        return await self.run(_transcribe, str(file_path), beam_size, vad_filter)
+
+    async def transcribe_stream(
+        self, file_path: str, beam_size: int = 5, vad_filter: bool = True,
+        on_duration: Optional[Callable[[float], None]] = None
+    ) -> AsyncIterator[dict]:
+        """
+        Yield segments while the worker is still transcribing
+
+        The worker pushes segments into a manager queue; the parent drains it
+        from a thread so the event loop is never blocked on queue.get().
+        """
+        out_queue = self._get_manager().Queue()
+        future = asyncio.ensure_future(self.run(_transcribe_stream, str(file_path), beam_size, vad_filter, out_queue))
+        try:
+            while True:
+                try:
+                    segment = await asyncio.to_thread(out_queue.get, True, 1.0)
+                except queue.Empty:
+                    if future.done():
+                        # Воркер завершился, не отправив маркер конца — пробрасываем его ошибку
+                        future.result()
+                        break
+                    continue
+                if segment is None:
+                    break
+                if "text" not in segment:
+                    # Заголовок потока с длительностью аудио
+                    if on_duration:
+                        on_duration(segment["duration"])
+                    continue
+                yield segment
+            await future
+        finally:
+            if not future.done():
+                future.cancel()
+
+    async def plan_shards(self, file_path: str, min_seconds: float = TRANSCRIBE_SHARD_MIN_SECONDS) -> List[Tuple[float, Optional[float]]]:
+        """Silence-aligned (start, end) ranges, one per worker at most"""
+        # Короткую запись видно по метаданным: не ждём свободного воркера и не декодируем её
+        duration = await asyncio.to_thread(probe_duration, str(file_path))
+        if self.workers < 2 or (duration is not None and duration < 2 * min_seconds):
+            return [(0.0, None)]
+        return await self.run(_plan_shards, str(file_path), self.workers, min_seconds)
+
+    async def transcribe_shards(
+        self, file_path: str, shards: List[Tuple[float, Optional[float]]],
+        beam_size: int = 5, vad_filter: bool = True,
+        overlap: float = TRANSCRIBE_SHARD_OVERLAP_SECONDS,
+        on_progress: Optional[Callable[[int, int], None]] = None
+    ) -> Tuple[str, List[dict]]:
+        """
+        Transcribe shards of one recording in parallel worker processes
+
+        Each worker decodes only its own slice (plus the overlap) with ffmpeg;
+        segments both neighbours heard around a cut are kept from one side only.
+        """
+        tasks = [
+            asyncio.ensure_future(self.run(_transcribe_shard, str(file_path), start, end, overlap, beam_size, vad_filter))
+            for start, end in shards
+        ]
+        try:
+            done = 0
+            for finished in asyncio.as_completed(tasks):
+                await finished
+                done += 1
+                if on_progress:
+                    on_progress(done, len(tasks))
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+
+        segments = merge_shard_segments(shards, [task.result() for task in tasks])
+        return " ".join(seg["text"] for seg in segments), segments
+
+    def _get_manager(self):
+        if self._manager is None:
+            self._manager = multiprocessing.get_context("spawn").Manager()
+        return self._manager
+
+    async def translate(self, text: str, target_lang: str) -> str:
+        return await self.run(_translate, text, target_lang)
+
+    async def translate_batch(self, texts: List[str], target_lang: str) -> List[str]:
+        return await self.run(_translate_batch, texts, target_lang)
+
+    async def ocr(self, file_path: str):
+        """
+        OCR one image; images larger than a tile are split over the workers
+
+        The plan (text scale, working resolution, tiles) is made in one worker,
+        then the tiles are dealt out round-robin, one call per worker: each call
+        decodes the image once and recognises its share of tiles, and the boxes
+        are merged back into reading order here.
+        """
+        size = await asyncio.to_thread(image_size, file_path)
+        if size is None or max(size) <= OCR_TILE_SIZE or self.workers == 1:
+            return await self.run(_ocr, str(file_path))
+
+        plan = await self.run(_plan_image, str(file_path))
+        indices = list(range(len(plan.tiles)))
+        shares = [indices[i::self.workers] for i in range(min(self.workers, len(indices)))]
+        tasks = [asyncio.ensure_future(self.run(_ocr_tiles, str(file_path), plan, share)) for share in shares]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+
+        bboxes = reading_order([box for task in tasks for box in task.result()])
+        return " ".join(box.text for box in bboxes), bboxes
+
+    async def ocr_document(
+        self, file_path: str, batch_size: int = OCR_BATCH_SIZE, max_pages: int = OCR_MAX_PAGES,
+        on_progress: Optional[Callable[[int, int], None]] = None
+    ) -> List[dict]:
+        """
+        OCR every page of a zip of images, a multi-page TIFF or a PDF
+
+        Pages are split into batches spread over all workers, so decoding,
+        rasterization and recognition run on every core at once.
+
+        Returns:
+            [{"source", "page", "text", "bboxes"}] in document order
+        """
+        pages = await self.run(_list_pages, str(file_path), max_pages)
+        if not pages:
+            return []
+        # Небольшой документ делим поровну, чтобы заняты были все воркеры
+        size = max(1, min(batch_size, -(-len(pages) // self.workers)))
+        batches = [pages[i:i + size] for i in range(0, len(pages), size)]
+        tasks = [asyncio.ensure_future(self.run(_ocr_pages, str(file_path), batch)) for batch in batches]
+        try:
+            done = 0
+            for finished in asyncio.as_completed(tasks):
+                await finished
+                done += 1
+                if on_progress:
+                    on_progress(done, len(tasks))
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+
+        results = [page for task in tasks for page in task.result()]
+        return [
+            {"source": name, "page": index + 1, "text": text, "bboxes": [b.to_dict() for b in bboxes]}
+            for (name, index), (text, bboxes) in zip(pages, results)
+        ]
+
+    async def render_image(self, file_path: str, boxes: List[dict], output_path: str):
+        """Draw per-box translations over an image and write it to output_path"""
+        await self.run(_render_image, str(file_path), boxes, str(output_path))
+
+    async def render_document(
+        self, file_path: str, pages: List[dict], output_path: str, batch_size: int = OCR_BATCH_SIZE,
+        on_progress: Optional[Callable[[int, int], None]] = None
+    ):
+        """
+        Render translated pages of a document across all workers into a zip of PNGs
+
+        Batches are written to the (uncompressed) zip in page order as soon as
+        they and every batch before them are done.
+        """
+        size = max(1, min(batch_size, -(-len(pages) // self.workers)))
+        batches = [pages[i:i + size] for i in range(0, len(pages), size)]
+        tasks = [asyncio.ensure_future(self.run(_render_pages, str(file_path), batch)) for batch in batches]
+        try:
+            with zipfile.ZipFile(output_path, "w", zipfile.ZIP_STORED) as archive:
+                number = 0
+                for done, task in enumerate(tasks, 1):
+                    for image in await task:
+                        number += 1
+                        await asyncio.to_thread(archive.writestr, f"page_{number:04d}.png", image)
+                    if on_progress:
+                        on_progress(done, len(tasks))
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+
+    async def speech_chunks(
+        self, text: str, lang: str = "en", chunk_chars: int = TTS_CHUNK_CHARS,
+        on_progress: Optional[Callable[[int, int], None]] = None
+    ) -> AsyncIterator[Tuple[bytes, int]]:
+        """
+        Synthesize text across all workers, yielding (pcm, sample_rate) in order
+
+        The text is cut into chunks of whole sentences; up to two chunks per
+        worker are in flight, so the first audio is ready after one chunk and
+        a long text never holds all of its audio in memory.
+        """
+        chunks = chunk_sentences(text, chunk_chars)
+        window = self.workers * 2
+        pending: deque = deque()
+        done = 0
+        try:
+            for i, chunk in enumerate(chunks):
+                pending.append(asyncio.ensure_future(self.run(_synthesize, chunk, lang)))
+                # Окно заполнено или чанки кончились — отдаём по порядку самый старый
+                while pending and (len(pending) >= window or i == len(chunks) - 1):
+                    result = await pending.popleft()
+                    done += 1
+                    if on_progress:
+                        on_progress(done, len(chunks))
+                    yield result
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def synthesize_speech(
+        self, text: str, output_path: str, lang: str = "en",
+        on_progress: Optional[Callable[[int, int], None]] = None
+    ) -> float:
+        """
+        Synthesize text to a .wav or .mp3 file, writing chunks as they arrive
+
+        Returns:
+            Duration of the written audio in seconds (0.0 for empty text)
+        """
+        writer = None
+        try:
+            async with contextlib.aclosing(self.speech_chunks(text, lang, on_progress=on_progress)) as chunks:
+                async for pcm, sample_rate in chunks:
+                    if writer is None:
+                        writer = await asyncio.to_thread(AudioWriter, output_path, sample_rate)
+                    await asyncio.to_thread(writer.write, pcm)
+        finally:
+            if writer is not None:
+                await asyncio.to_thread(writer.close)
+        return writer.seconds if writer is not None else 0.0
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        if self._manager is not None:
+            self._manager.shutdown()
+            self._manager = None
+            self._model_status = None
+
+
+inference_pool = InferencePool()
@@ -1,29 +1,150 @@
-from typing import Optional
-import pkg_resources
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+from ai_translate_shared.job_events import JobEventBroker
+from app.config import JOB_TTL_SECONDS, JOB_MAX_FINISHED
+from app.models.job import Job, JobStatus
+
+logger = logging.getLogger(__name__)
 
 class JobManager:
-    def __init__(self):
-        self.jobs = {}
+    """
+    In-memory job store
+
+    All mutations go through a lock, so the pipeline, the queue workers and
+    executor threads can update jobs concurrently. A background task drops
+    finished job records once they are older than ttl or when more than
+    max_finished of them are kept. Their files are not touched: results stay
+    downloadable under /media until the storage janitor expires them
+    (OUTPUT_RETENTION_SECONDS); uploads are removed by the pipeline or
+    expire with UPLOAD_RETENTION_SECONDS.
+    """
 
-    def create_job(self, target_lang: str) -> Job:
+    def __init__(self, ttl: float = JOB_TTL_SECONDS, max_finished: int = JOB_MAX_FINISHED):
+        self.jobs: Dict[str, Job] = {}
+        self.ttl = ttl
+        self.max_finished = max_finished
+        # Завершённые задачи в порядке завершения — голова вытесняется первой
+        self._finished: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._evicted = 0
+        self._task: Optional[asyncio.Task] = None
+        # Подписчики SSE получают смены статуса, прогресс и частичные результаты
+        self.events = JobEventBroker()
+
+    def create_job(self, target_lang: str, job_id: Optional[str] = None) -> Job:
         job = Job(target_lang=target_lang)  # ✅ Теперь Job имеет target_lang
-        self.jobs[job.job_id] = job
+        if job_id:
+            job.job_id = job_id
+        with self._lock:
+            self.jobs[job.job_id] = job
         return job
 
     def get_job(self, job_id: str) -> Optional[Job]:  # ✅ Изменено на Optional
         return self.jobs.get(job_id)
 
-    def 
+    def update_job(self, job_id: str, **updates) -> Optional[Job]:
+        with self._lock:
+            if job := self.get_job(job_id):
+                for key, value in updates.items():
+                    setattr(job, key, value)
+        return job
+
+    def record_timing(self, job_id: str, stage: str, record: dict):
+        with self._lock:
+            if job := self.get_job(job_id):
+                job.timings[stage] = record
+
+    def append_partial(self, job_id: str, chunk: dict):
+        with self._lock:
+            job = self.get_job(job_id)
+            if job:
+                job.partial_results.append(chunk)
+        if job:
+            self.events.publish(job_id, "partial", chunk)
+
+    def set_progress(self, job_id: str, stage: str, percent: float):
+        with self._lock:
+            job = self.get_job(job_id)
+            if job:
+                job.progress = {"stage": stage, "percent": round(min(max(percent, 0.0), 100.0), 1)}
+        if job:
+            self.events.publish(job_id, "progress", job.progress)
+
+    def _set_status(self, job_id: str, status: JobStatus, error: Optional[str] = None):
+        with self._lock:
+            job = self.get_job(job_id)
+            if not job:
+                return
+            job.status = status
+            if error is not None:
+                job.error = error
+            if status in (JobStatus.COMPLETED, JobStatus.FAILED):
+                job.finished_at = time.monotonic()
+                self._finished[job_id] = job.finished_at
+                self._finished.move_to_end(job_id)
+            else:
+                self._finished.pop(job_id, None)
+        self.events.publish(job_id, "status", {"status": status.value, "error": job.error})
+
+    def set_queued(self, job_id: str):
+        self._set_status(job_id, JobStatus.QUEUED)
 
     def set_processing(self, job_id: str):
-        if job := self.get_job(job_id):
-            job.status = JobStatus.PROCESSING
+        self._set_status(job_id, JobStatus.PROCESSING)
 
     def set_completed(self, job_id: str):
-        if job := self.get_job(job_id):
-            job.status = JobStatus.COMPLETED
+        self._set_status(job_id, JobStatus.COMPLETED)
 
     def set_failed(self, job_id: str, error: str):
-        if job := self.get_job(job_id):
-            job.status = JobStatus.FAILED
-            job.error = error
\ No newline at end of file
+        self._set_status(job_id, JobStatus.FAILED, error)
+
+    def evict(self) -> int:
+        """Drop finished job records past the TTL or over the count limit"""
+        now = time.monotonic()
+        evicted = 0
+        with self._lock:
+            while self._finished:
+                job_id, finished_at = next(iter(self._finished.items()))
+                if now - finished_at <= self.ttl and len(self._finished) <= self.max_finished:
+                    break
+                del self._finished[job_id]
+                if self.jobs.pop(job_id, None):
+                    evicted += 1
+            self._evicted += evicted
+
+        if evicted:
+            logger.info(f"Evicted {evicted} finished jobs")
+        return evicted
+
+    async def _run(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self.evict()
+            except Exception as e:
+                logger.error(f"Job eviction failed: {e}")
+
+    def start(self, interval: Optional[float] = None):
+        """Evict periodically instead of on every create_job()"""
+        if self._task is None:
+            interval = interval or min(60.0, max(1.0, self.ttl / 4))
+            self._task = asyncio.create_task(self._run(interval))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "total": len(self.jobs),
+                "finished": len(self._finished),
+                "active": len(self.jobs) - len(self._finished),
+                "evicted": self._evicted,
+            }
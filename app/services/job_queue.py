@@ -0,0 +1,230 @@
+"""
+Persistent bounded job queue served by a fixed pool of async workers
+"""
+import asyncio
+import itertools
+import logging
+import sqlite3
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Awaitable, Callable, List, Optional
+from app.models.job import FileType
+
+logger = logging.getLogger(__name__)
+
+# Меньше — раньше: текст обрабатывается за секунды, видео — минутами
+FILE_TYPE_PRIORITY = {
+    FileType.TEXT: 0,
+    FileType.IMAGE: 1,
+    FileType.DOCUMENT: 2,
+    FileType.AUDIO: 2,
+    FileType.VIDEO: 3,
+}
+
+
+class QueueFullError(Exception):
+    """Raised when the queue already holds max_depth waiting jobs"""
+
+
+@dataclass
+class QueuedJob:
+    job_id: str
+    file_path: str
+    file_type: FileType
+    target_lang: str
+    priority: int
+    enqueued_at: float
+    # Сколько раз задачу уже брал воркер (растёт и при падении процесса посреди обработки)
+    attempts: int = 0
+
+
+class JobQueue:
+    """
+    Priority queue between the upload endpoint and the processing pipeline
+
+    Every accepted job is journaled to SQLite before it is acknowledged and
+    removed only after its handler returns, so jobs that were queued or running
+    when the process stopped are picked up again on the next start. Each pick
+    is counted in the journal; a job that has already been started
+    max_attempts times (it keeps taking the process down) is not restored
+    again but handed to on_give_up.
+    """
+
+    def __init__(
+        self,
+        db_path: Path,
+        handler: Callable[[QueuedJob], Awaitable[None]],
+        workers: int = 2,
+        max_depth: int = 100,
+        max_attempts: int = 3,
+        on_give_up: Optional[Callable[[QueuedJob], None]] = None
+    ):
+        self.db_path = Path(db_path)
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.max_depth = max_depth
+        self.max_attempts = max_attempts
+        self.on_give_up = on_give_up
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._seq = itertools.count()
+        self._running = 0
+        self._conn = self._connect()
+
+    def _connect(self) -> sqlite3.Connection:
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.db_path), check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS queue (
+                job_id TEXT PRIMARY KEY,
+                file_path TEXT NOT NULL,
+                file_type TEXT NOT NULL,
+                target_lang TEXT NOT NULL,
+                priority INTEGER NOT NULL,
+                enqueued_at REAL NOT NULL,
+                state TEXT NOT NULL DEFAULT 'queued',
+                attempts INTEGER NOT NULL DEFAULT 0
+            )
+            """
+        )
+        # Журналы, созданные до появления счётчика попыток
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(queue)")}
+        if "attempts" not in columns:
+            conn.execute("ALTER TABLE queue ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0")
+        return conn
+
+    @property
+    def depth(self) -> int:
+        """Number of jobs waiting for a worker"""
+        return self._queue.qsize() if self._queue else 0
+
+    @property
+    def running(self) -> int:
+        """Number of jobs currently being processed"""
+        return self._running
+
+    @property
+    def started(self) -> bool:
+        return bool(self._tasks)
+
+    async def start(self) -> List[QueuedJob]:
+        """
+        Restore journaled jobs and start the workers
+
+        Returns:
+            Jobs restored from the journal, in the order they will run
+        """
+        self._queue = asyncio.PriorityQueue()
+        restored = self._restore()
+        for job in restored:
+            self._put(job)
+        self._tasks = [
+            asyncio.create_task(self._worker(i), name=f"job-worker-{i}")
+            for i in range(self.workers)
+        ]
+        logger.info(f"Job queue started: {self.workers} workers, {len(restored)} restored jobs")
+        return restored
+
+    async def stop(self):
+        """Cancel the workers; unfinished jobs stay in the journal"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._conn.close()
+
+    def submit(self, job_id: str, file_path: str, file_type: FileType, target_lang: str) -> QueuedJob:
+        """
+        Journal a job and put it in line
+
+        Raises:
+            QueueFullError: If max_depth jobs are already waiting
+        """
+        if self.depth >= self.max_depth:
+            raise QueueFullError(f"Queue is full ({self.max_depth} jobs waiting)")
+
+        job = QueuedJob(
+            job_id=job_id,
+            file_path=str(file_path),
+            file_type=FileType(file_type),
+            target_lang=target_lang,
+            priority=FILE_TYPE_PRIORITY.get(FileType(file_type), len(FILE_TYPE_PRIORITY)),
+            enqueued_at=time.time(),
+        )
+        self._conn.execute(
+            "INSERT OR REPLACE INTO queue (job_id, file_path, file_type, target_lang, priority, enqueued_at, state) "
+            "VALUES (?, ?, ?, ?, ?, ?, 'queued')",
+            (job.job_id, job.file_path, job.file_type.value, job.target_lang, job.priority, job.enqueued_at),
+        )
+        self._put(job)
+        return job
+
+    def _put(self, job: QueuedJob):
+        # Порядковый номер сохраняет FIFO внутри одного приоритета
+        self._queue.put_nowait((job.priority, next(self._seq), job))
+
+    def _restore(self) -> List[QueuedJob]:
+        rows = self._conn.execute(
+            "SELECT job_id, file_path, file_type, target_lang, priority, enqueued_at, attempts "
+            "FROM queue ORDER BY priority, enqueued_at"
+        ).fetchall()
+        jobs = [
+            QueuedJob(
+                job_id=row[0],
+                file_path=row[1],
+                file_type=FileType(row[2]),
+                target_lang=row[3],
+                priority=row[4],
+                enqueued_at=row[5],
+                attempts=row[6],
+            )
+            for row in rows
+        ]
+        restored = []
+        for job in jobs:
+            if self.max_attempts <= 0 or job.attempts < self.max_attempts:
+                restored.append(job)
+                continue
+            # Задача уже столько раз роняла процесс — больше не перезапускаем
+            logger.error(f"Job {job.job_id} was interrupted {job.attempts} times, giving up")
+            self._conn.execute("DELETE FROM queue WHERE job_id = ?", (job.job_id,))
+            if self.on_give_up:
+                try:
+                    self.on_give_up(job)
+                except Exception as e:
+                    logger.error(f"on_give_up failed for job {job.job_id}: {e}")
+        return restored
+
+    async def _worker(self, index: int):
+        while True:
+            _, _, job = await self._queue.get()
+            self._running += 1
+            # Попытку записываем до запуска: если процесс упадёт посреди задачи, она уже посчитана
+            job.attempts += 1
+            self._conn.execute(
+                "UPDATE queue SET state = 'running', attempts = ? WHERE job_id = ?", (job.attempts, job.job_id)
+            )
+            try:
+                logger.info(
+                    f"Worker {index} picked job {job.job_id} "
+                    f"after {time.time() - job.enqueued_at:.1f}s in queue"
+                )
+                try:
+                    await self.handler(job)
+                except asyncio.CancelledError:
+                    # Задача остаётся в журнале и будет перезапущена после рестарта;
+                    # штатная остановка попыткой не считается
+                    self._conn.execute(
+                        "UPDATE queue SET state = 'queued', attempts = ? WHERE job_id = ?",
+                        (job.attempts - 1, job.job_id)
+                    )
+                    raise
+                except Exception as e:
+                    logger.error(f"Job {job.job_id} failed in worker {index}: {e}")
+                self._conn.execute("DELETE FROM queue WHERE job_id = ?", (job.job_id,))
+            finally:
+                self._running -= 1
+                self._queue.task_done()
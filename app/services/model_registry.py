@@ -0,0 +1,259 @@
+"""
+Registry of heavy models inside an inference worker process
+
+Models are loaded on first use, can be warmed up in the background, and
+are dropped again when idle longer than MODEL_IDLE_TTL_SECONDS or when the
+process holds more than MODEL_MEMORY_BUDGET_MB of models. A model held
+through lease() is never dropped, however long the work using it runs.
+"""
+import ctypes
+import gc
+import logging
+import os
+import resource
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+from app.config import MODEL_IDLE_TTL_SECONDS, MODEL_MEMORY_BUDGET_MB, MODEL_LOAD_RETRY_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+def current_rss() -> int:
+    """Resident set size of this process in bytes"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # Не Linux: только пиковое значение, но для разницы до/после загрузки хватает
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _release_memory():
+    gc.collect()
+    try:
+        # Возвращаем освобождённые арены glibc системе, иначе RSS не уменьшится
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+@dataclass
+class ModelEntry:
+    name: str
+    loader: Callable[[], Any]
+    model: Any = None
+    memory_bytes: int = 0
+    load_seconds: float = 0.0
+    last_used: float = 0.0
+    # Сколько lease() сейчас держат модель: такую не выгружают ни по простою, ни по бюджету
+    in_use: int = 0
+    # Неудачные загрузки подряд и момент, раньше которого try_load() не пробует снова
+    failures: int = 0
+    retry_at: float = 0.0
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    @property
+    def loaded(self) -> bool:
+        return self.model is not None
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "loaded": self.loaded,
+            "memory_mb": round(self.memory_bytes / 1024 / 1024, 1),
+            "load_seconds": round(self.load_seconds, 2),
+            "in_use": self.in_use,
+            "idle_seconds": round(time.monotonic() - self.last_used, 1) if self.loaded and not self.in_use else None,
+        }
+
+
+class ModelRegistry:
+    """
+    Lazily loaded, evictable models keyed by name
+
+    Service modules register a loader at import time and take the model
+    through lease() (or get() for a single call) on every use instead of
+    keeping it on self, so an unloaded model is really released once the
+    request that was using it finishes.
+    """
+
+    def __init__(
+        self, idle_ttl: float = MODEL_IDLE_TTL_SECONDS, memory_budget_mb: float = MODEL_MEMORY_BUDGET_MB,
+        load_retry: float = MODEL_LOAD_RETRY_SECONDS
+    ):
+        self.idle_ttl = idle_ttl
+        self.load_retry = load_retry
+        self.memory_budget = int(memory_budget_mb * 1024 * 1024)
+        self._entries: Dict[str, ModelEntry] = {}
+        self._lock = threading.Lock()
+        self._reaper: Optional[threading.Thread] = None
+        # Вызывается со stats() после каждой загрузки и выгрузки (отчёт в родительский процесс)
+        self.listener: Optional[Callable[[List[dict]], None]] = None
+
+    def register(self, name: str, loader: Callable[[], Any]):
+        with self._lock:
+            if name not in self._entries:
+                self._entries[name] = ModelEntry(name, loader)
+
+    def get(self, name: str) -> Any:
+        """Return the model, loading it first if needed; loader errors propagate"""
+        return self._acquire(name, pin=False)
+
+    def try_load(self, name: str) -> bool:
+        """
+        Load the model unless a recent attempt failed; False while it is unavailable
+
+        A failed load is retried after load_retry seconds, doubling with each
+        consecutive failure up to an hour, so a missing package is not
+        re-imported on every call but a transient failure heals by itself.
+        """
+        entry = self._entries.get(name)
+        if entry is None:
+            raise KeyError(f"Model not registered: {name}")
+        if entry.loaded:
+            return True
+        if time.monotonic() < entry.retry_at:
+            return False
+        try:
+            self.get(name)
+        except Exception as e:
+            entry.failures += 1
+            delay = min(3600.0, self.load_retry * 2 ** (entry.failures - 1))
+            entry.retry_at = time.monotonic() + delay
+            logger.warning(f"Model {name} failed to load ({e}), next attempt in {delay:.0f}s")
+            return False
+        entry.failures, entry.retry_at = 0, 0.0
+        return True
+
+    @contextmanager
+    def lease(self, name: str) -> Iterator[Any]:
+        """
+        Hold the model for the duration of the block
+
+        Idle and budget eviction skip a leased model, and its idle time starts
+        when the last lease is released, so a transcription running longer
+        than the TTL keeps its model instead of getting a second copy loaded.
+        """
+        model = self._acquire(name, pin=True)
+        entry = self._entries[name]
+        try:
+            yield model
+        finally:
+            with entry.lock:
+                entry.in_use -= 1
+                entry.last_used = time.monotonic()
+
+    def _acquire(self, name: str, pin: bool) -> Any:
+        entry = self._entries.get(name)
+        if entry is None:
+            raise KeyError(f"Model not registered: {name}")
+
+        with entry.lock:
+            if entry.model is None:
+                before = current_rss()
+                started = time.monotonic()
+                entry.model = entry.loader()
+                entry.load_seconds = time.monotonic() - started
+                # Оценка: прирост RSS за время загрузки
+                entry.memory_bytes = max(0, current_rss() - before)
+                logger.info(
+                    f"Model {name} loaded in {entry.load_seconds:.1f}s "
+                    f"(+{entry.memory_bytes / 1024 / 1024:.0f} MB, pid {os.getpid()})"
+                )
+                loaded_now = True
+            else:
+                loaded_now = False
+            entry.last_used = time.monotonic()
+            if pin:
+                entry.in_use += 1
+            model = entry.model
+
+        if loaded_now:
+            self._enforce_budget(keep=name)
+            self._notify()
+        return model
+
+    def unload(self, name: str, only_unused: bool = False) -> bool:
+        entry = self._entries.get(name)
+        if entry is None:
+            return False
+        with entry.lock:
+            if entry.model is None or (only_unused and entry.in_use):
+                return False
+            entry.model = None
+            freed, entry.memory_bytes = entry.memory_bytes, 0
+        _release_memory()
+        logger.info(f"Model {name} unloaded (~{freed / 1024 / 1024:.0f} MB, pid {os.getpid()})")
+        self._notify()
+        return True
+
+    def _notify(self):
+        if self.listener is None:
+            return
+        try:
+            self.listener(self.stats())
+        except Exception as e:
+            logger.debug(f"Model status listener failed: {e}")
+
+    def evict_idle(self) -> List[str]:
+        if self.idle_ttl <= 0:
+            return []
+        now = time.monotonic()
+        idle = [e.name for e in self._loaded() if not e.in_use and now - e.last_used > self.idle_ttl]
+        return [name for name in idle if self.unload(name, only_unused=True)]
+
+    def _enforce_budget(self, keep: str):
+        """Unload least recently used models until the budget is met"""
+        if self.memory_budget <= 0:
+            return
+        for entry in sorted(self._loaded(), key=lambda e: e.last_used):
+            if self.memory_bytes() <= self.memory_budget:
+                break
+            # Занятую модель выгружать бесполезно: память освободится только с последней ссылкой
+            if entry.name != keep:
+                self.unload(entry.name, only_unused=True)
+
+    def _loaded(self) -> List[ModelEntry]:
+        with self._lock:
+            return [e for e in self._entries.values() if e.loaded]
+
+    def memory_bytes(self) -> int:
+        return sum(e.memory_bytes for e in self._loaded())
+
+    def warm_up(self, names: Iterable[str]) -> threading.Thread:
+        """Load the given models in a background thread"""
+        def run():
+            for name in names:
+                try:
+                    self.get(name)
+                except Exception as e:
+                    logger.warning(f"Warm-up of {name} failed: {e}")
+
+        thread = threading.Thread(target=run, name="model-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def start_reaper(self, interval: Optional[float] = None):
+        """Periodically unload idle models; no-op when the TTL is disabled"""
+        if self.idle_ttl <= 0 or self._reaper is not None:
+            return
+        interval = interval or min(60.0, max(1.0, self.idle_ttl / 4))
+
+        def run():
+            while True:
+                time.sleep(interval)
+                self.evict_idle()
+
+        self._reaper = threading.Thread(target=run, name="model-reaper", daemon=True)
+        self._reaper.start()
+
+    def stats(self) -> List[dict]:
+        with self._lock:
+            entries = list(self._entries.values())
+        return [e.to_dict() for e in entries]
+
+
+model_registry = ModelRegistry()
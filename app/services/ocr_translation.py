@@ -0,0 +1,71 @@
+"""
+Block-level translation of OCR results with per-box output
+"""
+import logging
+from typing import Dict, List, Tuple
+from app.services.glossary import glossary
+from app.services.translation_memory import BatchTranslator, TMStats, translation_memory
+from app.utils.ocr_layout import group_blocks
+from app.utils.text_utils import spread_translation
+
+logger = logging.getLogger(__name__)
+
+
+async def translate_pages(
+    pages: List[dict], target_lang: str, translate_batch: BatchTranslator, model: str
+) -> Tuple[str, List[dict], TMStats]:
+    """
+    Translate OCR'd pages block by block instead of as one string
+
+    Boxes are grouped into lines and blocks, so a block is translated with
+    its own context and a bad region only spoils its block. Blocks of every
+    page go to the model in one batched call; identical blocks (across pages
+    or images) are translated once, glossary terms are not sent at all.
+
+    Args:
+        pages: [{"bboxes": [BoundingBox.to_dict(), ...], ...}]
+        model: Name of the model behind translate_batch (translation memory key)
+
+    Returns:
+        Tuple of (translated text, pages with "translated_text" on every
+        box and page, translation stats)
+    """
+    page_blocks = [group_blocks(page.get("bboxes") or []) for page in pages]
+    stats = TMStats()
+    translations: Dict[str, str] = {}
+    missing: List[str] = []
+    queued = set()
+    for blocks in page_blocks:
+        for block in blocks:
+            if block.text in translations or block.text in queued:
+                continue
+            if (term := glossary.lookup(block.text, target_lang)) is not None:
+                translations[block.text] = term
+                stats.segments += 1
+                stats.exact_hits += 1
+            else:
+                missing.append(block.text)
+                queued.add(block.text)
+
+    if missing:
+        results, tm_stats = await translation_memory.translate_many(missing, target_lang, translate_batch, model)
+        translations.update(zip(missing, results))
+        stats.merge(tm_stats)
+    logger.info(
+        f"OCR translation ({target_lang}): {sum(map(len, page_blocks))} blocks, "
+        f"{len(missing)} unique sent to the memory/model"
+    )
+
+    translated_pages = []
+    for page, blocks in zip(pages, page_blocks):
+        boxes = [dict(box, translated_text="") for box in page.get("bboxes") or []]
+        for block in blocks:
+            indices = block.boxes
+            weights = [max(1, len(boxes[i]["text"].strip())) for i in indices]
+            for i, text in zip(indices, spread_translation(translations[block.text], weights)):
+                boxes[i]["translated_text"] = text
+        page_text = "\n".join(translations[block.text] for block in blocks)
+        translated_pages.append({**page, "bboxes": boxes, "translated_text": page_text})
+
+    translated_text = "\n\n".join(page["translated_text"] for page in translated_pages if page["translated_text"])
+    return translated_text, translated_pages, stats
@@ -1,29 +1,43 @@
-from openai import AsyncOpenAI
-import os
+"""
+OpenAI translation for the app: the shared client configured from app.config, plus the translation memory
+"""
+from ai_translate_shared.openai_translate import LANG_MAP, OpenAITranslator, TruncatedReply
+from app.config import (
+    OPENAI_API_KEY, OPENAI_BASE_URL, OPENAI_MODEL, OPENAI_CONCURRENCY,
+    OPENAI_RPM, OPENAI_TPM, OPENAI_MAX_RETRIES, OPENAI_CHUNK_TOKENS
+)
+from app.services.translation_memory import translation_memory
 
-client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+__all__ = ["LANG_MAP", "TruncatedReply", "translator", "translate_segments", "close_client", "translate_text"]
+
+# Один пул соединений и одни лимиты на весь процесс
+translator = OpenAITranslator(
+    api_key=OPENAI_API_KEY,
+    base_url=OPENAI_BASE_URL,
+    model=OPENAI_MODEL,
+    concurrency=OPENAI_CONCURRENCY,
+    rpm=OPENAI_RPM,
+    tpm=OPENAI_TPM,
+    max_retries=OPENAI_MAX_RETRIES,
+    chunk_tokens=OPENAI_CHUNK_TOKENS
+)
+
+translate_segments = translator.translate_segments
+
+
+async def close_client():
+    await translator.close()
 
-LANG_MAP = {
-    "ru": "Russian",
-    "en": "English",
-    "kk": "Kazakh"
-}
 
 async def translate_text(text: str, target_language: str) -> str:
     if not text.strip():
         return ""
-    
-    lang = LANG_MAP.get(target_language, "English")
+
     try:
-        response = await client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "You are a professional translator. Translate accurately without adding comments."},
-                {"role": "user", "content": f"Translate to {lang}:\n{text}"}
-            ],
-            temperature=0.3,
-            max_tokens=2000
+        # Повторяющиеся предложения берём из памяти переводов, в API уходят только новые
+        translated, _ = await translation_memory.translate(
+            text, target_language, translate_segments, f"openai:{OPENAI_MODEL}"
         )
-        return response.choices[0].message.content.strip()
+        return translated
     except Exception as e:
-        raise Exception(f"Translation failed: {str(e)}")
\ No newline at end of file
+        raise Exception(f"Translation failed: {str(e)}")
@@ -0,0 +1,144 @@
+"""
+Content-addressed cache for pipeline stage results
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Optional
+from app.config import RESULT_CACHE_DIR, RESULT_CACHE_MAX_MB, RESULT_CACHE_MEMORY_ITEMS
+
+logger = logging.getLogger(__name__)
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """
+    Two-tier cache: a small in-memory LRU in front of JSON files on disk
+
+    Keys are sha256 digests of the stage name and everything that affects the
+    result (input hash, model, parameters, target language). The disk tier is
+    evicted least-recently-used first once it grows past max_bytes; reads bump
+    the file mtime so it doubles as the LRU clock.
+    """
+
+    def __init__(self, directory: Path, max_bytes: int, memory_items: int = 256):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.memory_items = memory_items
+        self._memory: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_bytes: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(stage: str, **parts) -> str:
+        payload = json.dumps({"stage": stage, **parts}, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def transcript_key(self, file_hash: str, model: str, **params) -> str:
+        return self.make_key("transcript", file_hash=file_hash, model=model, params=params)
+
+    def translation_key(self, source_text: str, target_lang: str, backend: str) -> str:
+        return self.make_key("translation", text_hash=text_hash(source_text), target_lang=target_lang, backend=backend)
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return self._memory[key]
+
+        path = self._path(key)
+        try:
+            value = json.loads(path.read_text(encoding="utf-8"))
+            os.utime(path)
+        except (FileNotFoundError, json.JSONDecodeError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+            self._remember(key, value)
+        return value
+
+    def set(self, key: str, value: Any):
+        data = json.dumps(value, ensure_ascii=False).encode("utf-8")
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Атомарная запись: читатель никогда не увидит недописанный файл
+        tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp_path.write_bytes(data)
+        old_size = path.stat().st_size if path.exists() else 0
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._remember(key, value)
+            if self._disk_bytes is None:
+                self._disk_bytes = self._scan_size()
+            else:
+                self._disk_bytes += len(data) - old_size
+            over_budget = self._disk_bytes > self.max_bytes
+
+        if over_budget:
+            self._evict()
+
+    def _remember(self, key: str, value: Any):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def _scan_size(self) -> int:
+        return sum(p.stat().st_size for p in self.directory.glob("*/*.json"))
+
+    def _evict(self):
+        """Drop least recently used files until the disk tier is at 90% of its budget"""
+        entries = []
+        for path in self.directory.glob("*/*.json"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+
+        total = sum(size for _, size, _ in entries)
+        target = int(self.max_bytes * 0.9)
+        removed = 0
+        for _, size, path in entries:
+            if total <= target:
+                break
+            path.unlink(missing_ok=True)
+            with self._lock:
+                self._memory.pop(path.stem, None)
+            total -= size
+            removed += 1
+
+        with self._lock:
+            self._disk_bytes = total
+        logger.info(f"Result cache evicted {removed} entries, {total / 1024 / 1024:.1f} MB left")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "memory_items": len(self._memory),
+                "disk_bytes": self._disk_bytes,
+            }
+
+
+result_cache = ResultCache(RESULT_CACHE_DIR, RESULT_CACHE_MAX_MB * 1024 * 1024, RESULT_CACHE_MEMORY_ITEMS)
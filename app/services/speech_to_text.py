@@ -1,40 +1,80 @@
-import asyncio
-from faster_whisper import WhisperModel
-import subprocess
-from pathlib import Path
+from functools import partial
+from typing import Callable, Iterator, List, Optional
+from app.config import WHISPER_MODEL, INFERENCE_THREADS
+from app.services.model_registry import model_registry
+from app.utils.audio_utils import decode_audio, VIDEO_EXTENSIONS
+
+
+def load_whisper(model_size: str = WHISPER_MODEL, cpu_threads: int = INFERENCE_THREADS):
+    from faster_whisper import WhisperModel
+    return WhisperModel(model_size, device="cpu", compute_type="int8", cpu_threads=cpu_threads)
+
+
+model_registry.register("whisper", load_whisper)
+
 
 class SpeechToTextService:
-    def __init__(self):
-        self.model = WhisperModel("base", device="cpu", compute_type="int8")
-    
+    def __init__(self, model_size: str = WHISPER_MODEL, cpu_threads: int = INFERENCE_THREADS):
+        self.model_size = model_size
+        self.cpu_threads = cpu_threads
+        self.model_name = "whisper"
+        if (model_size, cpu_threads) != (WHISPER_MODEL, INFERENCE_THREADS):
+            self.model_name = f"whisper-{model_size}-{cpu_threads}"
+            model_registry.register(self.model_name, partial(load_whisper, model_size, cpu_threads))
+
+    @property
+    def model(self):
+        # Модель загружается при первом вызове — в процессе-воркере, а не в веб-процессе,
+        # и может быть выгружена реестром при простое
+        return model_registry.get(self.model_name)
+
     async def extract_text(self, file_path: str) -> tuple[str, list]:
-        loop = asyncio.get_running_loop()
-        
-        # Для видео сначала извлекаем аудио
-        if file_path.lower().endswith(('.mp4', '.mov', '.avi', '.mkv')):
-            audio_path = await self._extract_audio(file_path)
-            file_path = str(audio_path)
-        
-        # Асинхронный вызов транскрипции
-        segments, _ = await loop.run_in_executor(
-            None, 
-            lambda: self.model.transcribe(file_path, beam_size=5)
-        )
-        
-        full_text = " ".join([seg.text for seg in segments])
+        from app.services.inference_pool import inference_pool
+        return await inference_pool.transcribe(file_path)
+
+    def transcribe(self, file_path: str, beam_size: int = 5, vad_filter: bool = True) -> tuple[str, list]:
+        """Синхронная транскрипция — выполняется внутри пула процессов"""
+        segments = list(self.stream_segments(file_path, beam_size=beam_size, vad_filter=vad_filter))
+        full_text = " ".join([seg["text"] for seg in segments])
         return full_text, segments
-    
-    async def _extract_audio(self, video_path: str) -> Path:
-        audio_path = Path(video_path).with_suffix('.wav')
-        cmd = [
-            'ffmpeg', '-y', '-i', video_path,
-            '-vn', '-acodec', 'pcm_s16le', 
-            '-ar', '16000', str(audio_path)
-        ]
-        process = await asyncio.create_subprocess_exec(
-            *cmd,
-            stdout=asyncio.subprocess.DEVNULL,
-            stderr=asyncio.subprocess.DEVNULL
-        )
-        await process.wait()
-        return audio_path
\ No newline at end of file
+
+    def stream_segments(
+        self, file_path: str, beam_size: int = 5, vad_filter: bool = True,
+        on_duration: Optional[Callable[[float], None]] = None
+    ) -> Iterator[dict]:
+        """
+        Yield segments as faster-whisper decodes them
+
+        With vad_filter the silent parts are skipped before decoding, so
+        segments start coming out long before the whole file is processed.
+        on_duration receives the audio length before the first segment.
+        """
+        # Для видео дорожка декодируется ffmpeg через pipe прямо в память, без .wav на диске
+        audio = decode_audio(file_path) if file_path.lower().endswith(VIDEO_EXTENSIONS) else file_path
+
+        # Сегменты декодируются лениво, по мере итерации — модель держим до последнего
+        with model_registry.lease(self.model_name) as model:
+            segments, info = model.transcribe(audio, beam_size=beam_size, vad_filter=vad_filter)
+            if on_duration:
+                on_duration(info.duration)
+            for seg in segments:
+                yield {"start": seg.start, "end": seg.end, "text": seg.text}
+
+    def transcribe_shard(
+        self, file_path: str, start: float, end: Optional[float], overlap: float = 2.0,
+        beam_size: int = 5, vad_filter: bool = True
+    ) -> List[dict]:
+        """
+        Transcribe the [start, end) range of a long recording
+
+        overlap seconds of context are decoded on both sides and every decoded
+        segment is returned, with timestamps relative to the file; segments
+        that neighbouring shards both heard are resolved by merge_shard_segments.
+        """
+        offset = max(0.0, start - overlap)
+        duration = None if end is None else end + overlap - offset
+        audio = decode_audio(file_path, start=offset, duration=duration)
+
+        with model_registry.lease(self.model_name) as model:
+            segments, _ = model.transcribe(audio, beam_size=beam_size, vad_filter=vad_filter)
+            return [{"start": seg.start + offset, "end": seg.end + offset, "text": seg.text} for seg in segments]
@@ -0,0 +1,204 @@
+"""
+Disk quotas and retention for the upload and output directories
+
+Each managed directory is scanned once at startup. After that the janitor
+only learns about files through track()/touch()/discard(), so a sweep walks
+the least recently used end of its index instead of rescanning the disk.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from app.config import (
+    UPLOAD_DIR, AUDIO_OUTPUT_DIR, UPLOAD_QUOTA_MB, UPLOAD_RETENTION_SECONDS,
+    OUTPUT_QUOTA_MB, OUTPUT_RETENTION_SECONDS, JANITOR_INTERVAL_SECONDS
+)
+
+logger = logging.getLogger(__name__)
+
+# Базы очереди и памяти переводов живут в UPLOAD_DIR — их не трогаем
+IGNORED_SUFFIXES = (".sqlite3", ".sqlite3-wal", ".sqlite3-shm")
+# Недописанные загрузки старше этого считаются брошенными
+PART_MAX_AGE = 3600
+
+
+@dataclass
+class ManagedDirectory:
+    path: Path
+    max_bytes: int
+    retention: float
+    # путь -> (размер, время последнего использования); голова — самый давний
+    files: "OrderedDict[str, Tuple[int, float]]" = field(default_factory=OrderedDict)
+    total: int = 0
+
+    def to_dict(self) -> dict:
+        return {
+            "path": str(self.path),
+            "files": len(self.files),
+            "used_mb": round(self.total / 1024 / 1024, 1),
+            "quota_mb": round(self.max_bytes / 1024 / 1024, 1),
+        }
+
+
+class StorageJanitor:
+    """LRU quota and retention enforcement for a few flat directories"""
+
+    def __init__(self, interval: float = JANITOR_INTERVAL_SECONDS):
+        self.interval = interval
+        self._dirs: Dict[str, ManagedDirectory] = {}
+        self._pinned: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def add_directory(self, path: Path, max_mb: float, retention_seconds: float):
+        path = Path(path)
+        self._dirs[os.path.abspath(path)] = ManagedDirectory(path, int(max_mb * 1024 * 1024), retention_seconds)
+
+    def _owner(self, path: str) -> Optional[ManagedDirectory]:
+        return self._dirs.get(os.path.dirname(path))
+
+    def bootstrap(self):
+        """One scan per directory: index existing files by mtime, drop stale .part files"""
+        now = time.time()
+        for directory in self._dirs.values():
+            if not directory.path.is_dir():
+                continue
+            found = []
+            with os.scandir(directory.path) as entries:
+                for entry in entries:
+                    if not entry.is_file(follow_symlinks=False) or entry.name.endswith(IGNORED_SUFFIXES):
+                        continue
+                    stat = entry.stat()
+                    if entry.name.endswith(".part"):
+                        if now - stat.st_mtime > PART_MAX_AGE:
+                            self._unlink(entry.path)
+                        continue
+                    found.append((stat.st_mtime, os.path.abspath(entry.path), stat.st_size))
+            with self._lock:
+                for mtime, path, size in sorted(found):
+                    directory.files[path] = (size, mtime)
+                    directory.total += size
+            logger.info(f"Janitor indexed {len(found)} files in {directory.path}")
+
+    def track(self, path) -> None:
+        """Register a new or rewritten file as most recently used"""
+        path = os.path.abspath(path)
+        directory = self._owner(path)
+        if directory is None:
+            return
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return
+        with self._lock:
+            old_size, _ = directory.files.pop(path, (0, 0.0))
+            directory.files[path] = (size, time.time())
+            directory.total += size - old_size
+
+    def touch(self, path) -> None:
+        """Mark a file as just used (e.g. downloaded)"""
+        path = os.path.abspath(path)
+        directory = self._owner(path)
+        if directory is None:
+            return
+        with self._lock:
+            if path in directory.files:
+                size, _ = directory.files.pop(path)
+                directory.files[path] = (size, time.time())
+
+    def discard(self, path) -> None:
+        """Delete an intermediate or evicted file right away"""
+        path = os.path.abspath(path)
+        self._forget(path)
+        self._unlink(path)
+
+    def _forget(self, path: str):
+        directory = self._owner(path)
+        if directory is None:
+            return
+        with self._lock:
+            if path in directory.files:
+                size, _ = directory.files.pop(path)
+                directory.total -= size
+
+    def pin(self, path) -> None:
+        """Protect a file from eviction while a job still needs it"""
+        path = os.path.abspath(path)
+        with self._lock:
+            self._pinned[path] = self._pinned.get(path, 0) + 1
+
+    def unpin(self, path) -> None:
+        path = os.path.abspath(path)
+        with self._lock:
+            if self._pinned.get(path, 0) <= 1:
+                self._pinned.pop(path, None)
+            else:
+                self._pinned[path] -= 1
+
+    def sweep(self) -> int:
+        """Evict expired files, then least recently used ones until under quota"""
+        now = time.time()
+        victims: List[str] = []
+        with self._lock:
+            for directory in self._dirs.values():
+                for path, (size, used) in list(directory.files.items()):
+                    expired = directory.retention > 0 and now - used > directory.retention
+                    over_quota = directory.max_bytes > 0 and directory.total > directory.max_bytes
+                    if not expired and not over_quota:
+                        # Дальше только более свежие файлы
+                        break
+                    if path in self._pinned:
+                        continue
+                    del directory.files[path]
+                    directory.total -= size
+                    victims.append(path)
+
+        for path in victims:
+            self._unlink(path)
+        if victims:
+            logger.info(f"Janitor removed {len(victims)} files")
+        return len(victims)
+
+    @staticmethod
+    def _unlink(path: str):
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Could not remove {path}: {e}")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await asyncio.to_thread(self.sweep)
+            except Exception as e:
+                logger.error(f"Janitor sweep failed: {e}")
+
+    async def start(self):
+        await asyncio.to_thread(self.bootstrap)
+        await asyncio.to_thread(self.sweep)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self) -> List[dict]:
+        with self._lock:
+            return [directory.to_dict() for directory in self._dirs.values()]
+
+
+storage_janitor = StorageJanitor()
+# Кэш результатов в AUDIO_OUTPUT_DIR/cache ограничивается сам (RESULT_CACHE_MAX_MB) —
+# обход не рекурсивный, подкаталоги сюда не попадают
+storage_janitor.add_directory(UPLOAD_DIR, UPLOAD_QUOTA_MB, UPLOAD_RETENTION_SECONDS)
+storage_janitor.add_directory(AUDIO_OUTPUT_DIR, OUTPUT_QUOTA_MB, OUTPUT_RETENTION_SECONDS)
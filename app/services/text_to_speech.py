@@ -3,36 +3,79 @@ Text-to-speech service using Coqui TTS
 """
 import logging
 from pathlib import Path
-from typing import Optional
+from typing import List, Tuple
+from app.config import TTS_CHUNK_CHARS
+from app.services.model_registry import model_registry
+from app.utils.audio_utils import AudioWriter
+from app.utils.text_utils import chunk_sentences
 
 logger = logging.getLogger(__name__)
 
+# Заглушка без модели: тишина с частотой LJSpeech, ~15 символов в секунду речи
+MOCK_SAMPLE_RATE = 22050
+MOCK_CHARS_PER_SECOND = 15
+
+
+def load_tts():
+    from TTS.api import TTS
+    return TTS(model_name="tts_models/en/ljspeech/glow-tts", gpu=False)
+
+
+model_registry.register("tts", load_tts)
+
+
 class TextToSpeechService:
     """Service for generating speech from text"""
     
     def __init__(self):
-        self.initialized = False
-        self.tts_engine = None
-        self._initialize_tts()
+        self.loaded = False
     
-    def _initialize_tts(self):
-        """Initialize TTS engine"""
-        try:
-            from TTS.api import TTS
-            self.tts_engine = TTS(model_name="tts_models/en/ljspeech/glow-tts", gpu=False)
-            self.initialized = True
-            logger.info("TTS engine initialized")
-        except Exception as e:
-            logger.warning(f"TTS initialization failed: {e}. Using mock.")
-            self.initialized = False
+    def _initialize_tts(self) -> bool:
+        """
+        Load the TTS engine through the model registry on first use
+
+        Returns False while it is unavailable; the registry retries a failed
+        load with backoff, and until then silence of the right length is used.
+        """
+        if not self.loaded:
+            self.loaded = model_registry.try_load("tts")
+            if self.loaded:
+                logger.info("TTS engine initialized")
+        return self.loaded
+
+    @property
+    def tts_engine(self):
+        return model_registry.get("tts")
     
+    def synthesize(self, text: str, lang: str = "en") -> Tuple[bytes, int]:
+        """
+        Synthesize one chunk of text in memory
+
+        Returns:
+            (mono 16-bit little-endian PCM, sample_rate)
+        """
+        if not self._initialize_tts():
+            return self._mock_synthesize(text)
+
+        import numpy as np
+
+        with model_registry.lease("tts") as engine:
+            waveform = np.asarray(engine.tts(text=text), dtype=np.float32)
+            sample_rate = engine.synthesizer.output_sample_rate
+        pcm = (np.clip(waveform, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+        return pcm, sample_rate
+
     def generate_speech(self, text: str, output_path: str, lang: str = "en") -> bool:
         """
         Generate speech from text
         
+        Chunks are synthesized one after another in this process and appended
+        to the output as they are ready; InferencePool.synthesize_speech does
+        the same across all workers.
+
         Args:
             text: Text to convert to speech
-            output_path: Path to save audio file
+            output_path: Path to save audio file (.wav or .mp3)
             lang: Language code (for future multi-lang support)
             
         Returns:
@@ -42,38 +85,21 @@ class TextToSpeechService:
             logger.warning("Empty text for TTS")
             return False
         
-        if not self.initialized or self.tts_engine is None:
-            return self._mock_generate_speech(text, output_path)
-        
         try:
             logger.info(f"Generating speech for: {text[:100]}...")
             
             Path(output_path).parent.mkdir(parents=True, exist_ok=True)
             
-            # Split long text into chunks (TTS has limits)
-            chunks = self._split_text(text, max_length=500)
-            
-            if len(chunks) == 1:
-                self.tts_engine.tts_to_file(text=text, file_path=output_path)
-            else:
-                # Generate multiple chunks and concatenate
-                import soundfile as sf
-                import numpy as np
-                
-                all_audio = []
-                for i, chunk in enumerate(chunks):
-                    chunk_path = f"{output_path}.chunk_{i}"
-                    self.tts_engine.tts_to_file(text=chunk, file_path=chunk_path)
-                    audio, sr = sf.read(chunk_path)
-                    all_audio.append(audio)
-                
-                # Concatenate and save
-                combined_audio = np.concatenate(all_audio)
-                sf.write(output_path, combined_audio, sr)
-                
-                # Cleanup chunks
-                for i in range(len(chunks)):
-                    Path(f"{output_path}.chunk_{i}").unlink(missing_ok=True)
+            writer = None
+            try:
+                for chunk in self.split_text(text):
+                    pcm, sample_rate = self.synthesize(chunk, lang)
+                    if writer is None:
+                        writer = AudioWriter(output_path, sample_rate)
+                    writer.write(pcm)
+            finally:
+                if writer is not None:
+                    writer.close()
             
             logger.info(f"Speech generated: {output_path}")
             return True
@@ -83,24 +109,15 @@ class TextToSpeechService:
             return False
     
     @staticmethod
-    def _split_text(text: str, max_length: int = 500) -> list:
-        """Split text into chunks"""
-        sentences = text.split('. ')
-        chunks = []
-        current_chunk = ""
-        
-        for sentence in sentences:
-            if len(current_chunk) + len(sentence) < max_length:
-                current_chunk += sentence + ". "
-            else:
-                if current_chunk:
-                    chunks.append(current_chunk.strip())
-                current_chunk = sentence + ". "
-        
-        if current_chunk:
-            chunks.append(current_chunk.strip())
-        
-        return chunks if chunks else [text]
+    def split_text(text: str, max_length: int = TTS_CHUNK_CHARS) -> List[str]:
+        """Split text into chunks of whole sentences (TTS has limits)"""
+        return chunk_sentences(text, max_length) or [text]
+
+    @staticmethod
+    def _mock_synthesize(text: str) -> Tuple[bytes, int]:
+        """Silence roughly as long as reading the text aloud would take"""
+        samples = int(MOCK_SAMPLE_RATE * max(1, len(text)) / MOCK_CHARS_PER_SECOND)
+        return b"\x00\x00" * samples, MOCK_SAMPLE_RATE
 
 
 class MockTextToSpeechService:
@@ -2,94 +2,222 @@
 Translation service using NLLB model
 """
 import logging
-from typing import Dict
-from app.config import NLLB_LANG_CODES, SUPPORTED_LANGUAGES
+from typing import Dict, List
+from app.config import (
+    NLLB_LANG_CODES, NLLB_MODEL, SUPPORTED_LANGUAGES,
+    NLLB_BATCH_SIZE, NLLB_MAX_INPUT_TOKENS, NLLB_MAX_BATCH_TOKENS
+)
+from app.services.model_registry import model_registry
+from app.utils.text_utils import detect_language, segment_text
 
 logger = logging.getLogger(__name__)
 
+LANGUAGE_NAMES = {"ru": "Russian", "en": "English", "kk": "Kazakh"}
+
+
+def load_nllb():
+    from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
+
+    logger.info(f"Loading translation model: {NLLB_MODEL}")
+    tokenizer = AutoTokenizer.from_pretrained(NLLB_MODEL)
+    model = AutoModelForSeq2SeqLM.from_pretrained(NLLB_MODEL)
+    model.eval()
+    return tokenizer, model
+
+
+model_registry.register("nllb", load_nllb)
+
+
+class MockTranslations(list):
+    """Output of the fallback used when NLLB cannot be loaded: never to be cached or stored"""
+
+
 class TranslationService:
     """Service for translating text"""
-    
+
     def __init__(self):
-        self.initialized = False
-        self.tokenizer = None
-        self.model = None
-        self._initialize_model()
-    
-    def _initialize_model(self):
-        """Initialize NLLB model"""
-        try:
-            from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
-            
-            model_name = "facebook/nllb-200-distilled-600M"
-            logger.info(f"Loading translation model: {model_name}")
-            
-            self.tokenizer = AutoTokenizer.from_pretrained(model_name)
-            self.model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
-            
-            self.initialized = True
-            logger.info("Translation model loaded successfully")
-        except Exception as e:
-            logger.warning(f"Failed to load NLLB model: {e}. Using mock translation.")
-            self.initialized = False
-    
+        self.loaded = False
+
+    def _initialize_model(self) -> bool:
+        """
+        Load NLLB through the model registry (called lazily inside the inference worker)
+
+        Returns False while the model is unavailable; the registry retries a
+        failed load with backoff, and until then mock translations are used.
+        """
+        if not self.loaded:
+            self.loaded = model_registry.try_load("nllb")
+            if self.loaded:
+                logger.info("Translation model loaded successfully")
+        return self.loaded
+
     def translate(self, text: str, target_lang: str) -> str:
         """
         Translate text to target language
-        
+
+        The text is split into sentences which are translated in batches,
+        so long transcripts are translated in full instead of being cut
+        at the model's maximum sequence length.
+
         Args:
             text: Text to translate
             target_lang: Target language code (ru, en, kk)
-            
+
         Returns:
             Translated text
         """
         if not text or not text.strip():
             return ""
-        
+
+        pieces = segment_text(text)
+        translations = self.translate_batch([sentence for sentence, _ in pieces], target_lang)
+        return "".join(t + sep for t, (_, sep) in zip(translations, pieces))
+
+    def translate_batch(self, texts: List[str], target_lang: str) -> List[str]:
+        """
+        Translate a list of independent segments
+
+        Segments are sorted by token length and grouped into batches of
+        similar length to keep padding low, then put back in input order.
+
+        Args:
+            texts: Segments to translate
+            target_lang: Target language code (ru, en, kk)
+
+        Returns:
+            Translations in the same order; MockTranslations if the model
+            could not be loaded
+        """
         if target_lang not in SUPPORTED_LANGUAGES:
             raise ValueError(f"Unsupported language: {target_lang}")
-        
-        if not self.initialized or self.model is None:
-            return self._mock_translate(text, target_lang)
-        
+
+        if not texts:
+            return []
+
+        if not self._initialize_model():
+            return MockTranslations(self._mock_translate(text, target_lang) if text.strip() else "" for text in texts)
+
         try:
-            logger.info(f"Translating to {target_lang}: {text[:100]}...")
-            
-            lang_code = NLLB_LANG_CODES[target_lang]
-            
-            inputs = self.tokenizer(text, return_tensors="pt", padding=True)
-            
-            with __import__('torch').no_grad():
-                translated_tokens = self.model.generate(
-                    **inputs,
-                    forced_bos_token_id=self.tokenizer.convert_tokens_to_ids(lang_code),
-                    max_length=512
-                )
-            
-            translated_text = self.tokenizer.batch_decode(
-                translated_tokens,
-                skip_special_tokens=True
-            )[0]
-            
-            logger.info(f"Translation complete")
-            return translated_text
-            
+            logger.info(f"Translating {len(texts)} segments to {target_lang}")
+            # Модель не хранится в сервисе: берём её у реестра один раз на весь вызов,
+            # и пока он идёт, реестр её не выгрузит
+            with model_registry.lease("nllb") as (tokenizer, model):
+                results = self._translate_segments(texts, target_lang, tokenizer, model)
+            logger.info("Translation complete")
+            return results
+
         except Exception as e:
             logger.error(f"Error in translation: {e}")
             raise
-    
+
+    def _translate_segments(self, texts: List[str], target_lang: str, tokenizer, model) -> List[str]:
+        # Слишком длинные сегменты режем по словам, чтобы ничего не обрезалось моделью
+        pieces: List[str] = []
+        owners: List[int] = []
+        for i, text in enumerate(texts):
+            for piece in self._fit_to_model(text, tokenizer):
+                pieces.append(piece)
+                owners.append(i)
+
+        # Язык источника — по каждому входному сегменту, его куски переводятся с тем же кодом
+        sources = [detect_language(text) for text in texts]
+        by_source: Dict[str, List[int]] = {}
+        for i, piece in enumerate(pieces):
+            if piece:
+                by_source.setdefault(sources[owners[i]], []).append(i)
+
+        outputs = [""] * len(pieces)
+        for source_lang, non_empty in by_source.items():
+            # Без src_lang токенизатор кодирует любой вход как eng_Latn
+            tokenizer.src_lang = NLLB_LANG_CODES[source_lang]
+            lengths = [len(ids) for ids in tokenizer([pieces[i] for i in non_empty])["input_ids"]]
+            for bucket in self._length_buckets(lengths):
+                batch = [non_empty[j] for j in bucket]
+                longest = max(lengths[j] for j in bucket)
+                translated = self._generate(tokenizer, model, [pieces[i] for i in batch], longest, target_lang)
+                for i, text in zip(batch, translated):
+                    outputs[i] = text
+
+        results: List[List[str]] = [[] for _ in texts]
+        for owner, translated in zip(owners, outputs):
+            results[owner].append(translated)
+        return [" ".join(parts) for parts in results]
+
+    @staticmethod
+    def _generate(tokenizer, model, batch: List[str], longest: int, target_lang: str) -> List[str]:
+        import torch
+
+        inputs = tokenizer(
+            batch,
+            return_tensors="pt",
+            padding=True,
+            truncation=True,
+            max_length=NLLB_MAX_INPUT_TOKENS
+        )
+        with torch.no_grad():
+            translated_tokens = model.generate(
+                **inputs,
+                forced_bos_token_id=tokenizer.convert_tokens_to_ids(NLLB_LANG_CODES[target_lang]),
+                # Перевод редко длиннее оригинала в полтора раза
+                max_new_tokens=int(longest * 1.5) + 10
+            )
+        return tokenizer.batch_decode(translated_tokens, skip_special_tokens=True)
+
+    @staticmethod
+    def _length_buckets(lengths: List[int]) -> List[List[int]]:
+        """Group indices of similar token length into batches bounded by size and padded tokens"""
+        order = sorted(range(len(lengths)), key=lengths.__getitem__)
+        batches: List[List[int]] = []
+        current: List[int] = []
+        for i in order:
+            # Отсортировано по возрастанию — текущий сегмент самый длинный в пакете
+            padded = (len(current) + 1) * lengths[i]
+            if current and (len(current) >= NLLB_BATCH_SIZE or padded > NLLB_MAX_BATCH_TOKENS):
+                batches.append(current)
+                current = []
+            current.append(i)
+        if current:
+            batches.append(current)
+        return batches
+
+    @staticmethod
+    def _fit_to_model(text: str, tokenizer) -> List[str]:
+        """Split a segment on word boundaries so every piece fits NLLB_MAX_INPUT_TOKENS"""
+        text = text.strip()
+        if not text:
+            return [""]
+        if len(tokenizer.tokenize(text)) <= NLLB_MAX_INPUT_TOKENS - 2:
+            return [text]
+
+        pieces: List[str] = []
+        current: List[str] = []
+        current_tokens = 0
+        for word in text.split():
+            word_tokens = len(tokenizer.tokenize(word))
+            if current and current_tokens + word_tokens > NLLB_MAX_INPUT_TOKENS - 2:
+                pieces.append(" ".join(current))
+                current, current_tokens = [], 0
+            current.append(word)
+            current_tokens += word_tokens
+        if current:
+            pieces.append(" ".join(current))
+        return pieces
+
     def _mock_translate(self, text: str, target_lang: str) -> str:
         """Mock translation for development"""
-        lang_name = SUPPORTED_LANGUAGES.get(target_lang, "Unknown")
+        lang_name = LANGUAGE_NAMES.get(target_lang, "Unknown")
         return f"[{lang_name}] {text}"
 
 
 class MockTranslationService:
     """Mock translation service"""
-    
+
     def translate(self, text: str, target_lang: str) -> str:
         """Return mock translation"""
         lang_map = {"ru": "RUS", "en": "ENG", "kk": "KAZ"}
         lang = lang_map.get(target_lang, "UNK")
         return f"[{lang}] {text}"
+
+    def translate_batch(self, texts: List[str], target_lang: str) -> List[str]:
+        """Return mock translations"""
+        return [self.translate(text, target_lang) for text in texts]
@@ -0,0 +1,289 @@
+"""
+Sentence-level translation memory with exact and variant reuse
+"""
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from ai_translate_shared.tokens import estimate_tokens
+from app.config import TM_DB_PATH, TM_MAX_ROWS, TM_MAX_AGE_DAYS
+from app.services.translation import MockTranslations
+from app.utils.text_utils import segment_text, exact_segment, variant_segment
+
+logger = logging.getLogger(__name__)
+
+# Функция перевода списка сегментов: (segments, target_lang) -> translations
+BatchTranslator = Callable[[List[str], str], Awaitable[List[str]]]
+
+# Хэшей в одном IN (...) — ниже лимита параметров SQLite
+_SQL_BATCH = 500
+# Проверка лимитов таблицы — раз на столько добавленных записей
+_PRUNE_EVERY = 1000
+
+
+@dataclass
+class TMStats:
+    segments: int = 0
+    exact_hits: int = 0
+    fuzzy_hits: int = 0
+    misses: int = 0
+    saved_tokens: int = 0
+    # Перевод получен заглушкой вместо модели — его нельзя кэшировать
+    mock: bool = False
+
+    @property
+    def hit_rate(self) -> float:
+        return (self.exact_hits + self.fuzzy_hits) / self.segments if self.segments else 0.0
+
+    def merge(self, other: "TMStats"):
+        self.segments += other.segments
+        self.exact_hits += other.exact_hits
+        self.fuzzy_hits += other.fuzzy_hits
+        self.misses += other.misses
+        self.saved_tokens += other.saved_tokens
+        self.mock = self.mock or other.mock
+
+    def to_dict(self) -> dict:
+        return {**asdict(self), "hit_rate": round(self.hit_rate, 4)}
+
+
+class TranslationMemory:
+    """
+    Stores translated sentences per model and target language and reuses them
+
+    A sentence is reused as is when it matches a stored one exactly (only
+    whitespace may differ). A fuzzy hit is a sentence that differs from a
+    stored one only in case, double quotes or commas; any other difference, a word,
+    a number, a sign or the final "?"/"!", sends the sentence to the model,
+    so "is not ready" never reuses the translation of "is ready" and "Stop."
+    never reuses the one of "Stop?".
+
+    Entries are keyed by the translating model as well, like the result
+    cache, so NLLB and OpenAI output are never served for each other and a
+    new NLLB_MODEL starts from an empty memory. Lookups go to SQLite by hash,
+    nothing is held in memory; the table is capped at max_rows and max_age
+    days of disuse.
+    """
+
+    def __init__(self, db_path: Path, max_rows: int = 0, max_age_days: float = 0):
+        self.db_path = Path(db_path)
+        self.max_rows = max_rows
+        self.max_age = max_age_days * 86400
+        self._lock = threading.Lock()
+        self._conn = self._connect()
+        self._added_since_prune = 0
+        self.totals = TMStats()
+        self.prune()
+
+    def _connect(self) -> sqlite3.Connection:
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS segments (
+                model TEXT NOT NULL,
+                target_lang TEXT NOT NULL,
+                source_hash TEXT NOT NULL,
+                variant_hash TEXT NOT NULL,
+                translation TEXT NOT NULL,
+                used_at REAL NOT NULL,
+                PRIMARY KEY (model, target_lang, source_hash)
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS segments_variant ON segments (model, target_lang, variant_hash)")
+        conn.execute("CREATE INDEX IF NOT EXISTS segments_used_at ON segments (used_at)")
+        conn.commit()
+        return conn
+
+    @staticmethod
+    def _hash(key: str) -> str:
+        return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+    def _select(self, column: str, model: str, target_lang: str, hashes: List[str]) -> Dict[str, Tuple[str, str]]:
+        """{hash in column: (source_hash, translation)} for the given hashes"""
+        found: Dict[str, Tuple[str, str]] = {}
+        for i in range(0, len(hashes), _SQL_BATCH):
+            chunk = hashes[i:i + _SQL_BATCH]
+            rows = self._conn.execute(
+                f"SELECT {column}, source_hash, translation FROM segments "
+                f"WHERE model = ? AND target_lang = ? AND {column} IN ({','.join('?' * len(chunk))})",
+                (model, target_lang, *chunk),
+            ).fetchall()
+            for key, source_hash, translation in rows:
+                found[key] = (source_hash, translation)
+        return found
+
+    def lookup(self, segment: str, target_lang: str, model: str) -> Optional[Tuple[str, str]]:
+        """
+        Find a stored translation for a sentence
+
+        Returns:
+            (translation, "exact" | "fuzzy") or None
+        """
+        return self.lookup_many([segment], target_lang, model)[0]
+
+    def lookup_many(self, segments: List[str], target_lang: str, model: str) -> List[Optional[Tuple[str, str]]]:
+        """lookup for a list of sentences in a few queries (blocking: run it in a thread)"""
+        exact_keys = [exact_segment(segment) for segment in segments]
+        exact_hashes = [self._hash(key) if key else None for key in exact_keys]
+        variant_hashes = [self._hash(variant_segment(segment)) if key else None for segment, key in zip(segments, exact_keys)]
+        with self._lock:
+            exact = self._select("source_hash", model, target_lang, sorted({h for h in exact_hashes if h}))
+            variants = self._select(
+                "variant_hash", model, target_lang,
+                sorted({v for h, v in zip(exact_hashes, variant_hashes) if h and h not in exact})
+            )
+            found: List[Optional[Tuple[str, str]]] = []
+            used = set()
+            for exact_hash, variant_hash in zip(exact_hashes, variant_hashes):
+                if exact_hash is None:
+                    found.append(None)
+                elif exact_hash in exact:
+                    used.add(exact_hash)
+                    found.append((exact[exact_hash][1], "exact"))
+                elif variant_hash in variants:
+                    used.add(variants[variant_hash][0])
+                    found.append((variants[variant_hash][1], "fuzzy"))
+                else:
+                    found.append(None)
+            if used:
+                # Время последнего использования — по нему вытесняются старые записи
+                self._conn.executemany(
+                    "UPDATE segments SET used_at = ? WHERE model = ? AND target_lang = ? AND source_hash = ?",
+                    [(time.time(), model, target_lang, source_hash) for source_hash in used],
+                )
+                self._conn.commit()
+        return found
+
+    def add_many(self, pairs: List[Tuple[str, str]], target_lang: str, model: str):
+        """Store translated sentences (blocking: run it in a thread)"""
+        now = time.time()
+        rows = []
+        for segment, translation in pairs:
+            exact = exact_segment(segment)
+            if exact and translation.strip():
+                rows.append((model, target_lang, self._hash(exact), self._hash(variant_segment(segment)), translation, now))
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO segments (model, target_lang, source_hash, variant_hash, translation, used_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+            self._added_since_prune += len(rows)
+            if self._added_since_prune < _PRUNE_EVERY:
+                return
+        self.prune()
+
+    def prune(self) -> int:
+        """Drop entries unused for max_age and the least recently used beyond max_rows"""
+        removed = 0
+        with self._lock:
+            self._added_since_prune = 0
+            if self.max_age > 0:
+                removed += self._conn.execute(
+                    "DELETE FROM segments WHERE used_at < ?", (time.time() - self.max_age,)
+                ).rowcount
+            if self.max_rows > 0:
+                excess = self._conn.execute("SELECT COUNT(*) FROM segments").fetchone()[0] - self.max_rows
+                if excess > 0:
+                    removed += self._conn.execute(
+                        "DELETE FROM segments WHERE rowid IN (SELECT rowid FROM segments ORDER BY used_at LIMIT ?)",
+                        (excess,),
+                    ).rowcount
+            self._conn.commit()
+        if removed:
+            logger.info(f"Translation memory: pruned {removed} entries")
+        return removed
+
+    async def translate(
+        self, text: str, target_lang: str, translate_batch: BatchTranslator, model: str
+    ) -> Tuple[str, TMStats]:
+        """
+        Translate text, sending only sentences missing from the memory to the model
+
+        Args:
+            text: Source text
+            target_lang: Target language code
+            translate_batch: Translates a list of sentences in one call
+            model: Name of the model behind translate_batch (part of the key)
+
+        Returns:
+            Tuple of (translated text, stats for this call)
+        """
+        translations, stats = await self.translate_many([text], target_lang, translate_batch, model)
+        return translations[0], stats
+
+    async def translate_many(
+        self, texts: List[str], target_lang: str, translate_batch: BatchTranslator, model: str
+    ) -> Tuple[List[str], TMStats]:
+        """
+        Translate several texts with one model call for all their new sentences
+
+        A sentence repeated across texts is translated once.
+
+        Returns:
+            Tuple of (translations in input order, stats for this call)
+        """
+        pieces = [segment_text(text) for text in texts]
+        stats = TMStats(segments=sum(len(text_pieces) for text_pieces in pieces))
+        translations: List[List[Optional[str]]] = [[None] * len(text_pieces) for text_pieces in pieces]
+        missing: Dict[str, List[Tuple[int, int]]] = {}
+
+        # SQLite и индексы — блокирующие вызовы, не держим ими event loop
+        flat = [sentence for text_pieces in pieces for sentence, _ in text_pieces]
+        lookups = iter(await asyncio.to_thread(self.lookup_many, flat, target_lang, model))
+        for t, text_pieces in enumerate(pieces):
+            for i, (sentence, _) in enumerate(text_pieces):
+                found = next(lookups)
+                if found is None:
+                    # Одинаковые предложения внутри текстов переводим один раз
+                    missing.setdefault(sentence, []).append((t, i))
+                    continue
+                translations[t][i] = found[0]
+                stats.saved_tokens += estimate_tokens(sentence)
+                if found[1] == "exact":
+                    stats.exact_hits += 1
+                else:
+                    stats.fuzzy_hits += 1
+
+        if missing:
+            sources = list(missing)
+            results = await translate_batch(sources, target_lang)
+            if len(results) != len(sources):
+                raise ValueError(
+                    f"Batch translator ({model}) returned {len(results)} translations for {len(sources)} sentences"
+                )
+            for source, translated in zip(sources, results):
+                positions = missing[source]
+                for t, i in positions:
+                    translations[t][i] = translated
+                stats.misses += 1
+                # Повторы одного предложения — тоже сэкономленные токены
+                stats.exact_hits += len(positions) - 1
+                stats.saved_tokens += estimate_tokens(source) * (len(positions) - 1)
+            if isinstance(results, MockTranslations):
+                # Модель не загрузилась: в память такой «перевод» не попадает
+                stats.mock = True
+            else:
+                await asyncio.to_thread(self.add_many, list(zip(sources, results)), target_lang, model)
+
+        self.totals.merge(stats)
+        logger.info(
+            f"Translation memory ({model}, {target_lang}): {stats.segments} segments, "
+            f"hit rate {stats.hit_rate:.0%}, ~{stats.saved_tokens} tokens saved"
+        )
+        return [
+            "".join(t + sep for t, (_, sep) in zip(text_translations, text_pieces))
+            for text_translations, text_pieces in zip(translations, pieces)
+        ], stats
+
+
+translation_memory = TranslationMemory(TM_DB_PATH, max_rows=TM_MAX_ROWS, max_age_days=TM_MAX_AGE_DAYS)
@@ -0,0 +1,257 @@
+import subprocess
+from typing import Dict, List, Optional, Tuple
+
+# faster-whisper ждёт моно float32 с частотой 16 кГц
+SAMPLE_RATE = 16000
+# Для поиска пауз хватает грубой дискретизации — 2 часа занимают ~115 МБ вместо ~460
+ANALYSIS_RATE = 4000
+VIDEO_EXTENSIONS = ('.mp4', '.mov', '.avi', '.mkv')
+
+
+class AudioDecodeError(RuntimeError):
+    """ffmpeg exited with an error or produced no audio"""
+
+
+class AudioWriter:
+    """
+    Incremental writer of mono 16-bit PCM to .wav or .mp3
+
+    WAV goes through the wave module (the header is patched on close); MP3 is
+    encoded on the fly by ffmpeg reading PCM from a pipe. Either way audio is
+    written as it arrives, nothing is buffered whole.
+    """
+
+    def __init__(self, file_path: str, sample_rate: int):
+        self.file_path = str(file_path)
+        self.sample_rate = sample_rate
+        self.frames = 0
+        self._wav = None
+        self._process = None
+        if self.file_path.lower().endswith('.mp3'):
+            cmd = [
+                'ffmpeg', '-nostdin', '-hide_banner', '-loglevel', 'error', '-y',
+                '-f', 's16le', '-ac', '1', '-ar', str(sample_rate), '-i', 'pipe:0',
+                '-codec:a', 'libmp3lame', '-q:a', '4', self.file_path
+            ]
+            try:
+                self._process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+            except FileNotFoundError as e:
+                raise AudioDecodeError("ffmpeg is not installed") from e
+        else:
+            import wave
+            self._wav = wave.open(self.file_path, 'wb')
+            self._wav.setnchannels(1)
+            self._wav.setsampwidth(2)
+            self._wav.setframerate(sample_rate)
+
+    @property
+    def seconds(self) -> float:
+        return self.frames / self.sample_rate
+
+    def write(self, pcm: bytes):
+        self.frames += len(pcm) // 2
+        if self._wav is not None:
+            self._wav.writeframes(pcm)
+        else:
+            self._process.stdin.write(pcm)
+
+    def close(self):
+        if self._wav is not None:
+            self._wav.close()
+            return
+        self._process.stdin.close()
+        stderr = self._process.stderr.read().decode('utf-8', errors='replace').strip()
+        if self._process.wait() != 0:
+            raise AudioDecodeError(f"ffmpeg failed ({self._process.returncode}) for {self.file_path}: {stderr[-500:]}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def decode_audio(
+    file_path: str,
+    sample_rate: int = SAMPLE_RATE,
+    start: Optional[float] = None,
+    duration: Optional[float] = None,
+):
+    """
+    Decode any ffmpeg-readable media to a mono float32 NumPy array
+
+    PCM is read from ffmpeg's stdout, so nothing is written to disk. start and
+    duration (seconds) select a slice without decoding the rest of the file.
+
+    Raises:
+        AudioDecodeError: with the tail of ffmpeg's stderr on failure
+    """
+    import numpy as np
+
+    cmd = ['ffmpeg', '-nostdin', '-hide_banner', '-loglevel', 'error']
+    if start is not None:
+        # -ss до -i — быстрый поиск по контейнеру, а не декодирование с начала
+        cmd += ['-ss', f'{start:.3f}']
+    cmd += ['-i', str(file_path)]
+    if duration is not None:
+        cmd += ['-t', f'{duration:.3f}']
+    cmd += ['-vn', '-ac', '1', '-ar', str(sample_rate), '-f', 's16le', '-acodec', 'pcm_s16le', 'pipe:1']
+
+    try:
+        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    except FileNotFoundError as e:
+        raise AudioDecodeError("ffmpeg is not installed") from e
+
+    if result.returncode != 0:
+        stderr = result.stderr.decode('utf-8', errors='replace').strip()
+        raise AudioDecodeError(f"ffmpeg failed ({result.returncode}) for {file_path}: {stderr[-500:]}")
+    if not result.stdout:
+        raise AudioDecodeError(f"No audio stream in {file_path}")
+
+    audio = np.frombuffer(result.stdout, dtype=np.int16).astype(np.float32)
+    audio /= 32768.0
+    return audio
+
+
+def probe_duration(file_path: str) -> Optional[float]:
+    """
+    Duration in seconds from the container metadata, without decoding
+
+    Uses ffprobe, or the header for .wav when ffprobe is missing. Returns None
+    when the duration is unknown (no metadata, unreadable file).
+    """
+    cmd = [
+        'ffprobe', '-v', 'error', '-show_entries', 'format=duration',
+        '-of', 'default=noprint_wrappers=1:nokey=1', str(file_path)
+    ]
+    try:
+        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, timeout=30)
+        return float(result.stdout.strip()) if result.returncode == 0 else None
+    except ValueError:
+        # "N/A": у потока без длительности в заголовке
+        return None
+    except (FileNotFoundError, subprocess.TimeoutExpired):
+        pass
+    if str(file_path).lower().endswith('.wav'):
+        import wave
+        try:
+            with wave.open(str(file_path), 'rb') as wav:
+                return wav.getnframes() / wav.getframerate()
+        except (OSError, EOFError, wave.Error):
+            return None
+    return None
+
+
+def find_silence_cuts(
+    audio, sample_rate: int, parts: int,
+    search_seconds: float = 30.0, frame_seconds: float = 0.02
+) -> List[float]:
+    """
+    Pick parts - 1 cut points near equal divisions of the audio
+
+    Each cut is the quietest moment (frame RMS smoothed over 0.5 s) within
+    search_seconds of its ideal position, so shards end in pauses rather
+    than mid-word.
+    """
+    import numpy as np
+
+    frame = max(1, int(sample_rate * frame_seconds))
+    count = len(audio) // frame
+    if parts < 2 or count == 0:
+        return []
+
+    frames = audio[:count * frame].reshape(count, frame)
+    energy = np.sqrt(np.einsum('ij,ij->i', frames, frames) / frame)
+    width = max(1, int(0.5 / frame_seconds))
+    energy = np.convolve(energy, np.ones(width, dtype=np.float32) / width, mode='same')
+
+    duration = count * frame_seconds
+    radius = int(search_seconds / frame_seconds)
+    cuts = []
+    for i in range(1, parts):
+        ideal = int(duration * i / parts / frame_seconds)
+        lo, hi = max(0, ideal - radius), min(count, ideal + radius)
+        cuts.append((lo + int(np.argmin(energy[lo:hi]))) * frame_seconds)
+    return cuts
+
+
+def plan_shards(file_path: str, max_shards: int, min_seconds: float) -> List[Tuple[float, Optional[float]]]:
+    """
+    Split a recording into up to max_shards (start, end) ranges at silences
+
+    Every shard is at least min_seconds long; the last one has end=None
+    (until the end of the file). Short files give a single shard: their
+    duration comes from the container metadata and the audio is decoded
+    for the silence scan only when it will really be split.
+    """
+    def parts_for(seconds: float) -> int:
+        return min(max_shards, int(seconds // min_seconds)) if min_seconds > 0 else max_shards
+
+    duration = probe_duration(file_path)
+    if max_shards < 2 or (duration is not None and parts_for(duration) < 2):
+        return [(0.0, None)]
+
+    audio = decode_audio(file_path, sample_rate=ANALYSIS_RATE)
+    parts = parts_for(len(audio) / ANALYSIS_RATE)
+    if parts < 2:
+        return [(0.0, None)]
+
+    cuts = find_silence_cuts(audio, ANALYSIS_RATE, parts)
+    bounds = [0.0] + cuts + [None]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def merge_shard_segments(
+    shards: List[Tuple[float, Optional[float]]], results: List[List[dict]]
+) -> List[dict]:
+    """
+    Merge per-shard segments into one timeline without losing or repeating speech
+
+    results[i] holds every segment shard i decoded, overlap included, with
+    file-relative timestamps. Segments of different shards that overlap in
+    time are the same speech cut differently; each connected group of them is
+    taken from the one shard whose own range covers most of the group, so a
+    segment straddling a cut is kept whole from one side. Segments no other
+    shard overlaps are kept as they are.
+    """
+    entries = sorted(
+        ((i, seg) for i, segments in enumerate(results) for seg in segments),
+        key=lambda entry: (entry[1]["start"], entry[1]["end"])
+    )
+    parent = list(range(len(entries)))
+
+    def root(k: int) -> int:
+        while parent[k] != k:
+            parent[k] = parent[parent[k]]
+            k = parent[k]
+        return k
+
+    # Сегменты одной части не пересекаются, поэтому активных на каждом шаге — единицы
+    active: List[int] = []
+    for k, (shard, seg) in enumerate(entries):
+        active = [a for a in active if entries[a][1]["end"] > seg["start"]]
+        for a in active:
+            if entries[a][0] != shard:
+                parent[root(a)] = root(k)
+        active.append(k)
+
+    groups: Dict[int, List[int]] = {}
+    for k in range(len(entries)):
+        groups.setdefault(root(k), []).append(k)
+
+    merged = []
+    for members in groups.values():
+        owners = {entries[k][0] for k in members}
+        if len(owners) > 1:
+            lo = min(entries[k][1]["start"] for k in members)
+            hi = max(entries[k][1]["end"] for k in members)
+
+            def coverage(shard: int) -> float:
+                start, end = shards[shard]
+                return min(hi, float("inf") if end is None else end) - max(lo, start)
+
+            # При равенстве — более ранняя часть
+            best = max(sorted(owners), key=coverage)
+            members = [k for k in members if entries[k][0] == best]
+        merged.extend(entries[k][1] for k in members)
+    return sorted(merged, key=lambda seg: seg["start"])
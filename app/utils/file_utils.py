@@ -1,8 +1,31 @@
+import hashlib
+import zipfile
 from pathlib import Path
+from typing import List, Optional, Tuple
+from ai_translate_shared.image_pages import DOCUMENT_EXTENSIONS
 from app.models.job import FileType
 
-def get_file_type(mime_type: str) -> FileType:
-    if mime_type.startswith("audio/"):
+# Размер блока при потоковой записи загрузки на диск
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+# Контейнеры страниц для пакетного OCR
+DOCUMENT_MIME_TYPES = {
+    "application/zip": ".zip",
+    "application/x-zip-compressed": ".zip",
+    "application/pdf": ".pdf",
+    "image/tiff": ".tiff",
+}
+
+
+class FileTooLargeError(Exception):
+    """Raised when an upload crosses the configured size limit"""
+
+
+def get_file_type(mime_type: str, filename: str = "") -> FileType:
+    if mime_type in DOCUMENT_MIME_TYPES or Path(filename).suffix.lower() in DOCUMENT_EXTENSIONS:
+        return FileType.DOCUMENT
+    elif mime_type.startswith("audio/"):
         return FileType.AUDIO
     elif mime_type.startswith("video/"):
         return FileType.VIDEO
@@ -20,3 +43,114 @@ def save_uploaded_file(directory: Path, content: bytes, filename: str) -> Path:
     file_path = directory / filename
     file_path.write_bytes(content)
     return file_path
+
+async def save_upload_stream(
+    upload,
+    file_path: Path,
+    max_mb: int,
+    chunk_size: int = UPLOAD_CHUNK_SIZE
+) -> Tuple[Path, str, int]:
+    """
+    Copy an upload to disk chunk by chunk, hashing it on the way
+
+    Args:
+        upload: FastAPI UploadFile (anything with an async read(size))
+        file_path: Destination path
+        max_mb: Size limit in MB
+        chunk_size: Bytes read per iteration
+
+    Returns:
+        Tuple of (file_path, sha256 hex digest, size in bytes)
+
+    Raises:
+        FileTooLargeError: As soon as the limit is crossed; the partial file is removed
+    """
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(file_path, "wb") as out:
+            while chunk := await upload.read(chunk_size):
+                size += len(chunk)
+                if not validate_file_size(size, max_mb):
+                    raise FileTooLargeError(f"Upload exceeds {max_mb} MB")
+                digest.update(chunk)
+                out.write(chunk)
+    except BaseException:
+        file_path.unlink(missing_ok=True)
+        raise
+    return file_path, digest.hexdigest(), size
+
+async def save_upload_batch(
+    uploads: List,
+    zip_path: Path,
+    max_mb: int,
+    chunk_size: int = UPLOAD_CHUNK_SIZE
+) -> Tuple[Path, str, int]:
+    """
+    Stream several uploads into one uncompressed zip, hashing on the way
+
+    Members are named {index:04d}_{filename}, so their sorted order is the
+    upload order. max_mb applies to the total.
+
+    Returns:
+        Tuple of (zip_path, sha256 hex digest, total size in bytes)
+
+    Raises:
+        FileTooLargeError: As soon as the limit is crossed; the partial zip is removed
+    """
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_STORED) as archive:
+            for index, upload in enumerate(uploads):
+                name = f"{index:04d}_{Path(upload.filename or 'page').name}"
+                digest.update(name.encode("utf-8"))
+                with archive.open(name, "w", force_zip64=True) as out:
+                    while chunk := await upload.read(chunk_size):
+                        size += len(chunk)
+                        if not validate_file_size(size, max_mb):
+                            raise FileTooLargeError(f"Upload exceeds {max_mb} MB")
+                        digest.update(chunk)
+                        out.write(chunk)
+    except BaseException:
+        zip_path.unlink(missing_ok=True)
+        raise
+    return zip_path, digest.hexdigest(), size
+
+def hash_file(file_path: Path, chunk_size: int = UPLOAD_CHUNK_SIZE) -> str:
+    """sha256 of a file on disk, read in chunks"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def image_size(file_path: Path) -> Optional[Tuple[int, int]]:
+    """(width, height) from the image header, None if Pillow can't read it"""
+    try:
+        from PIL import Image
+        with Image.open(file_path) as image:
+            return image.width, image.height
+    except (ImportError, OSError):
+        return None
+
+def image_pixels(file_path: Path) -> Optional[int]:
+    """Width x height from the image header, None if Pillow can't read it"""
+    size = image_size(file_path)
+    return size[0] * size[1] if size else None
+
+def read_text_file(file_path: Path, max_chars: int) -> str:
+    """
+    Read a UTF-8 text upload, refusing anything longer than max_chars
+
+    Raises:
+        UnicodeDecodeError: If the file is not valid UTF-8
+        ValueError: If the text is longer than max_chars
+    """
+    # Один символ UTF-8 занимает не больше 4 байт — отсекаем заведомо большие файлы без чтения
+    if file_path.stat().st_size > max_chars * 4:
+        raise ValueError("Text file too large")
+    text = file_path.read_text(encoding="utf-8")
+    if len(text) > max_chars:
+        raise ValueError("Text file too large")
+    return text
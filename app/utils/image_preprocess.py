@@ -0,0 +1,200 @@
+import math
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+from app.models.job import BoundingBox
+
+# Высота строки, при которой OCR уже не теряет в точности: распознаватель PaddleOCR
+# всё равно сжимает каждую строку до 48 px
+TARGET_TEXT_HEIGHT = 32
+# Оценка масштаба текста идёт по уменьшенной копии — так быстрее и шум не мешает
+ESTIMATE_SIDE = 1200
+# Меньше стольких символов — оценке не доверяем и изображение не уменьшаем
+MIN_COMPONENTS = 20
+
+
+@dataclass
+class Tile:
+    x: int
+    y: int
+    width: int
+    height: int
+    # Зона ответственности тайла (x0, y0, x1, y1): середины перекрытий с соседями.
+    # Рамка остаётся за тайлом, в чью зону попал её центр, — без дублей на стыках
+    core: Tuple[float, float, float, float]
+
+
+@dataclass
+class ImagePlan:
+    width: int
+    height: int
+    # Размер рабочего изображения после уменьшения
+    work_width: int
+    work_height: int
+    text_height: Optional[float] = None
+    tiles: List[Tile] = field(default_factory=list)
+
+    @property
+    def scale(self) -> float:
+        return self.work_width / self.width
+
+
+def estimate_text_height(gray) -> Optional[float]:
+    """
+    Median height of character-like connected components, in pixels of gray
+
+    Returns None when there are too few of them to trust the estimate.
+    """
+    import cv2
+    import numpy as np
+
+    height, width = gray.shape[:2]
+    factor = min(1.0, ESTIMATE_SIDE / max(height, width))
+    if factor < 1.0:
+        gray = cv2.resize(gray, (max(1, int(width * factor)), max(1, int(height * factor))), interpolation=cv2.INTER_AREA)
+
+    binary = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY_INV, 31, 15)
+    count, _, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+    heights = stats[1:, cv2.CC_STAT_HEIGHT]
+    widths = stats[1:, cv2.CC_STAT_WIDTH]
+    areas = stats[1:, cv2.CC_STAT_AREA]
+    # Похожее на буквы: не точки, не линии таблиц, не фон
+    chars = (heights >= 4) & (heights <= gray.shape[0] * 0.2) & (widths <= heights * 4) & (areas >= 8)
+    if int(chars.sum()) < MIN_COMPONENTS:
+        return None
+    return float(np.median(heights[chars])) / factor
+
+
+def _spans(length: int, tile: int, overlap: int) -> List[Tuple[int, int, float, float]]:
+    """(start, end, core_start, core_end) along one axis"""
+    if length <= tile:
+        return [(0, length, 0.0, float(length))]
+    count = math.ceil((length - overlap) / (tile - overlap))
+    step = (length - tile) / (count - 1)
+    starts = [round(i * step) for i in range(count)]
+    spans = []
+    for i, start in enumerate(starts):
+        end = start + tile
+        core_start = 0.0 if i == 0 else (start + starts[i - 1] + tile) / 2
+        core_end = float(length) if i == count - 1 else (starts[i + 1] + end) / 2
+        spans.append((start, end, core_start, core_end))
+    return spans
+
+
+def plan_image(
+    width: int, height: int, text_height: Optional[float],
+    target_text_height: float, tile_size: int, overlap: int
+) -> ImagePlan:
+    """
+    Working resolution and tiles for an image
+
+    Large text is scaled down to target_text_height (never up); the result is
+    cut into tile_size squares that overlap by at least two text lines.
+    """
+    scale = 1.0
+    if text_height and text_height > target_text_height:
+        scale = target_text_height / text_height
+    work_width, work_height = max(1, round(width * scale)), max(1, round(height * scale))
+    if text_height:
+        overlap = max(overlap, int(text_height * scale * 2))
+    overlap = min(overlap, tile_size // 2)
+
+    tiles = [
+        Tile(x0, y0, x1 - x0, y1 - y0, (cx0, cy0, cx1, cy1))
+        for y0, y1, cy0, cy1 in _spans(work_height, tile_size, overlap)
+        for x0, x1, cx0, cx1 in _spans(work_width, tile_size, overlap)
+    ]
+    return ImagePlan(width, height, work_width, work_height, text_height, tiles)
+
+
+def read_image(file_path: str, scale: float = 1.0):
+    """
+    Decode to BGR at roughly the given scale
+
+    JPEGs are decoded straight at 1/2, 1/4 or 1/8 size when the scale allows,
+    which is much cheaper than decoding full size and resizing. Formats
+    OpenCV cannot read (GIF) are decoded with Pillow at full size, first
+    frame only.
+    """
+    import cv2
+
+    flags = cv2.IMREAD_COLOR
+    for factor, reduced in ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2)):
+        if scale <= 1 / factor:
+            flags = reduced
+            break
+    image = cv2.imread(str(file_path), flags)
+    if image is None:
+        image = _read_with_pillow(file_path)
+    if image is None:
+        raise ValueError(f"Cannot decode image: {file_path}")
+    return image
+
+
+def _read_with_pillow(file_path: str):
+    import numpy as np
+    from PIL import Image, UnidentifiedImageError
+
+    try:
+        with Image.open(file_path) as img:
+            # RGB -> BGR, как у cv2.imread
+            return np.ascontiguousarray(np.asarray(img.convert("RGB"))[:, :, ::-1])
+    except (OSError, UnidentifiedImageError):
+        return None
+
+
+def working_image(image, plan: ImagePlan):
+    """image at the plan's working resolution (image may already be reduced)"""
+    import cv2
+
+    if image.shape[1] == plan.work_width and image.shape[0] == plan.work_height:
+        return image
+    return cv2.resize(image, (plan.work_width, plan.work_height), interpolation=cv2.INTER_AREA)
+
+
+def prepare(image, target_text_height: float, tile_size: int, overlap: int) -> Tuple[object, ImagePlan]:
+    """Estimate text scale of a BGR image, downscale it and plan its tiles"""
+    import cv2
+
+    height, width = image.shape[:2]
+    text_height = estimate_text_height(cv2.cvtColor(image, cv2.COLOR_BGR2GRAY))
+    plan = plan_image(width, height, text_height, target_text_height, tile_size, overlap)
+    return working_image(image, plan), plan
+
+
+def crop(work, tile: Tile):
+    return work[tile.y:tile.y + tile.height, tile.x:tile.x + tile.width]
+
+
+def map_boxes(boxes: List[BoundingBox], tile: Tile, plan: ImagePlan) -> List[BoundingBox]:
+    """Tile-space boxes -> original image space, keeping only those centred in the tile's core"""
+    sx, sy = plan.width / plan.work_width, plan.height / plan.work_height
+    x0, y0, x1, y1 = tile.core
+    mapped = []
+    for box in boxes:
+        cx, cy = tile.x + box.x + box.width / 2, tile.y + box.y + box.height / 2
+        if not (x0 <= cx < x1 and y0 <= cy < y1):
+            continue
+        mapped.append(BoundingBox(
+            x=(tile.x + box.x) * sx, y=(tile.y + box.y) * sy,
+            width=box.width * sx, height=box.height * sy,
+            text=box.text, confidence=box.confidence,
+        ))
+    return mapped
+
+
+def group_lines(boxes: List[BoundingBox]) -> List[List[BoundingBox]]:
+    """Boxes grouped into text lines, top to bottom, each line left to right"""
+    lines: List[Tuple[float, List[BoundingBox]]] = []
+    for box in sorted(boxes, key=lambda box: box.y + box.height / 2):
+        center = box.y + box.height / 2
+        # Центр в пределах половины высоты от первой рамки строки — та же строка
+        if lines and abs(center - lines[-1][0]) <= box.height / 2:
+            lines[-1][1].append(box)
+        else:
+            lines.append((center, [box]))
+    return [sorted(line, key=lambda box: box.x) for _, line in lines]
+
+
+def reading_order(boxes: List[BoundingBox]) -> List[BoundingBox]:
+    """Top-to-bottom lines, left to right within a line"""
+    return [box for line in group_lines(boxes) for box in line]
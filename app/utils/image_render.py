@@ -0,0 +1,172 @@
+from functools import lru_cache
+from typing import List, Tuple
+
+# Рамка стирается с запасом, чтобы не оставалось сглаженных краёв исходных букв
+MASK_MARGIN = 2
+# Фон по краю рамки однороднее этого (СКО по каналам) — заливаем цветом, иначе inpaint
+FLAT_BACKGROUND_STD = 12.0
+# Пиксели рамки дальше этого от фона считаются буквами — по ним выбирается цвет текста
+TEXT_COLOR_DISTANCE = 60.0
+MIN_FONT_SIZE = 8
+LINE_SPACING = 1.15
+
+
+@lru_cache(maxsize=256)
+def _font(font_path: str, size: int):
+    from PIL import ImageFont
+    try:
+        return ImageFont.truetype(font_path, size)
+    except OSError:
+        # Без TTF-шрифта — встроенный растровый, только латиница
+        return ImageFont.load_default()
+
+
+def _wrap(text: str, font, width: float) -> List[str]:
+    lines: List[str] = []
+    for word in text.split():
+        if lines and font.getlength(f"{lines[-1]} {word}") <= width:
+            lines[-1] = f"{lines[-1]} {word}"
+        else:
+            lines.append(word)
+    return lines
+
+
+def fit_text(text: str, width: float, height: float, font_path: str) -> Tuple[int, List[str]]:
+    """Largest font size at which text, word-wrapped to width, fits into height"""
+    lo, hi = MIN_FONT_SIZE, max(MIN_FONT_SIZE, int(height))
+    best = (MIN_FONT_SIZE, _wrap(text, _font(font_path, MIN_FONT_SIZE), width))
+    while lo <= hi:
+        size = (lo + hi) // 2
+        font = _font(font_path, size)
+        lines = _wrap(text, font, width)
+        if len(lines) * size * LINE_SPACING <= height and all(font.getlength(line) <= width for line in lines):
+            best, lo = (size, lines), size + 1
+        else:
+            hi = size - 1
+    return best
+
+
+def _rects(boxes: List[dict], width: int, height: int):
+    """(N, 4) int array of x0, y0, x1, y1 with the margin, clipped to the image"""
+    import numpy as np
+
+    coords = np.array([[box["x"], box["y"], box["x"] + box["width"], box["y"] + box["height"]] for box in boxes], dtype=np.float64)
+    coords = np.rint(coords + [-MASK_MARGIN, -MASK_MARGIN, MASK_MARGIN, MASK_MARGIN]).astype(np.int64)
+    coords[:, [0, 2]] = coords[:, [0, 2]].clip(0, width)
+    coords[:, [1, 3]] = coords[:, [1, 3]].clip(0, height)
+    return coords
+
+
+def _colors(image, rects):
+    """Per box: background colour and spread from the 2 px ring around it, and a text colour"""
+    import numpy as np
+
+    height, width = image.shape[:2]
+    background = np.zeros((len(rects), 3), dtype=np.float32)
+    spread = np.zeros(len(rects), dtype=np.float32)
+    text = np.zeros((len(rects), 3), dtype=np.float32)
+    for i, (x0, y0, x1, y1) in enumerate(rects):
+        ox0, oy0, ox1, oy1 = max(0, x0 - 2), max(0, y0 - 2), min(width, x1 + 2), min(height, y1 + 2)
+        outer = image[oy0:oy1, ox0:ox1].reshape(-1, 3).astype(np.float32)
+        ring_mask = np.ones((oy1 - oy0, ox1 - ox0), dtype=bool)
+        ring_mask[y0 - oy0:y1 - oy0, x0 - ox0:x1 - ox0] = False
+        ring = outer[ring_mask.ravel()]
+        if not len(ring):
+            ring = outer
+        background[i] = np.median(ring, axis=0)
+        spread[i] = ring.std(axis=0).max()
+
+        inner = image[y0:y1, x0:x1].reshape(-1, 3).astype(np.float32)
+        distance = np.linalg.norm(inner - background[i], axis=1)
+        ink = inner[distance > TEXT_COLOR_DISTANCE]
+        if len(ink):
+            text[i] = np.median(ink, axis=0)
+        else:
+            # Букв не видно — контрастный к фону чёрный или белый
+            text[i] = 0.0 if background[i].mean() > 127 else 255.0
+    return background, spread, text
+
+
+def render(image, boxes: List[dict], font_path: str):
+    """
+    Erase the original text of every box and draw its translated_text instead
+
+    image is a BGR array and is not modified. Flat backgrounds are filled with
+    their colour, the rest is inpainted in a single cv2.inpaint call over the
+    union mask; all strings are rasterised into one coverage mask and blended
+    in one vectorized pass.
+    """
+    import cv2
+    import numpy as np
+    from PIL import Image, ImageDraw
+
+    boxes = [box for box in boxes if box.get("width", 0) > 0 and box.get("height", 0) > 0]
+    if not boxes:
+        return image.copy()
+    height, width = image.shape[:2]
+    rects = _rects(boxes, width, height)
+    # Рамки, целиком ушедшие за край после обрезки, пропускаем
+    keep = (rects[:, 2] > rects[:, 0]) & (rects[:, 3] > rects[:, 1])
+    boxes, rects = [box for box, kept in zip(boxes, keep) if kept], rects[keep]
+    if not boxes:
+        return image.copy()
+    background, spread, text_colors = _colors(image, rects)
+
+    out = image.copy()
+    flat = spread < FLAT_BACKGROUND_STD
+    textured = np.zeros((height, width), dtype=np.uint8)
+    for (x0, y0, x1, y1), is_flat, color in zip(rects, flat, background):
+        if is_flat:
+            out[y0:y1, x0:x1] = color
+        else:
+            textured[y0:y1, x0:x1] = 255
+    if not flat.all():
+        out = cv2.inpaint(out, textured, 3, cv2.INPAINT_TELEA)
+        # На пёстром фоне цвет исходных букв не угадать — берём контрастный к восстановленному фону
+        for i in np.flatnonzero(~flat):
+            x0, y0, x1, y1 = rects[i]
+            text_colors[i] = 0.0 if out[y0:y1, x0:x1].mean() > 127 else 255.0
+
+    coverage = Image.new("L", (width, height), 0)
+    draw = ImageDraw.Draw(coverage)
+    color_layer = np.zeros_like(out)
+    for box, (x0, y0, x1, y1), color in zip(boxes, rects, text_colors):
+        translated = (box.get("translated_text") or "").strip()
+        if not translated:
+            continue
+        size, lines = fit_text(translated, x1 - x0, y1 - y0, font_path)
+        font = _font(font_path, size)
+        # По вертикали — по центру рамки
+        y = y0 + max(0.0, (y1 - y0 - len(lines) * size * LINE_SPACING) / 2)
+        for line in lines:
+            draw.text((int(x0), y), line, font=font, fill=255)
+            y += size * LINE_SPACING
+        color_layer[y0:y1, x0:x1] = color
+
+    alpha = np.asarray(coverage, dtype=np.float32)[..., None] / 255.0
+    return (out * (1.0 - alpha) + color_layer * alpha).round().astype(np.uint8)
+
+
+def render_file(file_path: str, boxes: List[dict], output_path: str, font_path: str):
+    import cv2
+    from app.utils.image_preprocess import read_image
+
+    image = read_image(file_path)
+    if not cv2.imwrite(str(output_path), render(image, boxes, font_path)):
+        raise ValueError(f"Cannot write image: {output_path}")
+
+
+def render_pages(file_path: str, pages: List[dict], font_path: str) -> List[bytes]:
+    """Render translated document pages (ocr_pages entries) to PNG bytes, in order"""
+    import cv2
+    from ai_translate_shared.image_pages import load_pages
+
+    images = load_pages(file_path, [(page["source"], page["page"] - 1) for page in pages])
+    encoded = []
+    for page, image in zip(pages, images):
+        # Страницы документа приходят в RGB
+        ok, data = cv2.imencode(".png", render(image[:, :, ::-1], page.get("bboxes") or [], font_path))
+        if not ok:
+            raise ValueError(f"Cannot encode page {page['page']} of {file_path}")
+        encoded.append(data.tobytes())
+    return encoded
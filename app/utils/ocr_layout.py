@@ -0,0 +1,84 @@
+from dataclasses import dataclass
+from typing import List, Tuple
+from app.models.job import BoundingBox
+from app.utils.image_preprocess import group_lines
+
+# Строки одного блока: зазор не больше высоты строки, высоты отличаются не более чем в 1.5 раза
+BLOCK_LINE_GAP = 1.0
+BLOCK_HEIGHT_RATIO = 1.5
+# Разрыв шире двух высот строки делит строку на части (колонки, ячейки таблицы)
+RUN_GAP = 2.0
+
+
+@dataclass
+class TextBlock:
+    """Consecutive lines of one paragraph or label; lines hold indices into the page's boxes"""
+    lines: List[List[int]]
+    text: str
+
+    @property
+    def boxes(self) -> List[int]:
+        return [index for line in self.lines for index in line]
+
+
+def _join_lines(lines: List[str]) -> str:
+    text = ""
+    for line in lines:
+        if text.endswith("-") and line[:1].islower():
+            # Перенос слова: "перево-" + "дчик" -> "переводчик"
+            text = text[:-1] + line
+        else:
+            text = f"{text} {line}" if text else line
+    return text
+
+
+def _runs(line: List[BoundingBox]) -> List[List[BoundingBox]]:
+    """A line split where the horizontal gap is wider than RUN_GAP line heights (columns, table cells)"""
+    runs = [[line[0]]]
+    for box in line[1:]:
+        last = runs[-1][-1]
+        if box.x - (last.x + last.width) > RUN_GAP * max(box.height, last.height):
+            runs.append([box])
+        else:
+            runs[-1].append(box)
+    return runs
+
+
+def group_blocks(boxes: List[dict]) -> List[TextBlock]:
+    """
+    Group a page's OCR boxes (BoundingBox.to_dict() dicts) into text blocks
+
+    Lines are formed as for reading order and split at wide gaps; a piece of
+    line joins the block whose last line is right above it, overlaps it
+    horizontally and has a similar text height. Blocks are ordered by their
+    first line.
+    """
+    items = [BoundingBox(**{key: box[key] for key in ("x", "y", "width", "height", "text", "confidence")}) for box in boxes]
+    position = {id(box): i for i, box in enumerate(items)}
+
+    blocks: List[TextBlock] = []
+    # Геометрия последней строки каждого блока: (left, right, bottom, height)
+    tails: List[Tuple[float, float, float, float]] = []
+    for line in group_lines([box for box in items if box.text.strip()]):
+        for run in _runs(line):
+            left, right = min(box.x for box in run), max(box.x + box.width for box in run)
+            top, bottom = min(box.y for box in run), max(box.y + box.height for box in run)
+            height = bottom - top
+            indices = [position[id(box)] for box in run]
+            for k in range(len(blocks) - 1, -1, -1):
+                t_left, t_right, t_bottom, t_height = tails[k]
+                if (
+                    -t_height / 2 < top - t_bottom <= BLOCK_LINE_GAP * max(height, t_height)
+                    and left < t_right and t_left < right
+                    and max(height, t_height) <= BLOCK_HEIGHT_RATIO * max(1.0, min(height, t_height))
+                ):
+                    blocks[k].lines.append(indices)
+                    tails[k] = (left, right, bottom, height)
+                    break
+            else:
+                blocks.append(TextBlock([indices], ""))
+                tails.append((left, right, bottom, height))
+
+    for block in blocks:
+        block.text = _join_lines([" ".join(items[i].text.strip() for i in line) for line in block.lines])
+    return blocks
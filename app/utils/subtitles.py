@@ -0,0 +1,155 @@
+import math
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional
+from app.utils.text_utils import spread_translation
+
+# Ограничения по стандартам субтитров: 2 строки по 42 символа, не больше 17 символов в секунду
+MAX_LINE_CHARS = 42
+MAX_LINES = 2
+MAX_CHARS_PER_SECOND = 17.0
+MIN_CUE_SECONDS = 1.0
+MAX_CUE_SECONDS = 7.0
+# Минимальный зазор между титрами, чтобы плеер успевал сменить кадр
+MIN_GAP_SECONDS = 0.08
+_BREAK_AFTER = (",", ".", ";", ":", "!", "?", "…", "—")
+_SENTENCE_END = (".", "!", "?", "…")
+# Насколько слов граница сегмента может сдвинуться к концу предложения в переводе
+SNAP_WORDS = 3
+
+
+@dataclass
+class Cue:
+    start: float
+    end: float
+    text: str
+
+
+def translate_timed(segments: List[dict], translation: str) -> List[dict]:
+    """
+    Spread the translation of consecutive segments back over them
+
+    Returns:
+        [{"start", "end", "text"}] with each segment's share of the translation
+    """
+    weights = [max(1, len(seg["text"].strip())) for seg in segments]
+    words = translation.split()
+    # Границы частей в словах: после пропорционального деления сдвигаем их к концу
+    # предложения в переводе, если сегмент-источник тоже кончается предложением
+    bounds, position = [], 0
+    for part in spread_translation(translation, weights)[:-1]:
+        position += len(part.split())
+        bounds.append(position)
+    for k, bound in enumerate(bounds):
+        if not segments[k]["text"].rstrip().endswith(_SENTENCE_END):
+            continue
+        low = bounds[k - 1] if k else 0
+        high = bounds[k + 1] if k + 1 < len(bounds) else len(words)
+        candidates = [
+            j for j in range(max(low + 1, bound - SNAP_WORDS), min(high, bound + SNAP_WORDS) + 1)
+            if j and words[j - 1].endswith(_SENTENCE_END)
+        ]
+        if candidates:
+            bounds[k] = min(candidates, key=lambda j: abs(j - bound))
+
+    edges = [0] + bounds + [len(words)]
+    return [
+        {"start": seg["start"], "end": seg["end"], "text": " ".join(words[edges[i]:edges[i + 1]])}
+        for i, seg in enumerate(segments)
+    ]
+
+
+def break_lines(text: str, max_chars: int = MAX_LINE_CHARS) -> str:
+    """One line if it fits, else two balanced lines, preferring a break after punctuation"""
+    text = " ".join(text.split())
+    if len(text) <= max_chars:
+        return text
+    words = text.split(" ")
+    best, best_score = None, math.inf
+    for i in range(1, len(words)):
+        first, second = " ".join(words[:i]), " ".join(words[i:])
+        score = abs(len(first) - len(second)) - (10 if first.endswith(_BREAK_AFTER) else 0)
+        if max(len(first), len(second)) > max_chars:
+            score += 1000
+        if score < best_score:
+            best, best_score = f"{first}\n{second}", score
+    return best or text
+
+
+def split_cues(start: float, end: float, text: str, max_chars: int = MAX_LINE_CHARS) -> List[Cue]:
+    """A segment as one or more cues within the line and duration limits; time is split by text length"""
+    words = text.split()
+    if not words:
+        return []
+    length = len(" ".join(words))
+    parts = max(1, math.ceil(length / (max_chars * MAX_LINES)), math.ceil((end - start) / MAX_CUE_SECONDS))
+    parts = min(parts, len(words))
+    pieces = [part for part in spread_translation(" ".join(words), [1.0] * parts) if part]
+
+    cues = []
+    position = start
+    for piece in pieces:
+        duration = (end - start) * (len(piece) + 1) / (length + 1)
+        cues.append(Cue(position, position + duration, break_lines(piece, max_chars)))
+        position += duration
+    cues[-1].end = end
+    return cues
+
+
+def _timestamp(seconds: float, separator: str) -> str:
+    millis = max(0, int(round(seconds * 1000)))
+    hours, millis = divmod(millis, 3_600_000)
+    minutes, millis = divmod(millis, 60_000)
+    secs, millis = divmod(millis, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}{separator}{millis:03d}"
+
+
+class SubtitleWriter:
+    """
+    Incremental SRT + WebVTT writer
+
+    Cues are appended and flushed as segments are added, so the files can be
+    served while the job runs. The last cue is held back until the next one
+    arrives: its end may be stretched for reading speed, but never into it.
+    """
+
+    def __init__(self, base_path: Path, max_chars: int = MAX_LINE_CHARS, max_cps: float = MAX_CHARS_PER_SECOND):
+        self.srt_path = Path(base_path).with_suffix(".srt")
+        self.vtt_path = Path(base_path).with_suffix(".vtt")
+        self.max_chars = max_chars
+        self.max_cps = max_cps
+        self.count = 0
+        self._pending: Optional[Cue] = None
+        self._srt = open(self.srt_path, "w", encoding="utf-8")
+        self._vtt = open(self.vtt_path, "w", encoding="utf-8")
+        self._vtt.write("WEBVTT\n\n")
+        self._vtt.flush()
+
+    def add(self, segments: List[dict]):
+        """Append translated segments ({"start", "end", "text"}, in time order)"""
+        for segment in segments:
+            for cue in split_cues(segment["start"], segment["end"], segment["text"], self.max_chars):
+                if self._pending is not None:
+                    self._write(self._pending, cue.start)
+                self._pending = cue
+        self._srt.flush()
+        self._vtt.flush()
+
+    def _write(self, cue: Cue, next_start: float):
+        # Быстрый титр растягиваем до нужной скорости чтения, но не заходя на следующий
+        needed = max(MIN_CUE_SECONDS, len(cue.text.replace("\n", "")) / self.max_cps)
+        end = max(cue.end, cue.start + needed)
+        end = max(cue.start + 0.1, min(end, next_start - MIN_GAP_SECONDS))
+        self.count += 1
+        # Каждый титр — одной записью, чтобы читатель растущего файла не увидел половину
+        self._srt.write(f"{self.count}\n{_timestamp(cue.start, ',')} --> {_timestamp(end, ',')}\n{cue.text}\n\n")
+        self._vtt.write(f"{_timestamp(cue.start, '.')} --> {_timestamp(end, '.')}\n{cue.text}\n\n")
+
+    def close(self):
+        if self._srt.closed:
+            return
+        if self._pending is not None:
+            self._write(self._pending, math.inf)
+            self._pending = None
+        self._srt.close()
+        self._vtt.close()
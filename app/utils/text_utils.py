@@ -0,0 +1,127 @@
+import re
+from typing import List, Tuple
+
+# Граница предложения: знак конца предложения + пробелы, либо перевод строки.
+# Подходит для русского, казахского и английского текста
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?…])\s+|\s*\n+\s*")
+_NON_WORD = re.compile(r"[^\w\s]", re.UNICODE)
+_SPACES = re.compile(r"\s+")
+# Двойные кавычки и запятые не меняют смысл предложения — их различия память переводов прощает.
+# Одинарные не трогаем: это и апостроф ("it's" и "its" — разные предложения)
+_QUOTES = re.compile(r"[\"«»“”„]")
+# Запятая перед цифрой — десятичная ("1,5"), её сохраняем
+_SOFT_COMMA = re.compile(r",(?!\d)")
+_CYRILLIC = re.compile(r"[а-яёәғқңөұүһі]", re.IGNORECASE)
+_LATIN = re.compile(r"[a-z]", re.IGNORECASE)
+# Буквы, которых нет в русском алфавите
+_KAZAKH = re.compile(r"[әғқңөұүһі]", re.IGNORECASE)
+# Внутри слишком длинного предложения режем после запятой, точки с запятой, двоеточия или тире
+_CLAUSE_BOUNDARY = re.compile(r"(?<=[,;:—–])\s+")
+
+def segment_text(text: str) -> List[Tuple[str, str]]:
+    """
+    Split text into sentences, keeping the separator that follows each one
+
+    Returns:
+        List of (sentence, separator); "".join(s + sep) reproduces the text
+        up to leading whitespace
+    """
+    pieces: List[Tuple[str, str]] = []
+    pos = 0
+    for match in _SENTENCE_BOUNDARY.finditer(text):
+        sentence = text[pos:match.start()]
+        if sentence.strip():
+            pieces.append((sentence.strip(), match.group()))
+        elif pieces:
+            pieces[-1] = (pieces[-1][0], pieces[-1][1] + sentence + match.group())
+        pos = match.end()
+    tail = text[pos:]
+    if tail.strip():
+        pieces.append((tail.strip(), ""))
+    return pieces
+
+def split_sentences(text: str) -> List[str]:
+    return [sentence for sentence, _ in segment_text(text)]
+
+def _split_long(sentence: str, max_chars: int) -> List[str]:
+    """Clause boundaries first, then plain word boundaries"""
+    pieces = []
+    for clause in _CLAUSE_BOUNDARY.split(sentence):
+        while len(clause) > max_chars:
+            cut = clause.rfind(" ", 0, max_chars + 1)
+            cut = cut if cut > 0 else max_chars
+            pieces.append(clause[:cut].strip())
+            clause = clause[cut:].strip()
+        if clause:
+            pieces.append(clause)
+    return pieces
+
+def chunk_sentences(text: str, max_chars: int) -> List[str]:
+    """
+    Pack whole sentences into chunks of at most max_chars characters
+
+    Sentences longer than max_chars are split at clause, then word,
+    boundaries. Works for Russian, Kazakh and English punctuation.
+    """
+    chunks: List[str] = []
+    current = ""
+    for sentence in split_sentences(text):
+        for piece in _split_long(sentence, max_chars) if len(sentence) > max_chars else [sentence]:
+            if current and len(current) + 1 + len(piece) > max_chars:
+                chunks.append(current)
+                current = piece
+            else:
+                current = f"{current} {piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+def spread_translation(translation: str, weights: List[float]) -> List[str]:
+    """
+    Split one translation over the source pieces it came from (OCR boxes,
+    ASR segments) in proportion to their weights, usually source lengths
+
+    Words are kept whole and in order; a piece may get an empty string when
+    the translation is much shorter than the source.
+    """
+    if len(weights) <= 1:
+        return [translation.strip()] * len(weights)
+    words = translation.split()
+    total_weight = sum(weights)
+    total_chars = sum(len(word) + 1 for word in words) or 1
+    parts: List[List[str]] = [[] for _ in weights]
+    k, weight_so_far, chars_so_far = 0, weights[0], 0
+    for word in words:
+        # Слово уходит в ту часть, на чью долю исходного текста приходится его середина
+        middle = (chars_so_far + (len(word) + 1) / 2) / total_chars
+        while k < len(weights) - 1 and middle > weight_so_far / total_weight:
+            k += 1
+            weight_so_far += weights[k]
+        parts[k].append(word)
+        chars_so_far += len(word) + 1
+    return [" ".join(part) for part in parts]
+
+def normalize_segment(text: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace"""
+    text = _NON_WORD.sub(" ", text.lower())
+    return _SPACES.sub(" ", text).strip()
+
+def exact_segment(text: str) -> str:
+    """Collapse whitespace only: case and punctuation are kept"""
+    return _SPACES.sub(" ", text).strip()
+
+def variant_segment(text: str) -> str:
+    """Lowercase, drop double quotes and commas, collapse whitespace; other punctuation, signs and numbers are kept"""
+    return _SPACES.sub(" ", _SOFT_COMMA.sub(" ", _QUOTES.sub("", text.lower()))).strip()
+
+def detect_language(text: str, default: str = "en") -> str:
+    """
+    Guess ru, kk or en from the script
+
+    Cyrillic with Kazakh-only letters is Kazakh, other Cyrillic is Russian,
+    Latin is English; text with neither falls back to default.
+    """
+    cyrillic, latin = len(_CYRILLIC.findall(text)), len(_LATIN.findall(text))
+    if cyrillic > latin:
+        return "kk" if _KAZAKH.search(text) else "ru"
+    return "en" if latin else default
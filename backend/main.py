@@ -1,11 +1,13 @@
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException, BackgroundTasks
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Request, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 import os
 import uuid
 import asyncio
+import json
 from pathlib import Path
 from datetime import datetime
+from typing import Optional
 import logging
 
 # ──────────────────────────────────────────────────────────────
@@ -17,8 +19,12 @@ logger = logging.getLogger("ai-translate")
 # ──────────────────────────────────────────────────────────────
 # Импорты твоих сервисов
 # ──────────────────────────────────────────────────────────────
+from ai_translate_shared.metrics import metrics, stage
 from services.job_manager import JobManager
 from services.media_processor import MediaProcessor
+from services.file_utils import save_upload_stream, FileTooLargeError, MAX_FILE_SIZE
+from services.job_queue import JobQueue, QueueFullError
+from services import inference_pool, translator
 
 app = FastAPI(
     title="AI-Translate API",
@@ -35,18 +41,35 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def reject_oversized_uploads(request: Request, call_next):
+    """413 сразу по Content-Length — не ждём, пока тело запроса будет прочитано"""
+    content_length = request.headers.get("content-length")
+    if request.url.path == "/api/upload" and content_length and content_length.isdigit():
+        if int(content_length) > MAX_FILE_SIZE * 1024 * 1024 + 64 * 1024:
+            return JSONResponse(status_code=413, content={"detail": "Файл слишком большой"})
+    return await call_next(request)
+
+
 # Директория для загрузок
 UPLOAD_DIR = Path("uploads")
 UPLOAD_DIR.mkdir(exist_ok=True)
 
+# Keep-alive комментарии в SSE, чтобы прокси не закрывали простаивающий поток
+SSE_HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+
 # Инициализация сервисов
 job_manager = JobManager()
-media_processor = MediaProcessor()
+media_processor = MediaProcessor(job_manager)
 
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "timestamp": datetime.now().isoformat()}
+    return {
+        "status": "healthy",
+        "timestamp": datetime.now().isoformat(),
+        "queue_depth": job_queue.depth
+    }
 
 
 # ──────────────────────────────────────────────────────────────
@@ -56,24 +79,30 @@ async def health_check():
 async def upload_file(
     file: UploadFile = File(...),
     target_language: str = Form(...),
-    background_tasks: BackgroundTasks  # ← Это важно!
 ):
     try:
         if not file or not file.filename:
             raise HTTPException(status_code=400, detail="Файл не загружен")
 
+        if job_queue.depth >= job_queue.max_depth:
+            raise HTTPException(status_code=503, detail="Очередь заполнена, повторите позже", headers={"Retry-After": "30"})
+
         job_id = str(uuid.uuid4())
         job_dir = UPLOAD_DIR / job_id
         job_dir.mkdir(parents=True, exist_ok=True)
 
-        file_path = job_dir / file.filename
+        file_path = job_dir / Path(file.filename).name
 
-        # Сохраняем файл
-        contents = await file.read()
-        with open(file_path, "wb") as f:
-            f.write(contents)
+        # Сохраняем файл блоками — в памяти никогда не лежит больше одного блока
+        try:
+            with stage("upload", unit="bytes") as upload_timing:
+                _, file_hash, file_size = await save_upload_stream(file, file_path)
+                upload_timing["size"] = file_size
+        except FileTooLargeError:
+            job_dir.rmdir()
+            raise HTTPException(status_code=413, detail="Файл слишком большой")
 
-        logger.info(f"Файл сохранён: {file_path}")
+        logger.info(f"Файл сохранён: {file_path} ({file_size} байт, sha256={file_hash[:12]})")
 
         # Создаём задачу
         job_manager.create_job(
@@ -82,21 +111,24 @@ async def upload_file(
             target_language=target_language,
             original_filename=file.filename
         )
+        job_manager.update_job(job_id, file_hash=file_hash, file_size=file_size, timings={"upload": upload_timing})
 
-        # Запускаем обработку в фоне через BackgroundTasks (надёжнее, чем asyncio.create_task)
-        background_tasks.add_task(
-            safe_process_job,
-            job_id,
-            str(file_path),
-            target_language
-        )
+        # Ставим в очередь: число одновременных обработок ограничено QUEUE_WORKERS
+        try:
+            job_queue.submit(job_id, str(file_path), target_language)
+        except QueueFullError:
+            job_manager.set_failed(job_id, "Очередь заполнена")
+            raise HTTPException(status_code=503, detail="Очередь заполнена, повторите позже", headers={"Retry-After": "30"})
 
         return {
             "job_id": job_id,
             "status": "queued",
+            "queue_position": job_queue.depth,
             "message": "Файл принят в обработку"
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Ошибка при загрузке: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -123,9 +155,32 @@ async def safe_process_job(job_id: str, file_path: str, target_lang: str):
         job_manager.set_failed(job_id, error_msg)
 
 
+job_queue = JobQueue(job_manager, safe_process_job)
+metrics.gauge("job_queue_depth", "Jobs waiting for a queue worker", lambda: job_queue.depth)
+
+
+@app.on_event("startup")
+async def start_job_queue():
+    await job_queue.start()
+
+
+@app.on_event("shutdown")
+async def stop_job_queue():
+    await job_queue.stop()
+    inference_pool.shutdown()
+    job_manager.close()
+    await translator.close_client()
+
+
 # ──────────────────────────────────────────────────────────────
 # Остальные эндпоинты
 # ──────────────────────────────────────────────────────────────
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Гистограммы этапов, ожидания в очереди и вызовов пула в формате Prometheus"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/api/result/{job_id}")
 async def get_result(job_id: str):
     job = job_manager.get_job(job_id)
@@ -134,9 +189,52 @@ async def get_result(job_id: str):
     return job
 
 
+@app.get("/api/jobs/{job_id}/events")
+async def job_events(job_id: str, request: Request):
+    """SSE-поток задачи: snapshot, затем status / progress / partial до завершения"""
+    if not job_manager.get_job(job_id):
+        raise HTTPException(status_code=404, detail="Задача не найдена")
+
+    def sse(event: str, data: dict) -> str:
+        return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+    async def stream():
+        finished = ("completed", "failed")
+        with job_manager.events.subscribe(job_id) as events:
+            job = job_manager.get_job(job_id)
+            yield sse("snapshot", job)
+            if job["status"] in finished:
+                return
+            while not await request.is_disconnected():
+                try:
+                    event, data = await asyncio.wait_for(events.get(), SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                yield sse(event, data)
+                if event == "status" and data["status"] in finished:
+                    return
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @app.get("/api/jobs")
-async def list_jobs():
-    return {"jobs": job_manager.list_jobs()}
+async def list_jobs(
+    status: Optional[str] = None,
+    since: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None
+):
+    """Задачи от новых к старым; следующая страница — по next_cursor"""
+    try:
+        jobs, next_cursor = job_manager.list_jobs(status=status, since=since, limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"jobs": jobs, "next_cursor": next_cursor}
 
 
 @app.delete("/api/jobs/{job_id}")
@@ -0,0 +1,52 @@
+import subprocess
+from typing import Optional
+
+# faster-whisper ждёт моно float32 с частотой 16 кГц
+SAMPLE_RATE = 16000
+VIDEO_EXTENSIONS = ('.mp4', '.mov', '.avi', '.mkv')
+
+
+class AudioDecodeError(RuntimeError):
+    """ffmpeg exited with an error or produced no audio"""
+
+
+def decode_audio(
+    file_path: str,
+    sample_rate: int = SAMPLE_RATE,
+    start: Optional[float] = None,
+    duration: Optional[float] = None,
+):
+    """
+    Decode any ffmpeg-readable media to a mono float32 NumPy array
+
+    PCM is read from ffmpeg's stdout, so nothing is written to disk. start and
+    duration (seconds) select a slice without decoding the rest of the file.
+
+    Raises:
+        AudioDecodeError: with the tail of ffmpeg's stderr on failure
+    """
+    import numpy as np
+
+    cmd = ['ffmpeg', '-nostdin', '-hide_banner', '-loglevel', 'error']
+    if start is not None:
+        # -ss до -i — быстрый поиск по контейнеру, а не декодирование с начала
+        cmd += ['-ss', f'{start:.3f}']
+    cmd += ['-i', str(file_path)]
+    if duration is not None:
+        cmd += ['-t', f'{duration:.3f}']
+    cmd += ['-vn', '-ac', '1', '-ar', str(sample_rate), '-f', 's16le', '-acodec', 'pcm_s16le', 'pipe:1']
+
+    try:
+        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    except FileNotFoundError as e:
+        raise AudioDecodeError("ffmpeg is not installed") from e
+
+    if result.returncode != 0:
+        stderr = result.stderr.decode('utf-8', errors='replace').strip()
+        raise AudioDecodeError(f"ffmpeg failed ({result.returncode}) for {file_path}: {stderr[-500:]}")
+    if not result.stdout:
+        raise AudioDecodeError(f"No audio stream in {file_path}")
+
+    audio = np.frombuffer(result.stdout, dtype=np.int16).astype(np.float32)
+    audio /= 32768.0
+    return audio
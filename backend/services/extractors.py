@@ -1,12 +1,9 @@
 import asyncio
 from pathlib import Path
-import subprocess
 from openai import OpenAI
-from faster_whisper import WhisperModel
-import pytesseract
-from PIL import Image
 import os
 from dotenv import load_dotenv
+from .inference_pool import run_in_pool, transcribe, ocr_image, list_document_pages, ocr_pages, INFERENCE_WORKERS
 
 load_dotenv()
 
@@ -15,8 +12,11 @@ OPENAI_MODEL = os.getenv("OPENAI_MODEL", "whisper-1")
 
 client = OpenAI(api_key=OPENAI_API_KEY)
 
-# faster-whisper модель (быстрее и локальная)
-faster_model = WhisperModel("medium", device="cpu", compute_type="int8")
+# Пакетный OCR документов: страниц на вызов воркера и предел на задачу
+OCR_BATCH_SIZE = int(os.getenv("OCR_BATCH_SIZE", "8"))
+OCR_MAX_PAGES = int(os.getenv("OCR_MAX_PAGES", "200"))
+
+# faster-whisper (medium) и tesseract работают в пуле процессов — см. inference_pool.py
 
 # Если tesseract не стоит — установить:
 # sudo apt install tesseract-ocr
@@ -28,17 +28,17 @@ async def extract_text_from_media(file_path: str) -> str:
     file_path = Path(file_path)
     ext = file_path.suffix.lower()
 
-    try:
-        if ext in [".mp3", ".wav", ".m4a", ".flac"]:
-            return await extract_from_audio(file_path)
-        elif ext in [".mp4", ".avi", ".mov", ".mkv"]:
-            return await extract_from_video(file_path)
-        elif ext in [".jpg", ".jpeg", ".png", ".gif"]:
-            return await extract_from_image(file_path)
-        else:
-            return "Unsupported file format."
-    except Exception as e:
-        return f"Error extracting text: {e}"
+    # Ошибки (в том числе ffmpeg) не превращаем в текст — задача должна уйти в failed
+    if ext in [".mp3", ".wav", ".m4a", ".flac"]:
+        return await extract_from_audio(file_path)
+    elif ext in [".mp4", ".avi", ".mov", ".mkv"]:
+        return await extract_from_video(file_path)
+    elif ext in [".jpg", ".jpeg", ".png", ".gif"]:
+        return await extract_from_image(file_path)
+    elif ext in [".zip", ".pdf", ".tif", ".tiff"]:
+        return await extract_from_document(file_path)
+    else:
+        return "Unsupported file format."
 
 
 async def extract_from_audio(file_path: Path) -> str:
@@ -50,14 +50,17 @@ async def extract_from_audio(file_path: Path) -> str:
 
     print("➡ Using Faster-Whisper...")
 
-    segments, info = faster_model.transcribe(str(file_path), beam_size=5)
-    text = " ".join([seg.text for seg in segments])
+    text = await run_in_pool(transcribe, str(file_path))
 
     if text.strip():
         return text
 
     print("➡ Using OpenAI Whisper (fallback)...")
 
+    return await asyncio.to_thread(_transcribe_openai, file_path)
+
+
+def _transcribe_openai(file_path: Path) -> str:
     with open(file_path, "rb") as f:
         response = client.audio.transcriptions.create(
             model=OPENAI_MODEL,
@@ -69,24 +72,35 @@ async def extract_from_audio(file_path: Path) -> str:
 
 async def extract_from_video(file_path: Path) -> str:
     """
-    Видео → аудио → текст
-    """
-    audio_path = file_path.with_suffix(".wav")
-
-    # Выделяем аудио из видео
-    cmd = ["ffmpeg", "-y", "-i", str(file_path), "-vn", "-acodec", "pcm_s16le", str(audio_path)]
-    subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    Видео → текст
 
-    return await extract_from_audio(audio_path)
+    Аудиодорожку декодирует ffmpeg прямо в память внутри воркера (см. audio_utils.py),
+    промежуточный .wav не создаётся. Ошибка ffmpeg (ненулевой код выхода) пробрасывается.
+    """
+    return await extract_from_audio(file_path)
 
 
 async def extract_from_image(file_path: Path) -> str:
     """
     OCR через tesseract
     """
-    img = Image.open(file_path)
-    text = pytesseract.image_to_string(img, lang="eng+rus")
-    return text.strip()
+    return await run_in_pool(ocr_image, str(file_path))
+
+
+async def extract_from_document(file_path: Path) -> str:
+    """
+    Zip с картинками, многостраничный TIFF или PDF → текст по страницам
+
+    Страницы делятся на пачки по воркерам пула: декодирование, растеризация
+    и tesseract идут на всех ядрах сразу. Страницы разделяются пустой строкой.
+    """
+    pages = await run_in_pool(list_document_pages, str(file_path), OCR_MAX_PAGES)
+    if not pages:
+        return ""
+    size = max(1, min(OCR_BATCH_SIZE, -(-len(pages) // INFERENCE_WORKERS)))
+    batches = [pages[i:i + size] for i in range(0, len(pages), size)]
+    results = await asyncio.gather(*(run_in_pool(ocr_pages, str(file_path), batch) for batch in batches))
+    return "\n\n".join(text for batch in results for text in batch if text)
 
 
 if __name__ == "__main__":
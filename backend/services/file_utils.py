@@ -0,0 +1,29 @@
+import hashlib
+from pathlib import Path
+from typing import Tuple
+
+MAX_FILE_SIZE = 500  # MB
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+class FileTooLargeError(Exception):
+    """Upload crossed MAX_FILE_SIZE"""
+
+
+async def save_upload_stream(upload, file_path: Path, max_mb: int = MAX_FILE_SIZE) -> Tuple[Path, str, int]:
+    """Stream an UploadFile to disk in fixed-size chunks and return (path, sha256, size)"""
+    limit = max_mb * 1024 * 1024
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(file_path, "wb") as f:
+            while chunk := await upload.read(UPLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if size > limit:
+                    raise FileTooLargeError(f"Файл больше {max_mb} МБ")
+                digest.update(chunk)
+                f.write(chunk)
+    except BaseException:
+        file_path.unlink(missing_ok=True)
+        raise
+    return file_path, digest.hexdigest(), size
@@ -0,0 +1,99 @@
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from ai_translate_shared.metrics import observe_inference
+from .audio_utils import decode_audio, VIDEO_EXTENSIONS
+
+# Потоков на один процесс-воркер и число воркеров (по умолчанию — все ядра)
+INFERENCE_THREADS = int(os.getenv("INFERENCE_THREADS", "4"))
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", str(max(1, (os.cpu_count() or 1) // INFERENCE_THREADS))))
+WHISPER_MODEL = os.getenv("WHISPER_MODEL", "medium")
+
+# Модель faster-whisper внутри процесса-воркера — грузится один раз на процесс
+_whisper_model = None
+
+
+def _init_worker(threads: int):
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(threads)
+
+
+def _get_whisper():
+    global _whisper_model
+    if _whisper_model is None:
+        from faster_whisper import WhisperModel
+        _whisper_model = WhisperModel(WHISPER_MODEL, device="cpu", compute_type="int8", cpu_threads=INFERENCE_THREADS)
+    return _whisper_model
+
+
+def _measured(fn, *args):
+    """Результат fn и CPU, потраченный на него в воркере"""
+    started = time.process_time()
+    result = fn(*args)
+    return result, time.process_time() - started
+
+
+def transcribe(file_path: str) -> str:
+    # Видео декодируем ffmpeg через pipe в воркере — ни .wav на диске, ни пересылки массива между процессами
+    audio = decode_audio(file_path) if file_path.lower().endswith(VIDEO_EXTENSIONS) else file_path
+    segments, info = _get_whisper().transcribe(audio, beam_size=5)
+    return " ".join([seg.text for seg in segments])
+
+
+def ocr_image(file_path: str) -> str:
+    import pytesseract
+    from PIL import Image
+
+    with Image.open(file_path) as img:
+        return pytesseract.image_to_string(img, lang="eng+rus").strip()
+
+
+def list_document_pages(file_path: str, max_pages: int) -> list:
+    from ai_translate_shared.image_pages import list_pages
+    return list_pages(file_path, max_pages)
+
+
+def ocr_pages(file_path: str, pages: list) -> list:
+    """Декодируем свою часть страниц документа в воркере и распознаём их подряд"""
+    import pytesseract
+    from PIL import Image
+    from ai_translate_shared.image_pages import load_pages
+
+    return [
+        pytesseract.image_to_string(Image.fromarray(page), lang="eng+rus").strip()
+        for page in load_pages(file_path, pages)
+    ]
+
+
+_executor = None
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=INFERENCE_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(INFERENCE_THREADS,),
+        )
+    return _executor
+
+
+async def run_in_pool(fn, *args):
+    """Выполнить функцию в пуле процессов, не блокируя event loop"""
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+    result, cpu = await loop.run_in_executor(_get_executor(), partial(_measured, fn, *args))
+    observe_inference(fn.__name__, time.perf_counter() - started, cpu)
+    return result
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
@@ -1,16 +1,128 @@
+import base64
 import json
+import logging
+import os
+import sqlite3
+import threading
 from pathlib import Path
 from datetime import datetime
-from typing import Optional, Dict, List
+from typing import Optional, Dict, Iterable, List, Tuple, Union
+from ai_translate_shared.job_events import JobEventBroker
+
+logger = logging.getLogger("ai-translate")
+
+JOBS_DB_PATH = Path(os.getenv("JOBS_DB_PATH", "jobs.sqlite3"))
+# Обновления задач копятся в памяти и пишутся одной транзакцией раз в интервал
+JOBS_FLUSH_INTERVAL = float(os.getenv("JOBS_FLUSH_INTERVAL", "0.5"))
+
+FINISHED_STATUSES = ("completed", "failed")
+
+
+def _encode_cursor(created_at: str, job_id: str) -> str:
+    return base64.urlsafe_b64encode(f"{created_at}|{job_id}".encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> Tuple[str, str]:
+    try:
+        created_at, job_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError("Invalid cursor") from e
+    return created_at, job_id
+
 
 class JobManager:
-    """Manages job state and persistence"""
-    
-    def __init__(self):
-        self.jobs_dir = Path("jobs")
-        self.jobs_dir.mkdir(exist_ok=True)
-        self.jobs = {}
-        self._load_jobs()
+    """
+    Manages job state and persistence
+
+    Jobs live in SQLite (WAL) with status and created_at indexed. Unfinished
+    jobs are also kept in memory; their updates are written behind in
+    batched transactions, while creation is written immediately so that an
+    accepted job survives a restart.
+    """
+
+    def __init__(self, db_path: Path = JOBS_DB_PATH, flush_interval: float = JOBS_FLUSH_INTERVAL):
+        self.db_path = Path(db_path)
+        self.flush_interval = flush_interval
+        self.jobs: Dict[str, Dict] = {}  # незавершённые и ещё не записанные задачи
+        self.events = JobEventBroker()
+        self._dirty = set()
+        self._lock = threading.RLock()
+        self._conn = self._connect()
+        self._migrate_json(Path("jobs"))
+        self._load_active()
+
+        self._stop = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_loop, name="job-flusher", daemon=True)
+        self._flusher.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.db_path), check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL,
+                data TEXT NOT NULL
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_created ON jobs (created_at)")
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        return conn
+
+    def _migrate_json(self, jobs_dir: Path):
+        """
+        One-time import of the old jobs/{job_id}.json files
+
+        The directory is left as it is (it may be tracked or mounted read-only);
+        a marker in the database records that the import was done.
+        """
+        if not jobs_dir.is_dir():
+            return
+        with self._lock:
+            if self._conn.execute("SELECT 1 FROM meta WHERE key = 'json_migrated'").fetchone():
+                return
+        rows = []
+        for job_file in jobs_dir.glob("*.json"):
+            try:
+                with open(job_file) as f:
+                    rows.append(self._row(json.load(f)))
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"Пропускаем повреждённый файл задачи {job_file}: {e}")
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany("INSERT OR IGNORE INTO jobs VALUES (?, ?, ?, ?, ?)", rows)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta VALUES ('json_migrated', ?)", (datetime.now().isoformat(),)
+            )
+            self._conn.execute("COMMIT")
+        logger.info(f"Перенесено задач из {jobs_dir} в {self.db_path}: {len(rows)}")
+
+    def _load_active(self):
+        for job in self._query("SELECT data FROM jobs WHERE status IN ('queued', 'processing')"):
+            self.jobs[job["job_id"]] = job
+
+    @staticmethod
+    def _row(job: Dict) -> tuple:
+        now = datetime.now().isoformat()
+        return (
+            job["job_id"],
+            job.get("status", "queued"),
+            job.get("created_at") or now,
+            job.get("updated_at") or now,
+            json.dumps(job, ensure_ascii=False),
+        )
+
+    def _query(self, sql: str, params: tuple = ()) -> List[Dict]:
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [json.loads(data) for (data,) in rows]
 
     def create_job(self, job_id: str, file_path: str, target_language: str, original_filename: str):
         """Create a new job"""
@@ -26,45 +138,154 @@ class JobManager:
             "created_at": datetime.now().isoformat(),
             "updated_at": datetime.now().isoformat()
         }
-        self.jobs[job_id] = job
-        self._save_job(job_id, job)
+        with self._lock:
+            self.jobs[job_id] = job
+            self._conn.execute("INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, ?, ?)", self._row(job))
         return job
 
     def update_job(self, job_id: str, **updates):
         """Update job status and results"""
-        if job_id not in self.jobs:
-            return None
-        
-        self.jobs[job_id].update(updates)
-        self.jobs[job_id]["updated_at"] = datetime.now().isoformat()
-        self._save_job(job_id, self.jobs[job_id])
-        return self.jobs[job_id]
+        with self._lock:
+            job = self.get_job(job_id)
+            if job is None:
+                return None
+            job.update(updates)
+            job["updated_at"] = datetime.now().isoformat()
+            # Завершённая задача могла быть уже вытеснена из памяти — возвращаем до записи
+            self.jobs[job_id] = job
+            self._dirty.add(job_id)
+
+        if "status" in updates:
+            self.events.publish(job_id, "status", {"status": updates["status"], "error": job.get("error")})
+        if "progress" in updates:
+            self.events.publish(job_id, "progress", updates["progress"])
+        if updates.get("extracted_text"):
+            self.events.publish(job_id, "partial", {"extracted_text": updates["extracted_text"]})
+        return job
+
+    def record_timing(self, job_id: str, stage: str, record: dict):
+        """Добавить запись metrics.stage() в job["timings"]"""
+        with self._lock:
+            job = self.get_job(job_id)
+            if job is None:
+                return None
+            return self.update_job(job_id, timings={**job.get("timings", {}), stage: record})
+
+    def set_progress(self, job_id: str, stage: str, percent: float):
+        return self.update_job(job_id, progress={"stage": stage, "percent": percent})
+
+    def set_processing(self, job_id: str):
+        return self.update_job(job_id, status="processing")
+
+    def set_completed(self, job_id: str):
+        return self.update_job(job_id, status="completed")
+
+    def set_failed(self, job_id: str, error: str):
+        return self.update_job(job_id, status="failed", error=error)
 
     def get_job(self, job_id: str) -> Optional[Dict]:
         """Get job details"""
-        return self.jobs.get(job_id)
+        with self._lock:
+            if job_id in self.jobs:
+                return self.jobs[job_id]
+            found = self._query("SELECT data FROM jobs WHERE job_id = ?", (job_id,))
+        return found[0] if found else None
 
-    def list_jobs(self) -> List[Dict]:
-        """List all jobs"""
-        return list(self.jobs.values())
+    def list_jobs(
+        self,
+        status: Optional[Union[str, Iterable[str]]] = None,
+        since: Optional[Union[str, datetime]] = None,
+        limit: Optional[int] = 50,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[Dict], Optional[str]]:
+        """
+        List jobs, newest first, with keyset pagination
+
+        Args:
+            status: One status or several
+            since: Only jobs created at or after this moment
+            limit: Page size; None returns every matching job
+            cursor: next_cursor from the previous page
+
+        Returns:
+            Tuple of (jobs, next_cursor); next_cursor is None on the last page
+        """
+        self.flush()
+
+        where, params = [], []
+        if status:
+            statuses = [status] if isinstance(status, str) else list(status)
+            where.append(f"status IN ({', '.join('?' * len(statuses))})")
+            params.extend(statuses)
+        if since:
+            where.append("created_at >= ?")
+            params.append(since.isoformat() if isinstance(since, datetime) else since)
+        if cursor:
+            created_at, job_id = _decode_cursor(cursor)
+            where.append("(created_at, job_id) < (?, ?)")
+            params.extend([created_at, job_id])
+
+        sql = "SELECT data FROM jobs"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY created_at DESC, job_id DESC"
+        if limit is not None:
+            # Лишняя строка показывает, есть ли следующая страница
+            sql += " LIMIT ?"
+            params.append(limit + 1)
+
+        jobs = self._query(sql, tuple(params))
+        next_cursor = None
+        if limit is not None and len(jobs) > limit:
+            jobs = jobs[:limit]
+            next_cursor = _encode_cursor(jobs[-1]["created_at"], jobs[-1]["job_id"])
+        return jobs, next_cursor
 
     def delete_job(self, job_id: str):
         """Delete a job"""
-        if job_id in self.jobs:
-            del self.jobs[job_id]
-            job_file = self.jobs_dir / f"{job_id}.json"
-            if job_file.exists():
-                job_file.unlink()
-
-    def _save_job(self, job_id: str, job: Dict):
-        """Persist job to disk"""
-        job_file = self.jobs_dir / f"{job_id}.json"
-        with open(job_file, "w") as f:
-            json.dump(job, f)
-
-    def _load_jobs(self):
-        """Load jobs from disk"""
-        for job_file in self.jobs_dir.glob("*.json"):
-            with open(job_file) as f:
-                job = json.load(f)
-                self.jobs[job["job_id"]] = job
+        with self._lock:
+            self.jobs.pop(job_id, None)
+            self._dirty.discard(job_id)
+            self._conn.execute("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+
+    def flush(self):
+        """Write pending updates in one transaction"""
+        with self._lock:
+            if not self._dirty:
+                return
+            rows = []
+            for job_id in list(self._dirty):
+                if job_id not in self.jobs:
+                    continue
+                try:
+                    rows.append(self._row(self.jobs[job_id]))
+                except (TypeError, ValueError) as e:
+                    # Одна несериализуемая задача не должна блокировать запись остальных
+                    logger.error(f"Задача {job_id} не сериализуется, пропускаем запись: {e}")
+                    self._dirty.discard(job_id)
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany("INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, ?, ?)", rows)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            # Завершённые задачи больше не держим в памяти — они читаются из базы
+            for job_id in self._dirty:
+                if self.jobs.get(job_id, {}).get("status") in FINISHED_STATUSES:
+                    del self.jobs[job_id]
+            self._dirty.clear()
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception:
+                # Поток записи не должен умирать ни от какой ошибки: задачи останутся в _dirty до следующей попытки
+                logger.exception("Не удалось записать задачи")
+
+    def close(self):
+        self._stop.set()
+        self._flusher.join(timeout=5)
+        self.flush()
+        self._conn.close()
@@ -0,0 +1,101 @@
+import asyncio
+import itertools
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, List, Optional
+from ai_translate_shared.metrics import QUEUE_WAIT_SECONDS
+
+logger = logging.getLogger("ai-translate")
+
+QUEUE_WORKERS = int(os.getenv("QUEUE_WORKERS", "2"))
+QUEUE_MAX_DEPTH = int(os.getenv("QUEUE_MAX_DEPTH", "100"))
+
+# Приоритет по расширению: текст раньше картинок, картинки раньше аудио и видео
+EXTENSION_PRIORITY = {
+    ".txt": 0,
+    ".jpg": 1, ".jpeg": 1, ".png": 1, ".gif": 1,
+    ".zip": 2, ".pdf": 2, ".tif": 2, ".tiff": 2,
+    ".mp3": 2, ".wav": 2, ".m4a": 2, ".flac": 2,
+    ".mp4": 3, ".avi": 3, ".mov": 3, ".mkv": 3,
+}
+DEFAULT_PRIORITY = 2
+
+
+class QueueFullError(Exception):
+    """В очереди уже QUEUE_MAX_DEPTH ожидающих задач"""
+
+
+def job_priority(file_path: str) -> int:
+    return EXTENSION_PRIORITY.get(Path(file_path).suffix.lower(), DEFAULT_PRIORITY)
+
+
+class JobQueue:
+    """
+    Bounded priority queue with a fixed number of workers.
+
+    Persistence comes from JobManager: a job stays "queued" in the jobs table until a worker
+    takes it, so restore() re-enqueues everything left unfinished by a restart.
+    """
+
+    def __init__(
+        self,
+        job_manager,
+        handler: Callable[[str, str, str], Awaitable[None]],
+        workers: int = QUEUE_WORKERS,
+        max_depth: int = QUEUE_MAX_DEPTH
+    ):
+        self.job_manager = job_manager
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.max_depth = max_depth
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._seq = itertools.count()
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    async def start(self):
+        self._queue = asyncio.PriorityQueue()
+        restored = 0
+        unfinished, _ = self.job_manager.list_jobs(status=("queued", "processing"), limit=None)
+        # list_jobs отдаёт новые первыми, а восстанавливать честнее в порядке поступления
+        for job in reversed(unfinished):
+            if not Path(job["file_path"]).exists():
+                self.job_manager.set_failed(job["job_id"], "Файл задачи не найден после перезапуска")
+                continue
+            self._put(job["job_id"], job["file_path"], job["target_language"])
+            restored += 1
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        logger.info(f"Очередь запущена: воркеров={self.workers}, восстановлено задач={restored}")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, job_id: str, file_path: str, target_language: str):
+        if self.depth >= self.max_depth:
+            raise QueueFullError(f"Очередь заполнена ({self.max_depth})")
+        self._put(job_id, file_path, target_language)
+
+    def _put(self, job_id: str, file_path: str, target_language: str):
+        self._queue.put_nowait((job_priority(file_path), next(self._seq), (job_id, file_path, target_language, time.monotonic())))
+
+    async def _worker(self, index: int):
+        while True:
+            _, _, (job_id, file_path, target_language, enqueued_at) = await self._queue.get()
+            # Для восстановленных после перезапуска задач ожидание считается с момента восстановления
+            wait = time.monotonic() - enqueued_at
+            QUEUE_WAIT_SECONDS.observe(wait)
+            self.job_manager.record_timing(job_id, "queue_wait", {"wall": round(wait, 4)})
+            try:
+                await self.handler(job_id, file_path, target_language)
+            except Exception as e:
+                logger.error(f"Воркер {index}: необработанная ошибка job_id={job_id}: {e}")
+            finally:
+                self._queue.task_done()
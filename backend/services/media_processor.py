@@ -1,32 +1,33 @@
 import asyncio
+import os
+from functools import partial
+from ai_translate_shared.metrics import stage
 from .job_manager import JobManager
 from .extractors import extract_text_from_media
 from .translator import translate_text
 
 class MediaProcessor:
-    def __init__(self):
-        self.job_manager = JobManager()
+    def __init__(self, job_manager: JobManager):
+        # Общий JobManager с main.py — иначе подписчики SSE не видят обновлений
+        self.job_manager = job_manager
+
+    def _timed(self, job_id: str, name: str, size=None, unit=None):
+        # Время этапа идёт и в гистограммы /metrics, и в job["timings"]
+        return stage(name, size, unit, on_done=partial(self.job_manager.record_timing, job_id, name))
 
     async def process(self, job_id: str, file_path: str, target_language: str):
-        try:
-            self.job_manager.update_job(job_id, status="processing")
+        # Статусы processing/completed/failed выставляет вызывающий (safe_process_job)
+        self.job_manager.set_progress(job_id, "extraction", 0)
 
-            # 1. Speech-to-text
+        # 1. Speech-to-text
+        with self._timed(job_id, "extraction", os.path.getsize(file_path), "bytes"):
             extracted_text = await extract_text_from_media(file_path)
-            self.job_manager.update_job(job_id, extracted_text=extracted_text)
+        self.job_manager.update_job(job_id, extracted_text=extracted_text)
+        self.job_manager.set_progress(job_id, "translation", 50)
 
-            # 2. Translation
+        # 2. Translation
+        with self._timed(job_id, "translation", len(extracted_text), "chars"):
             translated_text = await translate_text(extracted_text, target_language)
 
-            self.job_manager.update_job(
-                job_id,
-                status="completed",
-                translated_text=translated_text
-            )
-
-        except Exception as e:
-            self.job_manager.update_job(
-                job_id,
-                status="failed",
-                error=str(e)
-            )
+        self.job_manager.update_job(job_id, translated_text=translated_text)
+        self.job_manager.set_progress(job_id, "done", 100)
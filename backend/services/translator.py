@@ -1,20 +1,35 @@
-from openai import OpenAI
 import os
+import re
+from ai_translate_shared.openai_translate import OpenAITranslator
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# Свой экземпляр общего клиента: backend живёт отдельно от app/ и настраивается своими переменными.
+# OPENAI_MODEL здесь занят распознаванием (whisper-1), поэтому модель перевода — отдельная переменная
+translator = OpenAITranslator(
+    api_key=os.getenv("OPENAI_API_KEY"),
+    base_url=os.getenv("OPENAI_BASE_URL"),
+    model=os.getenv("OPENAI_TRANSLATION_MODEL", "gpt-4o-mini"),
+    concurrency=int(os.getenv("OPENAI_CONCURRENCY", "4")),
+    rpm=float(os.getenv("OPENAI_RPM", "500")),
+    tpm=float(os.getenv("OPENAI_TPM", "200000")),
+    max_retries=int(os.getenv("OPENAI_MAX_RETRIES", "5")),
+    chunk_tokens=int(os.getenv("OPENAI_CHUNK_TOKENS", "1500"))
+)
+
+# Разделители сохраняем (группа в скобках), чтобы собрать перевод с теми же переводами строк
+_SENTENCE_END = re.compile(r"((?<=[.!?…])\s+|\n+)")
 
-LANG_MAP = {
-    "ru": "Russian",
-    "en": "English",
-    "kk": "Kazakh"
-}
 
 async def translate_text(text: str, target_language: str) -> str:
-    lang = LANG_MAP.get(target_language, "English")
+    parts = _SENTENCE_END.split(text)
+    positions = [i for i in range(0, len(parts), 2) if parts[i].strip()]
+    if not positions:
+        return ""
+
+    translated = await translator.translate_segments([parts[i].strip() for i in positions], target_language)
+    for i, sentence in zip(positions, translated):
+        parts[i] = sentence
+    return "".join(parts).strip()
 
-    response = client.responses.create(
-        model="gpt-4o-mini",
-        input=f"Translate this text to {lang}:\n{text}"
-    )
 
-    return response.output_text
+async def close_client():
+    await translator.close()
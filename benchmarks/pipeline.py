@@ -0,0 +1,448 @@
+"""
+End-to-end benchmark of process_media on synthetic media
+
+    python -m benchmarks.pipeline --mode stub --output bench.json
+    python -m benchmarks.pipeline --mode real --audio-seconds 30,600 --compare bench.json
+
+In stub mode inference runs in-process on the deterministic mock services
+(MockTranslationService, MockImageToTextService, MockTextToSpeechService and
+a WAV-length-driven transcript), so the numbers measure the pipeline itself:
+queueing, caching, translation memory, file I/O. In real mode the local
+models run in the inference pool as they do in production.
+
+Every job gets its own synthetic input, so nothing is served from the result
+cache or the translation memory. Results are written as JSON; --compare
+prints the change in median latency against an earlier run, which is only
+meaningful on the same machine.
+"""
+import argparse
+import asyncio
+import contextvars
+import json
+import logging
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+import zipfile
+from collections import defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from benchmarks import synthetic
+
+logger = logging.getLogger("benchmarks.pipeline")
+
+STAGES = ("upload", "extraction", "translation", "tts", "total")
+# Методы пула, время которых относится к этапу
+POOL_STAGES = {
+    "transcribe": "extraction",
+    "transcribe_stream": "extraction",
+    "transcribe_shards": "extraction",
+    "plan_shards": "extraction",
+    "ocr": "extraction",
+    "ocr_document": "extraction",
+    "translate": "translation",
+    "translate_batch": "translation",
+}
+STUB_SEGMENT_SECONDS = synthetic.TONE_SECONDS + synthetic.SILENCE_SECONDS
+
+
+@dataclass
+class Sample:
+    kind: str
+    path: Path
+    # Размер входа в естественных единицах: секунды аудио, символы, пиксели
+    units: float
+    stages: Dict[str, float] = field(default_factory=lambda: defaultdict(float))
+
+
+_current: contextvars.ContextVar[Optional[Sample]] = contextvars.ContextVar("bench_sample", default=None)
+
+
+def _record(stage: str, seconds: float):
+    if (sample := _current.get()) is not None:
+        sample.stages[stage] += seconds
+
+
+def _wav_seconds(file_path: str) -> float:
+    with wave.open(str(file_path), "rb") as wav:
+        return wav.getnframes() / wav.getframerate()
+
+
+class StubInferencePool:
+    """Drop-in for InferencePool backed by the mock services, no worker processes"""
+
+    def __init__(self, workers: int):
+        from app.services.image_to_text import MockImageToTextService
+        from app.services.text_to_speech import MockTextToSpeechService
+        from app.services.translation import MockTranslationService
+
+        self.workers = workers
+        self.translator = MockTranslationService()
+        self.ocr_service = MockImageToTextService()
+        self.tts_service = MockTextToSpeechService()
+
+    @staticmethod
+    def _segments(file_path: str, start: float, end: float) -> List[dict]:
+        segments = []
+        position = start
+        while position < end:
+            stop = min(position + STUB_SEGMENT_SECONDS, end)
+            text = synthetic.random_text(80, seed=f"{file_path}:{position}")
+            segments.append({"start": position, "end": stop, "text": text})
+            position = stop
+        return segments
+
+    async def plan_shards(self, file_path: str, min_seconds: Optional[float] = None) -> List[Tuple[float, Optional[float]]]:
+        from app.config import TRANSCRIBE_SHARD_MIN_SECONDS
+
+        duration = _wav_seconds(file_path)
+        count = max(1, min(self.workers, int(duration // (min_seconds or TRANSCRIBE_SHARD_MIN_SECONDS))))
+        step = duration / count
+        return [(i * step, (i + 1) * step if i < count - 1 else None) for i in range(count)]
+
+    async def transcribe(self, file_path: str, beam_size: int = 5, vad_filter: bool = True):
+        segments = self._segments(file_path, 0.0, _wav_seconds(file_path))
+        return " ".join(seg["text"] for seg in segments), segments
+
+    async def transcribe_stream(self, file_path: str, beam_size: int = 5, vad_filter: bool = True, on_duration=None):
+        duration = _wav_seconds(file_path)
+        if on_duration:
+            on_duration(duration)
+        for segment in self._segments(file_path, 0.0, duration):
+            yield segment
+            await asyncio.sleep(0)
+
+    async def transcribe_shards(self, file_path: str, shards, beam_size: int = 5, vad_filter: bool = True,
+                                overlap: float = 0.0, on_progress=None):
+        duration = _wav_seconds(file_path)
+        segments: List[dict] = []
+        for done, (start, end) in enumerate(shards, 1):
+            segments.extend(self._segments(file_path, start, duration if end is None else end))
+            if on_progress:
+                on_progress(done, len(shards))
+        return " ".join(seg["text"] for seg in segments), segments
+
+    async def translate(self, text: str, target_lang: str) -> str:
+        return self.translator.translate(text, target_lang)
+
+    async def translate_batch(self, texts: List[str], target_lang: str) -> List[str]:
+        return self.translator.translate_batch(texts, target_lang)
+
+    async def ocr(self, file_path: str):
+        return self.ocr_service.extract_text(file_path)
+
+    async def ocr_document(self, file_path: str, on_progress=None, **kwargs) -> List[dict]:
+        from app.config import OCR_MAX_PAGES
+        from ai_translate_shared.image_pages import list_pages
+
+        pages = []
+        for name, index in list_pages(file_path, OCR_MAX_PAGES):
+            text, bboxes = self.ocr_service.extract_text(file_path)
+            pages.append({"source": name, "page": index + 1, "text": text, "bboxes": [b.to_dict() for b in bboxes]})
+        if on_progress:
+            on_progress(1, 1)
+        return pages
+
+    async def render_image(self, file_path: str, boxes: List[dict], output_path: str):
+        # Без отрисовки: на месте изображения с переводом — копия исходника
+        await asyncio.to_thread(shutil.copyfile, file_path, output_path)
+
+    async def render_document(self, file_path: str, pages: List[dict], output_path: str, on_progress=None, **kwargs):
+        def write():
+            with zipfile.ZipFile(output_path, "w", zipfile.ZIP_STORED) as archive:
+                for number, page in enumerate(pages, 1):
+                    archive.writestr(f"page_{number:04d}.txt", page.get("text") or "")
+
+        await asyncio.to_thread(write)
+        if on_progress:
+            on_progress(1, 1)
+
+    async def synthesize_speech(self, text: str, output_path: str, lang: str = "en", on_progress=None) -> float:
+        await asyncio.to_thread(self.tts_service.generate_speech, text, output_path, lang)
+        if on_progress:
+            on_progress(1, 1)
+        return _wav_seconds(output_path)
+
+    def shutdown(self):
+        pass
+
+
+class TimedPool:
+    """Wraps a pool and charges each call's wall time to the running sample's stage"""
+
+    def __init__(self, pool):
+        self._pool = pool
+
+    def __getattr__(self, name):
+        attr = getattr(self._pool, name)
+        stage = POOL_STAGES.get(name)
+        if stage is None:
+            return attr
+        if name == "transcribe_stream":
+            return self._timed_stream(attr, stage)
+
+        async def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await attr(*args, **kwargs)
+            finally:
+                _record(stage, time.perf_counter() - started)
+        return timed
+
+    @staticmethod
+    def _timed_stream(method, stage: str):
+        async def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                async for item in method(*args, **kwargs):
+                    yield item
+            finally:
+                _record(stage, time.perf_counter() - started)
+        return timed
+
+
+def build_corpus(directory: Path, args) -> List[Sample]:
+    """args.repeat distinct files per requested size, seeded by position"""
+    from app.config import MAX_TEXT_CHARS
+
+    directory.mkdir(parents=True, exist_ok=True)
+    corpus: List[Sample] = []
+    seed = args.seed
+    for run in range(args.repeat):
+        for seconds in args.audio_seconds:
+            seed += 1
+            path = synthetic.write_audio(directory / f"audio_{seconds}s_{run}.wav", seconds, seed)
+            corpus.append(Sample("audio", path, seconds))
+        for chars in args.text_chars:
+            seed += 1
+            chars = min(chars, MAX_TEXT_CHARS)
+            path = synthetic.write_text(directory / f"text_{chars}_{run}.txt", chars, seed)
+            corpus.append(Sample("text", path, chars))
+        for width, height in args.image_sizes:
+            seed += 1
+            path = synthetic.write_image(directory / f"image_{width}x{height}_{run}.png", width, height, seed)
+            corpus.append(Sample("image", path, width * height))
+    return corpus
+
+
+async def run_sample(sample: Sample, args, job_manager, tts) -> Sample:
+    from app.config import UPLOAD_DIR
+    from app.models.job import FileType
+    from app.routes.worker import process_media
+    from app.utils.file_utils import hash_file
+
+    _current.set(sample)
+    job = job_manager.create_job(args.target_lang)
+    job.file_type = FileType(sample.kind)
+
+    # Загрузка: копия в UPLOAD_DIR и хэш, как в /api/upload (конвейер удаляет исходник по завершении)
+    started = time.perf_counter()
+    file_path = UPLOAD_DIR / f"{job.job_id}_{sample.path.name}"
+    await asyncio.to_thread(shutil.copyfile, sample.path, file_path)
+    job.file_hash = await asyncio.to_thread(hash_file, file_path)
+    job.file_path = str(file_path)
+    sample.stages["upload"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    translated = await process_media(job.job_id, str(file_path), job.file_type, args.target_lang, job_manager)
+    sample.stages["total"] = time.perf_counter() - started
+
+    if tts is not None:
+        started = time.perf_counter()
+        output_path = Path(job.audio_output_path).with_suffix(".wav")
+        await tts(translated, str(output_path), args.target_lang)
+        sample.stages["tts"] = time.perf_counter() - started
+    return sample
+
+
+async def run_corpus(corpus: List[Sample], args) -> float:
+    from app.routes import worker
+    from app.services.job_manager import JobManager
+    from app.services.text_to_speech import MockTextToSpeechService
+
+    if args.mode == "stub":
+        from app.config import INFERENCE_WORKERS
+        pool = StubInferencePool(INFERENCE_WORKERS)
+        mock_tts = MockTextToSpeechService()
+
+        async def tts(text: str, output_path: str, lang: str):
+            await asyncio.to_thread(mock_tts.generate_speech, text, output_path, lang)
+    else:
+        from app.services.inference_pool import inference_pool as pool
+        # Чанки синтезируются параллельно во всех воркерах, как в конвейере при TTS_ENABLED
+        tts = pool.synthesize_speech
+    if args.no_tts:
+        tts = None
+    worker.inference_pool = TimedPool(pool)
+
+    job_manager = JobManager()
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def bounded(sample: Sample):
+        async with semaphore:
+            await run_sample(sample, args, job_manager, tts)
+
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(bounded(sample) for sample in corpus))
+    finally:
+        pool.shutdown()
+    return time.perf_counter() - started
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile, q in [0, 100]"""
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(q / 100 * len(ordered) + 0.5) - 1))
+    return ordered[rank]
+
+
+def summarize(values: List[float]) -> dict:
+    return {
+        "count": len(values),
+        "mean": round(sum(values) / len(values), 6),
+        "p50": round(percentile(values, 50), 6),
+        "p90": round(percentile(values, 90), 6),
+        "p99": round(percentile(values, 99), 6),
+        "max": round(max(values), 6),
+    }
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def build_report(corpus: List[Sample], wall: float, args) -> dict:
+    by_kind: Dict[str, List[Sample]] = defaultdict(list)
+    for sample in corpus:
+        by_kind[sample.kind].append(sample)
+
+    kinds = {}
+    for kind, samples in by_kind.items():
+        stages = {}
+        for stage in STAGES:
+            values = [s.stages[stage] for s in samples if stage in s.stages]
+            if values:
+                stages[stage] = summarize(values)
+        busy = sum(s.stages["total"] for s in samples)
+        kinds[kind] = {
+            "jobs": len(samples),
+            "units": {"audio": "seconds", "text": "chars", "image": "pixels"}[kind],
+            # Единиц входа в секунду работы конвейера над этим видом задач
+            "units_per_second": round(sum(s.units for s in samples) / busy, 3) if busy else None,
+            "stages": stages,
+        }
+
+    # ru_maxrss в КБ на Linux; дочерние процессы учитываются после их завершения
+    self_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    children_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    return {
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "revision": _git_revision(),
+        },
+        "config": {
+            "mode": args.mode,
+            "concurrency": args.concurrency,
+            "repeat": args.repeat,
+            "target_lang": args.target_lang,
+            "audio_seconds": args.audio_seconds,
+            "text_chars": args.text_chars,
+            "image_sizes": [f"{w}x{h}" for w, h in args.image_sizes],
+        },
+        "wall_seconds": round(wall, 3),
+        "jobs_per_second": round(len(corpus) / wall, 3) if wall else None,
+        "peak_rss_mb": {"self": round(self_rss, 1), "children": round(children_rss, 1)},
+        "kinds": kinds,
+    }
+
+
+def print_report(report: dict, baseline: Optional[dict] = None):
+    print(f"{report['config']['mode']} run: {report['wall_seconds']}s wall, "
+          f"{report['jobs_per_second']} jobs/s, peak RSS {report['peak_rss_mb']['self']} MB")
+    for kind, data in report["kinds"].items():
+        print(f"\n{kind}: {data['jobs']} jobs, {data['units_per_second']} {data['units']}/s")
+        for stage, stats in data["stages"].items():
+            line = f"  {stage:<12} p50 {stats['p50'] * 1000:9.1f} ms   p90 {stats['p90'] * 1000:9.1f} ms   p99 {stats['p99'] * 1000:9.1f} ms"
+            old = (baseline or {}).get("kinds", {}).get(kind, {}).get("stages", {}).get(stage)
+            if old and old["p50"]:
+                line += f"   p50 {100 * (stats['p50'] - old['p50']) / old['p50']:+.1f}%"
+            print(line)
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(item) for item in value.split(",") if item.strip()]
+
+
+def _size_list(value: str) -> List[Tuple[int, int]]:
+    sizes = []
+    for item in value.split(","):
+        if item.strip():
+            width, height = item.lower().split("x")
+            sizes.append((int(width), int(height)))
+    return sizes
+
+
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--mode", choices=["stub", "real"], default="stub")
+    parser.add_argument("--audio-seconds", type=_int_list, default=[10, 60, 600])
+    parser.add_argument("--text-chars", type=_int_list, default=[1000, 20000, 100000])
+    parser.add_argument("--image-sizes", type=_size_list, default=[(800, 600), (1920, 1080)],
+                        help="WIDTHxHEIGHT list; empty string to skip (needs Pillow)")
+    parser.add_argument("--repeat", type=int, default=5, help="Distinct files per size")
+    parser.add_argument("--concurrency", type=int, default=1, help="Jobs processed at once")
+    parser.add_argument("--target-lang", default="en")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-tts", action="store_true", help="Skip the speech synthesis stage")
+    parser.add_argument("--workdir", type=Path, help="Keep corpus and outputs here instead of a temp dir")
+    parser.add_argument("--output", type=Path, help="Write the JSON report here")
+    parser.add_argument("--compare", type=Path, help="Earlier JSON report to diff medians against")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+
+    workdir = args.workdir or Path(tempfile.mkdtemp(prefix="ai-translate-bench-"))
+    # Изолированные каталоги и базы: до первого импорта app.config
+    os.environ["UPLOAD_DIR"] = str(workdir / "uploads")
+    os.environ["AUDIO_OUTPUT_DIR"] = str(workdir / "output")
+    os.environ["RESULT_CACHE_DIR"] = str(workdir / "output" / "cache")
+    os.environ["TM_DB_PATH"] = str(workdir / "translation_memory.sqlite3")
+    os.environ["QUEUE_DB_PATH"] = str(workdir / "queue.sqlite3")
+    (workdir / "uploads").mkdir(parents=True, exist_ok=True)
+
+    try:
+        corpus = build_corpus(workdir / "corpus", args)
+        wall = asyncio.run(run_corpus(corpus, args))
+        report = build_report(corpus, wall, args)
+    finally:
+        if args.workdir is None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    baseline = json.loads(args.compare.read_text()) if args.compare else None
+    print_report(report, baseline)
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+        print(f"\nReport written to {args.output}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
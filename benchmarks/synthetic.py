@@ -0,0 +1,88 @@
+"""
+Synthetic media for the pipeline benchmark
+
+Everything is generated from a seed, so two runs with the same arguments
+produce byte-identical corpora, while different seeds never share content
+(and therefore never hit the result cache or the translation memory).
+"""
+import math
+import random
+import wave
+from array import array
+from pathlib import Path
+from typing import List
+
+SAMPLE_RATE = 16000
+# Тон TONE_SECONDS, затем пауза SILENCE_SECONDS — есть где резать на шарды
+TONE_SECONDS = 4
+SILENCE_SECONDS = 1
+
+_SYLLABLES = ["ka", "ra", "to", "mi", "len", "sa", "vo", "ti", "na", "por", "del", "us", "an", "er", "sho"]
+
+
+def _tone(frequency: int, sample_rate: int = SAMPLE_RATE, amplitude: float = 0.3) -> bytes:
+    """One second of a sine wave; an integer frequency makes it loop seamlessly"""
+    scale = 32767 * amplitude
+    step = 2 * math.pi * frequency / sample_rate
+    return array("h", (int(scale * math.sin(step * i)) for i in range(sample_rate))).tobytes()
+
+
+def write_audio(path: Path, seconds: int, seed: int = 0, sample_rate: int = SAMPLE_RATE) -> Path:
+    """
+    Mono 16-bit WAV of alternating tone and silence
+
+    Only one second of samples is computed; the rest is the same buffer
+    repeated, so an hour of audio takes milliseconds to write.
+    """
+    tone = _tone(220 + seed % 600, sample_rate)
+    silence = bytes(len(tone))
+    with wave.open(str(path), "wb") as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(sample_rate)
+        second = 0
+        while second < seconds:
+            for _ in range(min(TONE_SECONDS, seconds - second)):
+                out.writeframes(tone)
+                second += 1
+            for _ in range(min(SILENCE_SECONDS, seconds - second)):
+                out.writeframes(silence)
+                second += 1
+    return path
+
+
+def random_text(chars: int, seed: int = 0) -> str:
+    """Sentences of made-up words, exactly chars characters long"""
+    rng = random.Random(seed)
+    sentences: List[str] = []
+    size = 0
+    while size < chars:
+        words = ["".join(rng.choices(_SYLLABLES, k=rng.randint(1, 4))) for _ in range(rng.randint(5, 18))]
+        sentence = " ".join(words).capitalize() + rng.choice([".", ".", ".", "!", "?"])
+        sentences.append(sentence)
+        size += len(sentence) + 1
+    return " ".join(sentences)[:chars]
+
+
+def write_text(path: Path, chars: int, seed: int = 0) -> Path:
+    path.write_text(random_text(chars, seed), encoding="utf-8")
+    return path
+
+
+def write_image(path: Path, width: int, height: int, seed: int = 0) -> Path:
+    """
+    PNG with lines of dark text on a light background
+
+    Requires Pillow (listed in requirements.txt).
+    """
+    from PIL import Image, ImageDraw, ImageFont
+
+    image = Image.new("RGB", (width, height), (245, 245, 240))
+    draw = ImageDraw.Draw(image)
+    font = ImageFont.load_default()
+    rng = random.Random(seed)
+    line_height = 24
+    for top in range(line_height, height - line_height, line_height * 2):
+        draw.text((line_height, top), random_text(rng.randint(20, max(20, width // 8)), rng.random()), fill=(20, 20, 20), font=font)
+    image.save(path)
+    return path
@@ -1,6 +1,6 @@
 import streamlit as st
 import requests
-import time
+import json
 from pathlib import Path
 import os
 
@@ -68,31 +68,77 @@ def get_result(job_id):
     else:
         raise Exception("Failed to retrieve result")
 
-def poll_job(job_id):
-    """Poll job status until completion or failure"""
-    while True:
-        try:
-            response = requests.get(f"{API_BASE_URL}/api/jobs/{job_id}", timeout=10)
+def iter_sse(response):
+    """Parse a text/event-stream response into (event, data) pairs"""
+    event, data = "message", []
+    for line in response.iter_lines(decode_unicode=True):
+        if line is None:
+            continue
+        if not line:
+            if data:
+                yield event, json.loads("\n".join(data))
+            event, data = "message", []
+        elif line.startswith(":"):
+            continue  # keep-alive
+        elif line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data.append(line[len("data:"):].lstrip())
+
+def watch_job(job_id):
+    """Follow job events over SSE until completion or failure"""
+    status_box = st.empty()
+    progress_bar = st.progress(0)
+    partial_box = st.empty()
+    job, partials = {}, []
+
+    def show_partials():
+        if partials:
+            partial_box.text_area(
+                "Live translation:",
+                value="\n".join(p.get("translated_text", "") for p in partials),
+                height=150,
+                disabled=True
+            )
+
+    try:
+        # Таймаут чтения больше интервала keep-alive сервера
+        with requests.get(f"{API_BASE_URL}/api/jobs/{job_id}/events", stream=True, timeout=(5, 60)) as response:
             if response.status_code != 200:
-                st.warning("⚠️ Cannot fetch job status")
+                st.warning("⚠️ Cannot subscribe to job events")
                 return None
-            job = response.json()
-            status = job.get("status", "unknown")
-            if status in ["queued", "processing"]:
-                st.info(f"Job is {status}... ⏳")
-                time.sleep(2)
-            elif status == "completed":
-                st.success("✅ Job completed!")
-                return job
-            elif status == "failed":
-                st.error(f"❌ Job failed: {job.get('error', 'Unknown error')}")
-                return job
-            else:
-                st.warning(f"⚠️ Unknown job status: {status}")
-                return job
-        except Exception as e:
-            st.error(f"Error polling job: {e}")
-            return None
+            for event, data in iter_sse(response):
+                if event == "snapshot":
+                    job = data
+                    partials = list(data.get("partial_results", []))
+                    show_partials()
+                elif event == "status":
+                    job.update(data)
+                elif event == "progress":
+                    percent = data.get("percent", 0)
+                    progress_bar.progress(int(percent), text=f"{data.get('stage', '')}: {percent:.0f}%")
+                    continue
+                elif event == "partial":
+                    partials.append(data)
+                    show_partials()
+                    continue
+
+                status = job.get("status", "unknown")
+                if status in ["queued", "processing"]:
+                    status_box.info(f"Job is {status}... ⏳")
+                elif status == "completed":
+                    status_box.success("✅ Job completed!")
+                    progress_bar.progress(100)
+                elif status == "failed":
+                    status_box.error(f"❌ Job failed: {job.get('error', 'Unknown error')}")
+    except Exception as e:
+        st.error(f"Error following job: {e}")
+        return None
+
+    # Итоговое состояние задачи целиком
+    if job.get("status") == "completed":
+        return get_result(job_id)
+    return job
 
 # ---------------- Header ----------------
 col1, col2 = st.columns([1, 4])
@@ -242,7 +288,7 @@ if "job_id" in st.session_state:
         if st.button("🔄 Refresh"):
             st.rerun()
 
-    job_result = poll_job(job_id)
+    job_result = watch_job(job_id)
 
     if job_result:
         status = job_result.get("status", "unknown")
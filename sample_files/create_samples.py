@@ -14,17 +14,17 @@ def create_sample_audio():
     frequency = 440  # A4 note
     
     import math
+    from array import array
     
-    frames = []
-    for i in range(sample_rate * duration):
-        sample = int(32767 * 0.3 * math.sin(2 * math.pi * frequency * i / sample_rate))
-        frames.append(sample.to_bytes(2, byteorder='little', signed=True))
+    # Целая частота — секунда сигнала повторяется без разрыва, считаем её один раз
+    step = 2 * math.pi * frequency / sample_rate
+    second = array('h', (int(32767 * 0.3 * math.sin(step * i)) for i in range(sample_rate))).tobytes()
     
     with wave.open(str(output_path), 'wb') as wav_file:
         wav_file.setnchannels(1)  # Mono
         wav_file.setsampwidth(2)
         wav_file.setframerate(sample_rate)
-        wav_file.writeframes(b''.join(frames))
+        wav_file.writeframes(second * duration)
     
     print(f"✅ Created: {output_path}")
 
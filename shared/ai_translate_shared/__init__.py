@@ -0,0 +1,7 @@
+"""
+Code shared by the app/ and backend/ services
+
+Installed into both environments (-e ./shared, -e ../shared in their
+requirements); nothing here reads either service's configuration, callers
+pass their settings in.
+"""
@@ -0,0 +1,127 @@
+"""
+Pages of zip / multi-page TIFF / PDF uploads for batch OCR
+"""
+import zipfile
+from pathlib import PurePosixPath
+from typing import List, Optional, Tuple
+
+# Страница документа: (имя файла внутри zip или None, номер кадра/страницы)
+PageRef = Tuple[Optional[str], int]
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.gif', '.webp', '.tif', '.tiff')
+DOCUMENT_EXTENSIONS = ('.zip', '.pdf', '.tif', '.tiff')
+# Разрешение растеризации PDF: 200 dpi хватает для обычного кегля
+PDF_DPI = 200
+# Предел распакованного размера zip — защита от архивов-бомб
+MAX_UNPACKED_BYTES = 2 * 1024 ** 3
+
+
+class PageLimitError(ValueError):
+    """The document has more pages, or unpacks to more bytes, than allowed"""
+
+
+def _suffix(name: str) -> str:
+    return PurePosixPath(name).suffix.lower()
+
+
+def _open_pdf(data):
+    try:
+        import fitz
+    except ImportError as e:
+        raise RuntimeError("PDF support needs PyMuPDF (pip install PyMuPDF)") from e
+    return fitz.open(stream=data, filetype="pdf") if isinstance(data, bytes) else fitz.open(data)
+
+
+def _count_pages(source, suffix: str) -> int:
+    """source is a path or the bytes of a zip member"""
+    if suffix == '.pdf':
+        with _open_pdf(source) as pdf:
+            return pdf.page_count
+    if suffix in ('.tif', '.tiff'):
+        import io
+        from PIL import Image
+        with Image.open(io.BytesIO(source) if isinstance(source, bytes) else source) as image:
+            return getattr(image, "n_frames", 1)
+    return 1
+
+
+def list_pages(file_path: str, max_pages: int) -> List[PageRef]:
+    """
+    Every page of a zip of images, a multi-page TIFF or a PDF, in order
+
+    Zip members are sorted by name; TIFF and PDF members are expanded into
+    their pages, anything that is not an image is skipped.
+
+    Raises:
+        PageLimitError: If there are more than max_pages pages
+    """
+    pages: List[PageRef] = []
+    suffix = _suffix(file_path)
+    if suffix == '.zip':
+        with zipfile.ZipFile(file_path) as archive:
+            members = [
+                info for info in archive.infolist()
+                if not info.is_dir() and _suffix(info.filename) in IMAGE_EXTENSIONS + ('.pdf',)
+                and not PurePosixPath(info.filename).name.startswith('.')
+            ]
+            if sum(info.file_size for info in members) > MAX_UNPACKED_BYTES:
+                raise PageLimitError("Archive unpacks to more than 2 GB")
+            names = sorted(info.filename for info in members)
+            for name in names:
+                member_suffix = _suffix(name)
+                count = _count_pages(archive.read(name), member_suffix) if member_suffix in DOCUMENT_EXTENSIONS else 1
+                pages.extend((name, index) for index in range(count))
+                if len(pages) > max_pages:
+                    break
+    else:
+        pages = [(None, index) for index in range(_count_pages(file_path, suffix))]
+
+    if len(pages) > max_pages:
+        raise PageLimitError(f"Document has more than {max_pages} pages")
+    return pages
+
+
+def _render_pdf_page(source, index: int, dpi: int):
+    import numpy as np
+
+    with _open_pdf(source) as pdf:
+        pixmap = pdf[index].get_pixmap(dpi=dpi, alpha=False)
+        return np.frombuffer(pixmap.samples, dtype=np.uint8).reshape(pixmap.height, pixmap.width, pixmap.n).copy()
+
+
+def _decode_image(source, index: int):
+    import io
+    import numpy as np
+    from PIL import Image
+
+    with Image.open(io.BytesIO(source) if isinstance(source, bytes) else source) as image:
+        if index:
+            image.seek(index)
+        return np.asarray(image.convert('RGB'))
+
+
+def load_pages(file_path: str, pages: List[PageRef], dpi: int = PDF_DPI) -> List:
+    """
+    Decode pages to RGB NumPy arrays
+
+    A zip member is read once even when several of its pages are requested.
+    """
+    images = []
+    archive = zipfile.ZipFile(file_path) if _suffix(file_path) == '.zip' else None
+    try:
+        cached_name, cached_bytes = None, None
+        for name, index in pages:
+            if archive is not None:
+                if name != cached_name:
+                    cached_name, cached_bytes = name, archive.read(name)
+                source, suffix = cached_bytes, _suffix(name)
+            else:
+                source, suffix = file_path, _suffix(file_path)
+            if suffix == '.pdf':
+                images.append(_render_pdf_page(source, index, dpi))
+            else:
+                images.append(_decode_image(source, index))
+    finally:
+        if archive is not None:
+            archive.close()
+    return images
@@ -0,0 +1,70 @@
+"""
+In-process pub/sub of job events for the SSE progress stream
+"""
+import asyncio
+import logging
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Событие: (тип, данные) — тип один из status, progress, partial
+JobEvent = Tuple[str, dict]
+
+
+class JobEventBroker:
+    """
+    Fan-out of job events to per-subscriber asyncio queues
+
+    publish() may be called from any thread; delivery always happens on the
+    event loop. Slow subscribers lose their oldest events rather than
+    blocking the pipeline.
+    """
+
+    def __init__(self, queue_size: int = 256):
+        self.queue_size = queue_size
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = defaultdict(set)
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def publish(self, job_id: str, event: str, data: dict):
+        with self._lock:
+            queues = list(self._subscribers.get(job_id, ()))
+        if not queues or self._loop is None:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._deliver(queues, (event, data))
+        else:
+            self._loop.call_soon_threadsafe(self._deliver, queues, (event, data))
+
+    @staticmethod
+    def _deliver(queues, item: JobEvent):
+        for q in queues:
+            if q.full():
+                q.get_nowait()
+            q.put_nowait(item)
+
+    @contextmanager
+    def subscribe(self, job_id: str) -> Iterator[asyncio.Queue]:
+        """Register a queue for a job's events; must be used on the event loop"""
+        self._loop = asyncio.get_running_loop()
+        q: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._subscribers[job_id].add(q)
+        try:
+            yield q
+        finally:
+            with self._lock:
+                self._subscribers[job_id].discard(q)
+                if not self._subscribers[job_id]:
+                    del self._subscribers[job_id]
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return sum(len(queues) for queues in self._subscribers.values())
@@ -0,0 +1,188 @@
+"""
+Per-stage job timings and Prometheus text exposition
+
+stage() times one pipeline stage: wall time, CPU time and input size go to
+the aggregated histograms served at /metrics, and the same record can be
+stored on the job. CPU time is this process's CPU over the stage (so it
+over-counts when jobs overlap) plus whatever the inference workers spent on
+calls made inside the stage, which they measure themselves and report back
+through add_cpu().
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+# Границы корзин в секундах: от быстрых этапов до многочасовых записей
+DEFAULT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+
+# Накопитель CPU воркеров для текущего этапа; список, чтобы его видели задачи, порождённые внутри этапа
+_stage_cpu: ContextVar[Optional[List[float]]] = ContextVar("stage_cpu", default=None)
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(round(value, 6))
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        # значения меток -> (счётчики корзин, сумма, количество)
+        self._series: Dict[Tuple[str, ...], List] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        with self._lock:
+            series = self._series.setdefault(key, [[0] * len(self.buckets), 0.0, 0])
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, bucket in zip(self.buckets, counts):
+                    cumulative += bucket
+                    le = f'le="{bound}"'
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}")
+                le = 'le="+Inf"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {_format_value(total)}")
+                lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {count}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}")
+        return lines
+
+
+class Gauge:
+    """Value read from a callback at scrape time"""
+
+    def __init__(self, name: str, help: str, read: Callable[[], float]):
+        self.name = name
+        self.help = help
+        self.read = read
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge", f"{self.name} {_format_value(self.read())}"]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def _add(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def histogram(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, help, labels, buckets))
+
+    def counter(self, name: str, help: str, labels: Tuple[str, ...] = ()) -> Counter:
+        return self._add(Counter(name, help, labels))
+
+    def gauge(self, name: str, help: str, read: Callable[[], float]) -> Gauge:
+        return self._add(Gauge(name, help, read))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+STAGE_SECONDS = metrics.histogram("pipeline_stage_seconds", "Wall time of a pipeline stage", ("stage",))
+STAGE_CPU_SECONDS = metrics.histogram(
+    "pipeline_stage_cpu_seconds", "CPU time of a pipeline stage, inference workers included", ("stage",)
+)
+STAGE_INPUT = metrics.counter("pipeline_stage_input_total", "Input handled by a pipeline stage", ("stage", "unit"))
+QUEUE_WAIT_SECONDS = metrics.histogram("job_queue_wait_seconds", "Time from submission until a queue worker takes the job")
+INFERENCE_SECONDS = metrics.histogram("inference_call_seconds", "Wall time of an inference pool call", ("call",))
+INFERENCE_CPU_SECONDS = metrics.histogram("inference_call_cpu_seconds", "CPU time spent by the worker on a call", ("call",))
+
+
+def add_cpu(seconds: float):
+    """Charge CPU time measured elsewhere (an inference worker) to the current stage"""
+    if (acc := _stage_cpu.get()) is not None:
+        acc[0] += seconds
+
+
+def observe_inference(call: str, wall: float, cpu: float):
+    INFERENCE_SECONDS.observe(wall, call=call)
+    INFERENCE_CPU_SECONDS.observe(cpu, call=call)
+    add_cpu(cpu)
+
+
+@contextmanager
+def stage(
+    name: str,
+    size: Optional[float] = None,
+    unit: Optional[str] = None,
+    on_done: Optional[Callable[[dict], None]] = None
+) -> Iterator[dict]:
+    """
+    Time a pipeline stage
+
+    Yields the record so the caller can fill in size once it is known (e.g.
+    audio seconds after transcription). On exit the record gets wall and cpu,
+    is observed into the histograms and handed to on_done, also on failure.
+    """
+    record = {"size": size, "unit": unit}
+    acc = [0.0]
+    outer = _stage_cpu.get()
+    token = _stage_cpu.set(acc)
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    try:
+        yield record
+    finally:
+        _stage_cpu.reset(token)
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start + acc[0]
+        if outer is not None:
+            # Вложенный этап: CPU воркеров входит и во внешний
+            outer[0] += acc[0]
+        record["wall"] = round(wall, 4)
+        record["cpu"] = round(cpu, 4)
+        STAGE_SECONDS.observe(wall, stage=name)
+        STAGE_CPU_SECONDS.observe(cpu, stage=name)
+        if record["size"] is not None and record["unit"]:
+            STAGE_INPUT.inc(record["size"], stage=name, unit=record["unit"])
+        if on_done is not None:
+            on_done(record)
@@ -0,0 +1,210 @@
+"""
+Async OpenAI translation client: chunking, concurrency, rate limits and retries
+"""
+import asyncio
+import json
+import logging
+import random
+from typing import List, Optional
+import httpx
+from openai import AsyncOpenAI, APIConnectionError, InternalServerError, RateLimitError
+from ai_translate_shared.rate_limit import TokenBucket
+from ai_translate_shared.tokens import count_tokens
+
+logger = logging.getLogger(__name__)
+
+LANG_MAP = {
+    "ru": "Russian",
+    "en": "English",
+    "kk": "Kazakh"
+}
+
+SYSTEM_PROMPT = "You are a professional translator. Translate accurately without adding comments."
+
+
+class TruncatedReply(Exception):
+    """The model hit max_tokens: the reply is cut off and must not be used"""
+
+
+class OpenAITranslator:
+    """
+    One pooled AsyncOpenAI client with its own concurrency and RPM/TPM budget
+
+    Create one per process: every request of that process goes through the
+    same semaphore and token buckets. Sentences are packed into chunks within
+    chunk_tokens and sent concurrently; 429/5xx/connection errors are retried
+    with jittered exponential backoff (honouring Retry-After), truncated
+    replies are re-split instead of being returned.
+    """
+
+    def __init__(
+        self, api_key: Optional[str], base_url: Optional[str] = None, model: str = "gpt-4o-mini",
+        concurrency: int = 4, rpm: float = 500, tpm: float = 200000, max_retries: int = 5,
+        chunk_tokens: int = 1500
+    ):
+        self.api_key = api_key
+        self.base_url = base_url or None
+        self.model = model
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.chunk_tokens = chunk_tokens
+        self._client: Optional[AsyncOpenAI] = None
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._request_bucket = TokenBucket(rpm)
+        self._token_bucket = TokenBucket(tpm)
+
+    def count_tokens(self, text: str) -> int:
+        return count_tokens(text, self.model)
+
+    @property
+    def client(self) -> AsyncOpenAI:
+        if self._client is None:
+            self._client = AsyncOpenAI(
+                api_key=self.api_key,
+                base_url=self.base_url,
+                # Повторы делаем сами — с учётом наших лимитов
+                max_retries=0,
+                http_client=httpx.AsyncClient(
+                    timeout=httpx.Timeout(120.0, connect=10.0),
+                    limits=httpx.Limits(
+                        max_connections=self.concurrency * 2,
+                        max_keepalive_connections=self.concurrency
+                    )
+                )
+            )
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+    @staticmethod
+    def _retry_delay(attempt: int, error: Exception) -> float:
+        retry_after = None
+        response = getattr(error, "response", None)
+        if response is not None:
+            retry_after = response.headers.get("retry-after")
+        if retry_after and retry_after.replace(".", "", 1).isdigit():
+            return float(retry_after)
+        # Экспоненциальная задержка с джиттером, чтобы параллельные запросы не били синхронно
+        return min(30.0, 0.5 * 2 ** attempt) * random.uniform(0.5, 1.5)
+
+    async def _complete(self, content: str) -> str:
+        prompt_tokens = self.count_tokens(SYSTEM_PROMPT) + self.count_tokens(content)
+        max_tokens = min(4096, prompt_tokens * 2 + 100)
+
+        async with self._semaphore:
+            for attempt in range(self.max_retries + 1):
+                await self._request_bucket.acquire(1)
+                await self._token_bucket.acquire(prompt_tokens + max_tokens)
+                try:
+                    response = await self.client.chat.completions.create(
+                        model=self.model,
+                        messages=[
+                            {"role": "system", "content": SYSTEM_PROMPT},
+                            {"role": "user", "content": content}
+                        ],
+                        temperature=0.3,
+                        max_tokens=max_tokens
+                    )
+                except (RateLimitError, InternalServerError, APIConnectionError) as e:
+                    if attempt == self.max_retries:
+                        raise
+                    delay = self._retry_delay(attempt, e)
+                    logger.warning(f"OpenAI request failed ({type(e).__name__}), retry {attempt + 1} in {delay:.1f}s")
+                    await asyncio.sleep(delay)
+                    continue
+                choice = response.choices[0]
+                if choice.finish_reason == "length":
+                    raise TruncatedReply(f"Reply cut at max_tokens={max_tokens} ({prompt_tokens} prompt tokens)")
+                return choice.message.content.strip()
+
+    def _split_words(self, text: str, max_tokens: int) -> List[str]:
+        pieces, current = [], []
+        for word in text.split():
+            if current and self.count_tokens(" ".join(current + [word])) > max_tokens:
+                pieces.append(" ".join(current))
+                current = []
+            current.append(word)
+        if current:
+            pieces.append(" ".join(current))
+        return pieces
+
+    def group_segments(self, segments: List[str]) -> List[List[int]]:
+        """Group consecutive sentence indices into chunks that fit chunk_tokens"""
+        groups: List[List[int]] = []
+        current: List[int] = []
+        current_tokens = 0
+        for i, segment in enumerate(segments):
+            tokens = self.count_tokens(segment)
+            if current and current_tokens + tokens > self.chunk_tokens:
+                groups.append(current)
+                current, current_tokens = [], 0
+            current.append(i)
+            current_tokens += tokens
+        if current:
+            groups.append(current)
+        return groups
+
+    async def _translate_one(self, segment: str, lang: str) -> str:
+        if self.count_tokens(segment) <= self.chunk_tokens:
+            try:
+                return await self._complete(f"Translate to {lang}:\n{segment}")
+            except TruncatedReply:
+                words = segment.split()
+                if len(words) < 2:
+                    raise
+                # Ответ обрезан по max_tokens — переводим половины по отдельности
+                logger.warning(f"Truncated reply for a {len(words)}-word segment, splitting it in two")
+                middle = len(words) // 2
+                halves = [" ".join(words[:middle]), " ".join(words[middle:])]
+                return " ".join(await asyncio.gather(*(self._translate_one(half, lang) for half in halves)))
+        # Предложение длиннее бюджета — режем по словам
+        parts = self._split_words(segment, self.chunk_tokens)
+        translated = await asyncio.gather(*(self._translate_one(part, lang) for part in parts))
+        return " ".join(translated)
+
+    async def _translate_group(self, segments: List[str], lang: str) -> List[str]:
+        if len(segments) == 1:
+            return [await self._translate_one(segments[0], lang)]
+
+        try:
+            reply = await self._complete(
+                f"Translate each string of this JSON array to {lang}. "
+                f"Reply with a JSON array of the same length and order, nothing else.\n"
+                f"{json.dumps(segments, ensure_ascii=False)}"
+            )
+        except TruncatedReply:
+            # Обрезанный JSON не разобрать — делим пачку пополам
+            logger.warning(f"Truncated reply for {len(segments)} sentences, splitting the chunk in two")
+            middle = len(segments) // 2
+            halves = await asyncio.gather(
+                self._translate_group(segments[:middle], lang), self._translate_group(segments[middle:], lang)
+            )
+            return halves[0] + halves[1]
+        try:
+            translations = json.loads(reply)
+            if isinstance(translations, list) and len(translations) == len(segments):
+                return [str(t) for t in translations]
+        except json.JSONDecodeError:
+            pass
+        logger.warning("Malformed batch reply, translating sentences one by one")
+        return list(await asyncio.gather(*(self._translate_one(segment, lang) for segment in segments)))
+
+    async def translate_segments(self, segments: List[str], target_language: str) -> List[str]:
+        """
+        Translate sentences, packing them into chunks within chunk_tokens
+
+        Chunks are sent concurrently; concurrency and the RPM/TPM buckets
+        bound what actually hits the API at once.
+        """
+        lang = LANG_MAP.get(target_language, "English")
+        groups = self.group_segments(segments)
+        results = await asyncio.gather(*(self._translate_group([segments[i] for i in group], lang) for group in groups))
+
+        translations: List[str] = [""] * len(segments)
+        for group, translated in zip(groups, results):
+            for i, text in zip(group, translated):
+                translations[i] = text
+        return translations
@@ -0,0 +1,33 @@
+import asyncio
+import time
+from typing import Optional
+
+class TokenBucket:
+    """
+    Async token bucket refilled continuously at per_minute tokens per minute
+
+    Used both for requests (acquire(1)) and for model tokens (acquire(n)).
+    """
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity if capacity is not None else per_minute
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, amount: float = 1.0):
+        # Запрос больше ёмкости ведра иначе ждал бы вечно
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return
+                await asyncio.sleep((amount - self._tokens) / self.rate)
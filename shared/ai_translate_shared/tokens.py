@@ -0,0 +1,41 @@
+"""
+Token counts for OpenAI models
+"""
+import logging
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough, deliberately high token count for BPE models
+
+    ~4 characters per token for ASCII, but Cyrillic and other non-Latin
+    scripts split into much shorter pieces, so they count 1 token per 1.5
+    characters.
+    """
+    non_ascii = sum(1 for ch in text if ord(ch) > 127)
+    return max(1, (len(text) - non_ascii) // 4 + -(-non_ascii * 2 // 3))
+
+
+@lru_cache(maxsize=8)
+def _encoding(model: str):
+    try:
+        import tiktoken
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        # Нет пакета или словарь не скачать (офлайн) — считаем по символам
+        logger.info(f"tiktoken unavailable ({e}), estimating tokens from characters")
+        return None
+
+
+def count_tokens(text: str, model: str) -> int:
+    """Tokens of text for model: exact with tiktoken, estimate_tokens without it"""
+    encoding = _encoding(model)
+    if encoding is None:
+        return estimate_tokens(text)
+    return len(encoding.encode(text))
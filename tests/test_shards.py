@@ -0,0 +1,69 @@
+"""
+Merging of parallel transcription shards (app.utils.audio_utils.merge_shard_segments)
+
+Run from the repository root: python -m pytest tests
+"""
+from app.utils.audio_utils import merge_shard_segments
+
+
+def seg(start, end, text):
+    return {"start": start, "end": end, "text": text}
+
+
+def texts(segments):
+    return [s["text"] for s in segments]
+
+
+def midpoint_filter(shards, results):
+    """The previous per-shard rule: keep a segment if its midpoint lies in the shard's range"""
+    kept = []
+    for (start, end), segments in zip(shards, results):
+        for s in segments:
+            middle = (s["start"] + s["end"]) / 2
+            if middle >= start and (end is None or middle < end):
+                kept.append(s)
+    return sorted(kept, key=lambda s: s["start"])
+
+
+def test_segment_straddling_the_cut_is_not_lost():
+    # Разрез на 10.5 с, перекрытие 2 с: левая часть декодирует до 12.5, правая — с 8.5.
+    # Фразу на стыке стороны режут по-разному, и по середине сегмента её отбрасывают обе
+    shards = [(0.0, 10.5), (10.5, None)]
+    left = [seg(0.0, 6.0, "a"), seg(6.0, 9.0, "b"), seg(9.2, 12.4, "c")]
+    right = [seg(8.6, 10.4, "b-end c-start"), seg(10.4, 13.0, "c-end"), seg(13.5, 20.0, "d")]
+
+    assert texts(midpoint_filter(shards, [left, right])) == ["a", "b", "c-end", "d"]
+
+    merged = merge_shard_segments(shards, [left, right])
+
+    # Группа 6.0–13.0 больше лежит в левой части — она и даёт фразу, целиком и один раз
+    assert texts(merged) == ["a", "b", "c", "d"]
+
+
+def test_group_mostly_after_the_cut_comes_from_the_right_shard():
+    shards = [(0.0, 10.5), (10.5, None)]
+    left = [seg(0.0, 9.6, "a"), seg(9.6, 12.5, "b-cut")]
+    right = [seg(8.5, 9.6, "a-end"), seg(9.6, 11.0, "b"), seg(11.0, 14.0, "c"), seg(14.0, 20.0, "d")]
+
+    merged = merge_shard_segments(shards, [left, right])
+
+    # a и a-end — одна группа, почти целиком слева; b-cut, b и c — другая, в основном справа
+    assert texts(merged) == ["a", "b", "c", "d"]
+
+
+def test_segments_heard_by_one_shard_only_are_kept():
+    shards = [(0.0, 10.0), (10.0, 20.0), (20.0, None)]
+    results = [
+        [seg(0.0, 4.0, "a"), seg(10.5, 11.5, "left-only")],
+        [seg(9.0, 10.4, "b"), seg(15.0, 19.0, "c")],
+        [seg(19.5, 25.0, "d")],
+    ]
+
+    merged = merge_shard_segments(shards, results)
+
+    assert texts(merged) == ["a", "b", "left-only", "c", "d"]
+
+
+def test_single_shard_is_returned_sorted():
+    segments = [seg(2.0, 3.0, "b"), seg(0.0, 2.0, "a")]
+    assert texts(merge_shard_segments([(0.0, None)], [segments])) == ["a", "b"]